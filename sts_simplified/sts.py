@@ -1,23 +1,137 @@
+import sys
+from types import MappingProxyType
+from typing import IO, Callable, Mapping, NamedTuple, Sequence
+
+from sts_damage import scale_damage
 from sts_support import *
 
 
+class CardEffect(NamedTuple):
+    """
+    The flat, immutable record of everything a type of card does, compiled
+    once per type of card so that playing a card needs no getter calls or
+    dictionary lookups. The defaults are those of the Card class.
+
+    Attributes:
+    - name (str): The name of the card.
+    - description (str): The description printed by 'describe'.
+    - cost (int): The energy needed to play the card.
+    - damage (int): The damage done to the card's target.
+    - block (int): The block added to the player.
+    - strength (int): The strength added to the player.
+    - weak (int): The weak applied to the card's target.
+    - vulnerable (int): The vulnerable applied to the card's target.
+    - target (bool): Whether playing the card requires a target.
+    """
+
+    name: str
+    description: str = "A card."
+    cost: int = 1
+    damage: int = 0
+    block: int = 0
+    strength: int = 0
+    weak: int = 0
+    vulnerable: int = 0
+    target: bool = True
+
+
+# The effect of every registered type of card, by name. Every subclass of
+# Card is registered when it is defined.
+CARD_EFFECTS: dict[str, CardEffect] = {}
+
+
 class Card:
     """
     An abstract class from which all instantiable types of cards inheret.
     Provides the default card behaviour, which
     can be inhereted or overwritten by specific types of cards.
-    The __init__ method for all cards do not take any
-    arguments beyond self
+    Cards are created without any arguments beyond self.
+
+    Cards are immutable flyweights: a card's properties are class attributes,
+    and every call to a card class (e.g. Strike()) returns the same shared
+    instance, so a deck of ten cards costs ten list slots rather than ten
+    objects.
     """
 
-    def __init__(self):
-        self._damage = 0
-        self._block = 0
-        self._cost = 1
-        self._status = {}
-        self._name = "Card"
-        self._description = "A card."
-        self._target = True
+    __slots__ = ()
+
+    _damage = 0
+    _block = 0
+    _cost = 1
+    _status: Mapping[str, int] = MappingProxyType({})
+    _name = "Card"
+    _description = "A card."
+    _target = True
+    _hash_key = name_key(HASH_CARD, _name)
+    _effect = CardEffect(_name, _description, _cost, _damage, _block, 0, 0, 0, _target)
+    _by_name: dict[str, "Card"] = {}
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        """
+        Registers each type of card: compiles its effect record into
+        CARD_EFFECTS, gives it a hash key derived from its name, and records
+        its shared instance so that it can be found by name.
+        """
+        super().__init_subclass__(**kwargs)
+        cls._hash_key = name_key(HASH_CARD, cls._name)
+        cls._effect = CardEffect(
+            cls._name,
+            cls._description,
+            cls._cost,
+            cls._damage,
+            cls._block,
+            cls._status.get("strength", 0),
+            cls._status.get("weak", 0),
+            cls._status.get("vulnerable", 0),
+            cls._target,
+        )
+        CARD_EFFECTS[cls._name] = cls._effect
+        Card._by_name[cls._name] = cls()
+
+    @staticmethod
+    def from_name(name: str) -> "Card | None":
+        """
+        Returns the shared instance of the type of card with the given name.
+
+        Args:
+            name (str): The name of the card, e.g. 'Strike'.
+
+        Returns:
+            Card | None: The card, or None if no type of card has that name.
+        """
+        return Card._by_name.get(name)
+
+    def __new__(cls) -> "Card":
+        """
+        Returns the shared instance of this type of card, creating it the
+        first time it is requested.
+
+        Returns:
+            Card: The shared instance of this type of card.
+        """
+        instance = cls.__dict__.get("_instance")
+        if instance is None:
+            instance = super().__new__(cls)
+            cls._instance = instance
+        return instance
+
+    def __copy__(self) -> "Card":
+        """
+        Cards are immutable, so a copy is the card itself.
+
+        Returns:
+            Card: This card.
+        """
+        return self
+
+    def __deepcopy__(self, memo: dict) -> "Card":
+        """
+        Cards are immutable, so a deep copy is the card itself.
+
+        Returns:
+            Card: This card.
+        """
+        return self
 
     def get_damage_amount(self) -> int:
         """
@@ -51,14 +165,15 @@ class Card:
         """
         return self._cost
 
-    def get_status_modifiers(self) -> dict[str, int]:
+    def get_status_modifiers(self) -> Mapping[str, int]:
         """
-        Returns a dictionary describing each status modifiers applied when this card is played.
+        Returns a read-only dictionary describing each status modifiers applied when this
+        card is played.
         By default, no status modifiers are applied;
         that is, this method should return an empty dictionary in the abstract Card class.
 
         Returns:
-            dict[str, int]: A dictionary describing each status modifiers
+            Mapping[str, int]: A dictionary describing each status modifiers
             applied when this card is played
         """
         return self._status
@@ -82,6 +197,26 @@ class Card:
         """
         return self._description
 
+    def get_effect(self) -> CardEffect:
+        """
+        Returns the compiled record of what this card does.
+
+        Returns:
+            CardEffect: The effect of this card.
+        """
+        return self._effect
+
+    def get_hash_key(self) -> int:
+        """
+        Returns the key this card adds to the hash of any pile it is in.
+        Cards with the same name have the same key, so a pile hashes as a
+        multiset of card names.
+
+        Returns:
+            int: The hash key for this card.
+        """
+        return self._hash_key
+
     def requires_target(self) -> bool:
         """
         Returns True if playing this card requires a target, and False if it does not.
@@ -120,13 +255,13 @@ class Strike(Card):
     Strike is a type of Card that deals 6 damage to its target. It costs 1 energy point to play
     """
 
-    def __init__(self):
-        super().__init__()
-        self._damage = 6
-        self._cost = 1
-        self._name = "Strike"
-        self._description = "Deal 6 damage."
-        self._target = True
+    __slots__ = ()
+
+    _damage = 6
+    _cost = 1
+    _name = "Strike"
+    _description = "Deal 6 damage."
+    _target = True
 
 
 class Defend(Card):
@@ -137,13 +272,13 @@ class Defend(Card):
     Defend does not require a target. It costs 1 energy point to play.
     """
 
-    def __init__(self):
-        super().__init__()
-        self._block = 5
-        self._cost = 1
-        self._name = "Defend"
-        self._description = "Gain 5 block."
-        self._target = False
+    __slots__ = ()
+
+    _block = 5
+    _cost = 1
+    _name = "Defend"
+    _description = "Gain 5 block."
+    _target = False
 
 
 class Bash(Card):
@@ -154,14 +289,14 @@ class Bash(Card):
     It costs 2 energy points to play.
     """
 
-    def __init__(self):
-        super().__init__()
-        self._damage = 7
-        self._block = 5
-        self._cost = 2
-        self._name = "Bash"
-        self._description = "Deal 7 damage. Gain 5 block."
-        self._target = True
+    __slots__ = ()
+
+    _damage = 7
+    _block = 5
+    _cost = 2
+    _name = "Bash"
+    _description = "Deal 7 damage. Gain 5 block."
+    _target = True
 
 
 class Neutralize(Card):
@@ -174,14 +309,14 @@ class Neutralize(Card):
     Neutralize does not cost any energy points to play
     """
 
-    def __init__(self):
-        super().__init__()
-        self._damage = 3
-        self._cost = 0
-        self._status = {"weak": 1, "vulnerable": 2}
-        self._name = "Neutralize"
-        self._description = "Deal 3 damage. Apply 1 weak. Apply 2 vulnerable."
-        self._target = True
+    __slots__ = ()
+
+    _damage = 3
+    _cost = 0
+    _status = MappingProxyType({"weak": 1, "vulnerable": 2})
+    _name = "Neutralize"
+    _description = "Deal 3 damage. Apply 1 weak. Apply 2 vulnerable."
+    _target = True
 
 
 class Survivor(Card):
@@ -192,13 +327,68 @@ class Survivor(Card):
     Survivor does not require a target.
     """
 
-    def __init__(self):
-        super().__init__()
-        self._block = 8
-        self._status = {"strength": 1}
-        self._name = "Survivor"
-        self._description = "Gain 8 block and 1 strength."
-        self._target = False
+    __slots__ = ()
+
+    _block = 8
+    _status = MappingProxyType({"strength": 1})
+    _name = "Survivor"
+    _description = "Gain 8 block and 1 strength."
+    _target = False
+
+
+def register_card(effect: CardEffect) -> type[Card]:
+    """
+    Defines and registers a new type of card from its effect record, as if a
+    Card subclass had been written for it.
+
+    Args:
+        effect (CardEffect): What the new card does.
+
+    Returns:
+        type[Card]: The new subclass of Card.
+
+    Raises:
+        ValueError: If a card with the same name is already registered.
+    """
+    if effect.name in CARD_EFFECTS:
+        raise ValueError(f"a card named {effect.name!r} is already registered")
+    status = {
+        key: value
+        for key, value in (
+            ("strength", effect.strength),
+            ("weak", effect.weak),
+            ("vulnerable", effect.vulnerable),
+        )
+        if value
+    }
+    return type(
+        effect.name,
+        (Card,),
+        {
+            "__slots__": (),
+            "_damage": effect.damage,
+            "_block": effect.block,
+            "_cost": effect.cost,
+            "_status": MappingProxyType(status),
+            "_name": effect.name,
+            "_description": effect.description,
+            "_target": effect.target,
+        },
+    )
+
+
+def load_cards(filename: str) -> list[type[Card]]:
+    """
+    Registers every card described in a card file (see read_card_file in
+    sts_support.py).
+
+    Args:
+        filename (str): The name of the card file.
+
+    Returns:
+        list[type[Card]]: The new types of card, in the order of the file.
+    """
+    return [register_card(CardEffect(**record)) for record in read_card_file(filename)]
 
 
 class Entity:
@@ -228,8 +418,25 @@ class Entity:
     -vulnerable (int): The number of turns for which this entity is vulnerable.
                     If an entity is vulnerable on a turn,
                     damage caused to it will be increased by 50%.
+
+    An entity can keep a Zobrist hash of its state, which each method that
+    changes the state then updates in constant time. Keeping it costs every
+    move a little, so it is only kept once state_hash has been called. See
+    state_hash.
     """
 
+    __slots__ = (
+        "_max_hp",
+        "_hp",
+        "_block",
+        "_strength",
+        "_weak",
+        "_vulnerable",
+        "_name",
+        "_hash",
+        "_bus",
+    )
+
     def __init__(self, max_hp: int) -> None:
         """
         Set up a new entity with the given max_hp.
@@ -250,6 +457,9 @@ class Entity:
         self._weak = 0
         self._vulnerable = 0
         self._name = self.__class__.__name__
+        self._bus = None
+        # None until state_hash is first called, as hashing is opt-in.
+        self._hash = None
 
     def get_hp(self) -> int:
         """
@@ -331,6 +541,13 @@ class Entity:
         Returns:
             None
         """
+        if self._bus is not None and self._block and amount > 0:
+            self._bus.emit(BlockAbsorbed(self, min(self._block, amount)))
+        old_hash = self._hash
+        if old_hash is not None:
+            old_hash ^= (
+                zobrist_keys[HASH_HP][self._hp] ^ zobrist_keys[HASH_BLOCK][self._block]
+            )
         # If the amount is completely covered by the block, subtract it from block
         if self._block >= amount:
             self._block -= amount
@@ -342,6 +559,12 @@ class Entity:
             self._block = 0
             # Ensures hp stays above 0
             self._hp = max(self._hp, 0)
+        if old_hash is not None:
+            self._hash = (
+                old_hash
+                ^ zobrist_keys[HASH_HP][self._hp]
+                ^ zobrist_keys[HASH_BLOCK][self._block]
+            )
 
     def is_defeated(self) -> bool:
         """
@@ -367,7 +590,11 @@ class Entity:
         Returns:
             None
         """
+        old = self._block
         self._block += amount
+        if self._hash is not None:
+            keys = zobrist_keys[HASH_BLOCK]
+            self._hash ^= keys[old] ^ keys[self._block]
 
     def add_strength(self, amount: int) -> None:
         """
@@ -379,7 +606,11 @@ class Entity:
         Returns:
             None
         """
+        old = self._strength
         self._strength += amount
+        if self._hash is not None:
+            keys = zobrist_keys[HASH_STRENGTH]
+            self._hash ^= keys[old] ^ keys[self._strength]
 
     def add_weak(self, amount: int) -> None:
         """
@@ -391,7 +622,11 @@ class Entity:
         Returns:
             None
         """
+        old = self._weak
         self._weak += amount
+        if self._hash is not None:
+            keys = zobrist_keys[HASH_WEAK]
+            self._hash ^= keys[old] ^ keys[self._weak]
 
     def add_vulnerable(self, amount: int) -> None:
         """
@@ -403,7 +638,11 @@ class Entity:
         Returns:
             None
         """
+        old = self._vulnerable
         self._vulnerable += amount
+        if self._hash is not None:
+            keys = zobrist_keys[HASH_VULNERABLE]
+            self._hash ^= keys[old] ^ keys[self._vulnerable]
 
     def new_turn(self) -> None:
         """
@@ -414,6 +653,12 @@ class Entity:
         Returns:
             None
         """
+        if self._hash is not None:
+            self._hash ^= (
+                zobrist_keys[HASH_BLOCK][self._block]
+                ^ zobrist_keys[HASH_WEAK][self._weak]
+                ^ zobrist_keys[HASH_VULNERABLE][self._vulnerable]
+            )
         self._block = 0
         self._weak -= 1
         self._weak = max(self._weak, 0)  # Ensures weak does not become negative
@@ -421,6 +666,113 @@ class Entity:
         self._vulnerable = max(
             self._vulnerable, 0
         )  # Ensures vulnerable does not become negative
+        if self._hash is not None:
+            self._hash ^= (
+                zobrist_keys[HASH_BLOCK][self._block]
+                ^ zobrist_keys[HASH_WEAK][self._weak]
+                ^ zobrist_keys[HASH_VULNERABLE][self._vulnerable]
+            )
+
+    def state_hash(self) -> int:
+        """
+        Returns a 64-bit hash of this entity's state. The first call computes
+        it from scratch and starts maintaining it incrementally, so later calls
+        cost O(1). Entities of the same type in the same state have the same
+        hash, whatever their id.
+
+        Returns:
+            int: The hash of this entity's state.
+        """
+        if self._hash is None:
+            self._start_hashing()
+        return self._hash
+
+    def _start_hashing(self) -> None:
+        """
+        Computes the hash of this entity's state, which every method that
+        changes the state keeps up to date from now on.
+        """
+        self._hash = self._compute_hash()
+
+    def _compute_hash(self) -> int:
+        """
+        Returns the hash of this entity's state computed from scratch, which
+        state_hash must always agree with. Subclasses fold in their own state.
+
+        Returns:
+            int: The hash of this entity's state.
+        """
+        return (
+            name_key(HASH_KIND, self.__class__.__name__)
+            ^ zobrist_keys[HASH_MAX_HP][self._max_hp]
+            ^ zobrist_keys[HASH_HP][self._hp]
+            ^ zobrist_keys[HASH_BLOCK][self._block]
+            ^ zobrist_keys[HASH_STRENGTH][self._strength]
+            ^ zobrist_keys[HASH_WEAK][self._weak]
+            ^ zobrist_keys[HASH_VULNERABLE][self._vulnerable]
+        )
+
+    def snapshot(self) -> tuple:
+        """
+        Returns a compact, immutable copy of this entity's state that can later
+        be passed to restore. Subclasses extend the tuple with their own state.
+
+        Returns:
+            tuple: The state of this entity.
+        """
+        return (
+            self._max_hp,
+            self._hp,
+            self._block,
+            self._strength,
+            self._weak,
+            self._vulnerable,
+        )
+
+    def restore(self, state: tuple) -> None:
+        """
+        Returns this entity to a state previously returned by snapshot.
+        Subclasses set their own state before calling this, as it recomputes
+        the hash if one is kept.
+
+        Parameters:
+            tuple: A state returned by snapshot on this entity.
+
+        Returns:
+            None
+        """
+        (
+            self._max_hp,
+            self._hp,
+            self._block,
+            self._strength,
+            self._weak,
+            self._vulnerable,
+        ) = state[:6]
+        if self._hash is not None:
+            self._hash = self._compute_hash()
+
+    def reset(self, max_hp: int) -> None:
+        """
+        Returns this entity to the state of a new entity with the given maximum
+        HP, so that it can be used again instead of building a new one. It no
+        longer reports to an event bus, and no longer keeps a hash until
+        state_hash is called again.
+
+        Parameters:
+            int: The maximum amount of health points the entity can have.
+
+        Returns:
+            None
+        """
+        self._max_hp = max_hp
+        self._hp = max_hp
+        self._block = 0
+        self._strength = 0
+        self._weak = 0
+        self._vulnerable = 0
+        self._bus = None
+        self._hash = None
 
     def __str__(self) -> str:
         """
@@ -458,9 +810,46 @@ class Player(Entity):
     - hand (list): A list of cards playable in the current turn.
 
     - discard_pile (list): A list of cards that have been played already this encounter.
+
+    - rng (GameRNG | None): The generator used to draw cards.
+
+    - fast_draws (bool): Whether cards are drawn with draw_from_end, in O(1)
+                         per card, instead of draw_cards. Fast draws do not
+                         reproduce the draws of draw_cards for a given seed,
+                         so they are off by default.
+
+    Next to each of the deck, hand and discard pile, the player keeps a count
+    of the cards of each name in it, so checking whether a card is held is
+    O(1). The piles are also hashed as multisets: each pile's hash is the sum
+    of the hash keys of its cards, so the order of the cards in a pile does
+    not matter. The piles should only be changed through the methods of this
+    class, which keep the counts, and the sums once hashing has started, up
+    to date.
     """
 
-    def __init__(self, max_hp: int, cards: list[Card] | None = None) -> None:
+    __slots__ = (
+        "_cards",
+        "_energy",
+        "_deck",
+        "_hand",
+        "_discard",
+        "_rng",
+        "_fast_draws",
+        "_deck_hash",
+        "_hand_hash",
+        "_discard_hash",
+        "_deck_counts",
+        "_hand_counts",
+        "_discard_counts",
+    )
+
+    def __init__(
+        self,
+        max_hp: int,
+        cards: list[Card] | None = None,
+        rng: GameRNG | None = None,
+        fast_draws: bool = False,
+    ) -> None:
         """
         Initializes a Player object with a maximum health points (max_hp)
         and a list of cards (cards).
@@ -471,6 +860,14 @@ class Player(Entity):
         cards (list[Card] | None, optional):
         a list of Card objects representing the player's deck. Defaults to None.
 
+        rng (GameRNG | None, optional):
+        the generator used for this player's card draws and for any encounter
+        they take part in. Defaults to None, meaning the shared default_rng.
+
+        fast_draws (bool, optional):
+        whether to draw cards in O(1) per card with draw_from_end rather than
+        reproducing the draws of draw_cards. Defaults to False.
+
         Returns:
         None
 
@@ -487,6 +884,24 @@ class Player(Entity):
         self._deck = self._cards
         self._hand = []
         self._discard = []
+        self._rng = rng
+        self._fast_draws = fast_draws
+        self._deck_hash = 0
+        self._hand_hash = 0
+        self._discard_hash = 0
+        self._deck_counts = pile_counts([] if cards is None else cards)
+        self._hand_counts = pile_counts([])
+        self._discard_counts = pile_counts([])
+
+    def get_rng(self) -> GameRNG | None:
+        """
+        Returns the generator used for this player's game, or None if the
+        shared default_rng is used.
+
+        Returns:
+            GameRNG | None: The generator used for this player's game.
+        """
+        return self._rng
 
     def get_energy(self) -> int:
         """
@@ -524,23 +939,75 @@ class Player(Entity):
         """
         return self._discard
 
+    def get_hand_counts(self) -> Mapping[str, int]:
+        """
+        Returns the number of cards of each name in the player's hand. Names
+        that are not in the hand are either missing or have a count of 0.
+
+        Returns:
+            Mapping[str, int]: The number of cards of each name in the hand.
+        """
+        return self._hand_counts
+
+    def get_deck_counts(self) -> Mapping[str, int]:
+        """
+        Returns the number of cards of each name in the player's deck.
+
+        Returns:
+            Mapping[str, int]: The number of cards of each name in the deck.
+        """
+        return self._deck_counts
+
+    def get_discard_counts(self) -> Mapping[str, int]:
+        """
+        Returns the number of cards of each name in the player's discard pile.
+
+        Returns:
+            Mapping[str, int]: The number of cards of each name in the discard
+            pile.
+        """
+        return self._discard_counts
+
+    def can_play(self, card_name: str) -> bool:
+        """
+        Returns True if the player holds a card with the given name and has
+        enough energy to play it, i.e. if play_card would succeed. Costs O(1).
+
+        Args:
+            card_name (str): The name of the card.
+
+        Returns:
+            bool: True if the card can be played, and False otherwise.
+        """
+        if not self._hand_counts.get(card_name):
+            return False
+        return self._energy >= Card.from_name(card_name).get_energy_cost()
+
     def start_new_encounter(self) -> None:
         """
         Adds all cards from the player’s discard pile to the end of their deck,
-        and sets the discard pile to be an empty list.
+        and empties the discard pile in place.
         Pre-condition: The player’s hand should be empty when this method is called.
         """
         if self._hand == []:
             self._deck.extend(self._discard)
-            self._discard = []
+            self._discard.clear()
+            if self._hash is not None:
+                self._deck_hash += self._discard_hash
+                self._discard_hash = 0
+            move_counts(self._discard_counts, self._deck_counts)
 
     def end_turn(self) -> None:
         """
         This method adds all remaining cards from the player’s hand
-        to the end of their discard pile, and sets their hand back to an empty list.
+        to the end of their discard pile, and empties their hand in place.
         """
         self._discard.extend(self._hand)
-        self._hand = []
+        self._hand.clear()
+        if self._hash is not None:
+            self._discard_hash += self._hand_hash
+            self._hand_hash = 0
+        move_counts(self._hand_counts, self._discard_counts)
 
     def new_turn(self) -> None:
         """
@@ -548,10 +1015,56 @@ class Player(Entity):
         This involves everything that a regular entity requires for a new turn,
         but also requires that the player be dealt a new hand of 5 cards, and energy be reset to 3.
         """
+        hashed = self._hash is not None
+        if hashed:
+            keys = zobrist_keys[HASH_ENERGY]
+            self._hash ^= keys[self._energy] ^ keys[3]
         self._energy = 3
-        draw_cards(self._deck, self._hand, self._discard)
+        if self._fast_draws:
+            self._draw_from_end()
+        elif draw_cards(self._deck, self._hand, self._discard, self._rng):
+            if hashed:
+                self._deck_hash += self._discard_hash
+                self._discard_hash = 0
+            move_counts(self._discard_counts, self._deck_counts)
+        if hashed:
+            # The old hand is gone and the new one was drawn from the deck
+            self._hand_hash = pile_hash(self._hand)
+            self._deck_hash -= self._hand_hash
+        hand_counts = self._hand_counts
+        deck_counts = self._deck_counts
+        hand_counts.clear()
+        for card in self._hand:
+            name = card.get_name()
+            hand_counts[name] = hand_counts.get(name, 0) + 1
+            deck_counts[name] -= 1
         super().new_turn()
 
+    def _draw_from_end(self) -> None:
+        """
+        Deals a new hand of 5 cards in O(1) per card, for fast_draws. As with
+        draw_cards, the old hand is thrown away, and if fewer than 5 cards
+        are left in the deck they all go into the hand and the discard pile
+        becomes the deck. Here the discard pile is swapped in rather than
+        copied. Leaves the counts and hash of the deck as if the new hand
+        were still in it.
+        """
+        hand = self._hand
+        hand.clear()
+        if len(self._deck) < 5:
+            hand.extend(self._deck)
+            self._deck.clear()
+            self._deck, self._discard = self._discard, self._deck
+            move_counts(self._deck_counts, self._discard_counts)
+            self._deck_counts, self._discard_counts = (
+                self._discard_counts,
+                self._deck_counts,
+            )
+            if self._hash is not None:
+                self._deck_hash += self._discard_hash
+                self._discard_hash = 0
+        draw_from_end(self._deck, hand, 5 - len(hand), self._rng)
+
     def play_card(self, card_name: str) -> Card | None:
         """
         Attempts to play a card from the player's hand.
@@ -570,18 +1083,180 @@ class Player(Entity):
             Card or None: If successful, returns the played Card object. Otherwise, returns None.
         """
         # check if the player has the card in their hand
-        for index, card in enumerate(self._hand):
-            if card.get_name() == card_name:
-                # check if the player has enough energy to play the card
-                if self._energy >= card.get_energy_cost():
-                    # remove the card from the player's hand
-                    card_played = self._hand.pop(index)
-                    # add the card to the discard pile
-                    self._discard.append(card_played)
-                    # deduct the required energy from the player's energy
-                    self._energy -= card_played.get_energy_cost()
-                    return card_played
-        return None  # card not found in the player's hand
+        if not self._hand_counts.get(card_name):
+            return None
+        card = Card.from_name(card_name)
+        cost = card.get_energy_cost()
+        # check if the player has enough energy to play the card
+        if self._energy < cost:
+            return None
+        # remove the first copy of the card from the player's hand (cards are
+        # shared instances, so every copy is the same object)
+        self._hand.remove(card)
+        self._hand_counts[card_name] -= 1
+        # add the card to the discard pile
+        self._discard.append(card)
+        self._discard_counts[card_name] = self._discard_counts.get(card_name, 0) + 1
+        # deduct the required energy from the player's energy
+        self._energy -= cost
+        if self._hash is not None:
+            key = card.get_hash_key()
+            self._hand_hash -= key
+            self._discard_hash += key
+            keys = zobrist_keys[HASH_ENERGY]
+            self._hash ^= keys[self._energy + cost] ^ keys[self._energy]
+        return card
+
+    def state_hash(self) -> int:
+        """
+        Returns a 64-bit hash of this player's state, including the contents
+        of their deck, hand and discard pile as multisets. It costs O(1) after
+        the first call, which starts hashing.
+
+        Returns:
+            int: The hash of this player's state.
+        """
+        if self._hash is None:
+            self._start_hashing()
+        return hash_mix(
+            hash_mix(hash_mix(self._hash + self._deck_hash) + self._hand_hash)
+            + self._discard_hash
+        )
+
+    def _compute_hash(self) -> int:
+        """
+        Returns the hash of this player's state, excluding their piles,
+        computed from scratch.
+
+        Returns:
+            int: The hash of this player's state, excluding their piles.
+        """
+        return super()._compute_hash() ^ zobrist_keys[HASH_ENERGY][self._energy]
+
+    def _start_hashing(self) -> None:
+        """
+        Computes the hash of this player's state and the sums of their piles,
+        which are kept up to date from now on.
+        """
+        self._deck_hash = pile_hash(self._deck)
+        self._hand_hash = pile_hash(self._hand)
+        self._discard_hash = pile_hash(self._discard)
+        super()._start_hashing()
+
+    def snapshot(self) -> tuple:
+        """
+        Returns a compact, immutable copy of this player's state, including
+        their energy and the contents of their deck, hand and discard pile.
+        The player's generator is not part of the state.
+
+        Returns:
+            tuple: The state of this player.
+        """
+        return super().snapshot() + (
+            self._energy,
+            tuple(self._deck),
+            tuple(self._hand),
+            tuple(self._discard),
+        )
+
+    def restore(self, state: tuple) -> None:
+        """
+        Returns this player to a state previously returned by snapshot. The
+        deck, hand and discard lists are refilled in place.
+
+        Parameters:
+            tuple: A state returned by snapshot on this player.
+
+        Returns:
+            None
+        """
+        self._energy = state[6]
+        self._deck[:] = state[7]
+        self._hand[:] = state[8]
+        self._discard[:] = state[9]
+        if self._hash is not None:
+            self._deck_hash = pile_hash(self._deck)
+            self._hand_hash = pile_hash(self._hand)
+            self._discard_hash = pile_hash(self._discard)
+        for counts, pile in (
+            (self._deck_counts, self._deck),
+            (self._hand_counts, self._hand),
+            (self._discard_counts, self._discard),
+        ):
+            counts.clear()
+            counts.update(pile_counts(pile))
+        super().restore(state)
+
+    def save_play_state(self) -> tuple:
+        """
+        Returns the part of this player's state that play_card and the effects
+        of the played card can change: energy, block, strength and hand. It is
+        bounded in size, unlike snapshot, which also copies the piles.
+
+        Returns:
+            tuple: The state needed by undo_play.
+        """
+        return (self._energy, self._block, self._strength, tuple(self._hand))
+
+    def undo_play(self, state: tuple) -> None:
+        """
+        Reverts the most recent successful play_card, given the state returned
+        by save_play_state just before it: the played card leaves the discard
+        pile and the player's energy, block, strength and hand are restored.
+
+        Parameters:
+            tuple: The state returned by save_play_state before the play.
+
+        Returns:
+            None
+        """
+        self._energy, self._block, self._strength, hand = state
+        self._hand[:] = hand
+        card = self._discard.pop()
+        self._discard_counts[card.get_name()] -= 1
+        self._hand_counts.clear()
+        self._hand_counts.update(pile_counts(self._hand))
+        if self._hash is not None:
+            self._discard_hash -= card.get_hash_key()
+            self._hand_hash = pile_hash(self._hand)
+            self._hash = self._compute_hash()
+
+    def reset(
+        self,
+        max_hp: int,
+        cards: Sequence[Card] | None = None,
+        rng: GameRNG | None = None,
+        fast_draws: bool = False,
+    ) -> None:
+        """
+        Returns this player to the state of a new player built with the same
+        arguments, so that it can be used for another game. The deck, hand and
+        discard lists and their counts are emptied and refilled in place
+        rather than built again.
+
+        Parameters:
+            int: The maximum health points for the player.
+            Sequence[Card] | None: The player's deck, in order.
+            GameRNG | None: The generator for the player's next game.
+            bool: Whether to draw cards with draw_from_end.
+
+        Returns:
+            None
+        """
+        if self._deck is None:
+            self._deck = []
+        self._deck[:] = () if cards is None else cards
+        self._cards = self._deck
+        self._hand.clear()
+        self._discard.clear()
+        self._energy = 3
+        self._rng = rng
+        self._fast_draws = fast_draws
+        self._deck_counts.clear()
+        self._deck_counts.update(pile_counts(self._deck))
+        self._hand_counts.clear()
+        self._discard_counts.clear()
+        super().reset(max_hp)
 
     def __repr__(self) -> str:
         """
@@ -610,20 +1285,37 @@ class IronClad(Player):
     The IronClad's deck contains 5 Strike cards, 4 Defend cards, and 1 Bash card.
     """
 
-    def __init__(self) -> None:
-        super().__init__(80)
-        self._deck = [
-            Strike(),
-            Strike(),
-            Strike(),
-            Strike(),
-            Strike(),
-            Defend(),
-            Defend(),
-            Defend(),
-            Defend(),
-            Bash(),
-        ]
+    __slots__ = ()
+
+    # The deck every IronClad starts a game with, in order.
+    starting_deck = (
+        Strike(),
+        Strike(),
+        Strike(),
+        Strike(),
+        Strike(),
+        Defend(),
+        Defend(),
+        Defend(),
+        Defend(),
+        Bash(),
+    )
+
+    def __init__(self, rng: GameRNG | None = None, fast_draws: bool = False) -> None:
+        super().__init__(80, list(self.starting_deck), rng=rng, fast_draws=fast_draws)
+
+    def reset(self, rng: GameRNG | None = None, fast_draws: bool = False) -> None:
+        """
+        Returns this IronClad to the state of a new one, for another game.
+
+        Parameters:
+            GameRNG | None: The generator for the next game.
+            bool: Whether to draw cards with draw_from_end.
+
+        Returns:
+            None
+        """
+        super().reset(80, self.starting_deck, rng, fast_draws)
 
     def __repr__(self) -> str:
         """
@@ -651,22 +1343,39 @@ class Silent(Player):
     Silent’s deck contains 5 Strike cards, 5 Defend cards, 1 Neutralize card, and 1 Survivor card.
     """
 
-    def __init__(self) -> None:
-        super().__init__(70)
-        self._deck = [
-            Strike(),
-            Strike(),
-            Strike(),
-            Strike(),
-            Strike(),
-            Defend(),
-            Defend(),
-            Defend(),
-            Defend(),
-            Defend(),
-            Neutralize(),
-            Survivor(),
-        ]
+    __slots__ = ()
+
+    # The deck every Silent starts a game with, in order.
+    starting_deck = (
+        Strike(),
+        Strike(),
+        Strike(),
+        Strike(),
+        Strike(),
+        Defend(),
+        Defend(),
+        Defend(),
+        Defend(),
+        Defend(),
+        Neutralize(),
+        Survivor(),
+    )
+
+    def __init__(self, rng: GameRNG | None = None, fast_draws: bool = False) -> None:
+        super().__init__(70, list(self.starting_deck), rng=rng, fast_draws=fast_draws)
+
+    def reset(self, rng: GameRNG | None = None, fast_draws: bool = False) -> None:
+        """
+        Returns this Silent to the state of a new one, for another game.
+
+        Parameters:
+            GameRNG | None: The generator for the next game.
+            bool: Whether to draw cards with draw_from_end.
+
+        Returns:
+            None
+        """
+        super().reset(70, self.starting_deck, rng, fast_draws)
 
     def __repr__(self) -> str:
         """
@@ -679,6 +1388,109 @@ class Silent(Player):
         return self.__class__.__name__ + "()"
 
 
+class MonsterAction(NamedTuple):
+    """
+    The fixed-layout record of what a monster's action does, returned by
+    Monster.action. Actions are immutable, so monsters can return shared,
+    precomputed records.
+
+    Attributes:
+    - damage (int): The damage dealt to the player, before the monster's
+                    strength and any weak or vulnerable are applied.
+    - weak (int): The weak applied to the player.
+    - vulnerable (int): The vulnerable applied to the player.
+    - strength (int): The strength the monster gains.
+    """
+
+    damage: int = 0
+    weak: int = 0
+    vulnerable: int = 0
+    strength: int = 0
+
+
+class Intent(NamedTuple):
+    """
+    A forecast of one monster action, returned by Monster.forecast. It has the
+    layout of MonsterAction, with damage as the least damage the action can
+    deal, followed by the most it can deal.
+
+    Attributes:
+    - damage (int): The least damage the action can deal, before the
+                    monster's strength and any weak or vulnerable are applied.
+    - weak (int): The weak the action applies to the player.
+    - vulnerable (int): The vulnerable the action applies to the player.
+    - strength (int): The strength the monster gains.
+    - max_damage (int): The most damage the action can deal, on the same terms
+                        as damage.
+    """
+
+    damage: int = 0
+    weak: int = 0
+    vulnerable: int = 0
+    strength: int = 0
+    max_damage: int = 0
+
+    def is_exact(self) -> bool:
+        """
+        Returns whether the damage of the action is known exactly.
+
+        Returns:
+            bool: True if the least and most damage are equal.
+        """
+        return self.damage == self.max_damage
+
+
+class DamageForecast(NamedTuple):
+    """
+    The range of damage the player can take in one enemy turn, after strength
+    and the vulnerable and weak multipliers and before block, returned by
+    Encounter.incoming_damage.
+
+    Attributes:
+    - low (int): The damage taken if the player does nothing more to the
+                 monsters.
+    - high (int): The most damage the player can take, whatever they do.
+    """
+
+    low: int
+    high: int
+
+    def is_exact(self) -> bool:
+        """
+        Returns whether the damage is known exactly.
+
+        Returns:
+            bool: True if low and high are equal.
+        """
+        return self.low == self.high
+
+
+# The exact Intent of each MonsterAction, built the first time it is needed.
+_exact_intents: dict[MonsterAction, Intent] = {}
+
+
+def exact_intent(action: MonsterAction) -> Intent:
+    """
+    Returns the Intent of an action whose damage is known exactly.
+
+    Args:
+        action (MonsterAction): The action.
+
+    Returns:
+        Intent: The action as an exact forecast.
+    """
+    intent = _exact_intents.get(action)
+    if intent is None:
+        intent = Intent(*action, action.damage)
+        _exact_intents[action] = intent
+    return intent
+
+
+# Every type of monster, by the name used for it in game files. Every
+# subclass of Monster is registered when it is defined.
+MONSTER_TYPES: dict[str, type["Monster"]] = {}
+
+
 class Monster(Entity):
     """
     Abstract class that represents a type of entity that the user battles during encounters.
@@ -692,44 +1504,128 @@ class Monster(Entity):
     - id (int): A unique identifier for the monster.
     """
 
+    __slots__ = ("_id",)
+
     monster_count = 0
 
-    def __init__(self, max_hp: int) -> None:
+    def __init_subclass__(cls, **kwargs) -> None:
         """
-        Initializes a new instance of the Monster class
-        with the given maximum HP and a unique ID number.
+        Registers each type of monster in MONSTER_TYPES under its class name,
+        so that encounters can create it by name.
+        """
+        super().__init_subclass__(**kwargs)
+        MONSTER_TYPES[cls.__name__] = cls
+
+    @classmethod
+    def create(
+        cls, max_hp: int, rng: GameRNG | None = None, monster_id: int | None = None
+    ) -> "Monster":
+        """
+        Creates a monster of this type for an encounter. Types of monster that
+        use randomness override this to pass on rng.
 
         Args:
             max_hp (int): The maximum HP of the monster.
+            rng (GameRNG | None): The encounter's generator.
+            monster_id (int | None): The id of the monster. Defaults to the
+            next unique ID number.
 
         Returns:
-            None
+            Monster: The new monster.
         """
-        super().__init__(max_hp)
-        self._id = Monster.monster_count
-        Monster.monster_count += 1
+        return cls(max_hp, monster_id=monster_id)
 
-    def get_id(self) -> int:
+    @staticmethod
+    def _take_id(monster_id: int | None) -> int:
         """
-        Returns the unique id number of this monster.
+        Returns monster_id, or if it is None the next unique ID number, which
+        is then used up.
+
+        Args:
+            monster_id (int | None): The id asked for, if any.
 
         Returns:
-            int: Unique id number of the monster.
+            int: The id to use.
+        """
+        if monster_id is not None:
+            return monster_id
+        monster_id = Monster.monster_count
+        Monster.monster_count += 1
+        return monster_id
+
+    def __init__(self, max_hp: int, monster_id: int | None = None) -> None:
+        """
+        Initializes a new instance of the Monster class
+        with the given maximum HP and a unique ID number.
+
+        Args:
+            max_hp (int): The maximum HP of the monster.
+            monster_id (int | None): The id of the monster. Defaults to the
+            next unique ID number.
+
+        Returns:
+            None
+        """
+        super().__init__(max_hp)
+        self._id = Monster._take_id(monster_id)
+
+    def reset(
+        self, max_hp: int, rng: GameRNG | None = None, monster_id: int | None = None
+    ) -> None:
+        """
+        Returns this monster to the state of a new monster of its type, as
+        create would build it, with the next unique ID number. Types of monster
+        that use randomness override this to use rng.
+
+        Parameters:
+            int: The maximum HP of the monster.
+            GameRNG | None: The encounter's generator.
+            int | None: The id of the monster. Defaults to the next unique ID
+            number.
+
+        Returns:
+            None
+        """
+        self._id = Monster._take_id(monster_id)
+        super().reset(max_hp)
+
+    def get_id(self) -> int:
+        """
+        Returns the unique id number of this monster.
+
+        Returns:
+            int: Unique id number of the monster.
         """
         return self._id
 
-    def action(self) -> dict[str, int]:
+    def action(self) -> MonsterAction:
         """
         Performs the current action for this monster
-        and returns a dictionary describing the effects this monster's
+        and returns a record describing the effects this monster's
         action should cause to its target.
         In the abstract Monster superclass, this method should just raise a NotImplementedError.
         This method must be overwritten by the instantiable subclasses of Monster, with the
         strategies specific to each type of monster.
 
         Returns:
-            dict[str, int]:
-            A dictionary describing the effects this monster's action should cause to its target.
+            MonsterAction:
+            A record describing the effects this monster's action should cause to its target.
+        """
+        raise NotImplementedError()
+
+    def forecast(self, turns: int = 1) -> tuple[Intent, ...]:
+        """
+        Returns what this monster's actions in its next turns will be, without
+        changing its state, assuming it survives them. Where an action depends
+        on what the player does in the meantime, its Intent gives the range
+        of damage it can deal. Must be overridden by each instantiable
+        subclass of Monster.
+
+        Args:
+            turns (int): The number of turns to forecast.
+
+        Returns:
+            tuple[Intent, ...]: The Intent of each of the next turns, in order.
         """
         raise NotImplementedError()
 
@@ -737,37 +1633,139 @@ class Monster(Entity):
 class Louse(Monster):
     """
     This class inherits from the Monster class and
-    overrides the action method to return a dictionary
+    overrides the action method to return a record
     containing the amount of damage the Louse monster can inflict on its target.
     The amount of damage is randomly generated between 5 and 7 (inclusive)
-    when the Louse instance is created.
+    when the Louse instance is created, and so is the action it always returns.
     """
 
-    def __init__(self, max_hp: int) -> None:
+    __slots__ = ("_damage_amount", "_action")
+
+    @classmethod
+    def create(
+        cls, max_hp: int, rng: GameRNG | None = None, monster_id: int | None = None
+    ) -> "Louse":
+        """
+        Creates a Louse for an encounter, rolling its damage amount with rng.
+
+        Args:
+            max_hp (int): The maximum HP of the monster.
+            rng (GameRNG | None): The encounter's generator.
+            monster_id (int | None): The id of the monster. Defaults to the
+            next unique ID number.
+
+        Returns:
+            Louse: The new Louse.
+        """
+        return cls(max_hp, rng, monster_id)
+
+    def __init__(
+        self, max_hp: int, rng: GameRNG | None = None, monster_id: int | None = None
+    ) -> None:
         """
         Initializes a new instance of the Louse class
         with the given maximum HP
 
         Args:
             max_hp (int): The maximum HP of the monster.
+            rng (GameRNG | None): The generator used to roll the damage amount.
+            Defaults to None, meaning the shared default_rng.
+            monster_id (int | None): The id of the monster. Defaults to the
+            next unique ID number.
 
         Returns:
             None
         """
-        super().__init__(max_hp)
-        self._damage_amount = random_louse_amount()
+        super().__init__(max_hp, monster_id)
+        self._damage_amount = random_louse_amount(rng)
+        self._action = MonsterAction(self._damage_amount)
+
+    def snapshot(self) -> tuple:
+        """
+        Returns a compact, immutable copy of this Louse's state.
+
+        Returns:
+            tuple: The state of this Louse.
+        """
+        return super().snapshot() + (self._damage_amount,)
+
+    def restore(self, state: tuple) -> None:
+        """
+        Returns this Louse to a state previously returned by snapshot.
+
+        Parameters:
+            tuple: A state returned by snapshot on this Louse.
+
+        Returns:
+            None
+        """
+        self._damage_amount = state[6]
+        self._action = MonsterAction(self._damage_amount)
+        super().restore(state)
 
-    def action(self) -> dict[str, int]:
+    def reset(
+        self, max_hp: int, rng: GameRNG | None = None, monster_id: int | None = None
+    ) -> None:
+        """
+        Returns this Louse to the state of a new one, rolling its damage amount
+        again with rng.
+
+        Parameters:
+            int: The maximum HP of the monster.
+            GameRNG | None: The encounter's generator.
+            int | None: The id of the monster. Defaults to the next unique ID
+            number.
+
+        Returns:
+            None
+        """
+        self._damage_amount = random_louse_amount(rng)
+        self._action = MonsterAction(self._damage_amount)
+        super().reset(max_hp, rng, monster_id)
+
+    def _compute_hash(self) -> int:
+        """
+        Returns the hash of this Louse's state, including its damage amount,
+        computed from scratch.
+
+        Returns:
+            int: The hash of this Louse's state.
+        """
+        return super()._compute_hash() ^ zobrist_keys[HASH_EXTRA][self._damage_amount]
+
+    def get_damage_amount(self) -> int:
+        """
+        Returns the amount of damage this Louse deals with each action.
+
+        Returns:
+            int: The amount of damage this Louse deals with each action.
+        """
+        return self._damage_amount
+
+    def action(self) -> MonsterAction:
         """
         Performs the current action for this Louse
-        and returns a dictionary describing the effects this monster's
+        and returns a record describing the effects this monster's
         action should cause to its target.
 
         Returns:
-            dict[str, int]:
-            A dictionary describing the effects this monster's action should cause to its target.
+            MonsterAction:
+            A record describing the effects this monster's action should cause to its target.
         """
-        return {"damage": self._damage_amount}
+        return self._action
+
+    def forecast(self, turns: int = 1) -> tuple[Intent, ...]:
+        """
+        Returns the Intent of this Louse's next turns. A Louse's damage amount
+        is rolled when it is created, so every turn is the same and exact.
+
+        Args:
+            turns (int): The number of turns to forecast.
+
+        Returns:
+            tuple[Intent, ...]: The Intent of each of the next turns, in order.
+        """
+        return (exact_intent(self._action),) * turns
 
 
 class Cultist(Monster):
@@ -775,28 +1773,123 @@ class Cultist(Monster):
     A subclass of Monster representing a Cultist.
 
     Inherits from Monster class and has an action method that
-    returns a dictionary containing the damage and weak values.
+    returns a record containing the damage and weak values.
+
+    A Cultist's actions depend only on how many times it has acted, so they
+    are computed once into a schedule shared by every Cultist.
     """
 
-    def __init__(self, max_hp: int) -> None:
+    __slots__ = ("_num_calls", "_damage_amount", "_weak_amount")
+
+    _schedule: list[MonsterAction] = []
+
+    @staticmethod
+    def scheduled_action(num_calls: int) -> MonsterAction:
+        """
+        Returns the action of a Cultist that has already acted num_calls
+        times, extending the shared schedule if it is not that long yet.
+
+        Args:
+            num_calls (int): The number of earlier calls to action.
+
+        Returns:
+            MonsterAction: The action.
+        """
+        schedule = Cultist._schedule
+        while len(schedule) <= num_calls:
+            calls = len(schedule)
+            # no damage on the first call, then 6 + the number of calls so
+            # far, with weak alternating between 0 and 1
+            schedule.append(MonsterAction(0 if calls == 0 else calls + 6, calls % 2))
+        return schedule[num_calls]
+
+    def __init__(self, max_hp: int, monster_id: int | None = None) -> None:
         """
         Initializes a new instance of the Cultist class
         with the given maximum HP
 
         Args:
             max_hp (int): The maximum HP of the monster.
+            monster_id (int | None): The id of the monster. Defaults to the
+            next unique ID number.
+
+        Returns:
+            None
+        """
+        super().__init__(max_hp, monster_id)
+        self._num_calls = 0
+        self._damage_amount = 0
+        self._weak_amount = 0
+
+    def snapshot(self) -> tuple:
+        """
+        Returns a compact, immutable copy of this Cultist's state.
+
+        Returns:
+            tuple: The state of this Cultist.
+        """
+        return super().snapshot() + (
+            self._num_calls,
+            self._damage_amount,
+            self._weak_amount,
+        )
+
+    def restore(self, state: tuple) -> None:
+        """
+        Returns this Cultist to a state previously returned by snapshot.
+
+        Parameters:
+            tuple: A state returned by snapshot on this Cultist.
+
+        Returns:
+            None
+        """
+        self._num_calls, self._damage_amount, self._weak_amount = state[6:]
+        super().restore(state)
+
+    def reset(
+        self, max_hp: int, rng: GameRNG | None = None, monster_id: int | None = None
+    ) -> None:
+        """
+        Returns this Cultist to the state of a new one, before its first action.
+
+        Parameters:
+            int: The maximum HP of the monster.
+            GameRNG | None: Unused, as Cultists do not use randomness.
+            int | None: The id of the monster. Defaults to the next unique ID
+            number.
 
         Returns:
             None
         """
-        super().__init__(max_hp)
         self._num_calls = 0
         self._damage_amount = 0
         self._weak_amount = 0
+        super().reset(max_hp, rng, monster_id)
+
+    def _compute_hash(self) -> int:
+        """
+        Returns the hash of this Cultist's state computed from scratch. Only
+        the number of calls is included, as the damage and weak amounts of its
+        next action follow from it.
+
+        Returns:
+            int: The hash of this Cultist's state.
+        """
+        return super()._compute_hash() ^ zobrist_keys[HASH_EXTRA][self._num_calls]
+
+    def get_num_calls(self) -> int:
+        """
+        Returns the number of times action has been called on this Cultist.
+
+        Returns:
+            int: The number of times action has been called on this Cultist.
+        """
+        return self._num_calls
 
-    def action(self) -> dict[str, int]:
+    def action(self) -> MonsterAction:
         """
-        Returns a dictionary containing the damage and weak values for a specific Cultist instance.
+        Returns a record containing the damage and weak values for a specific Cultist instance.
 
         For each Cultist instance, damage_amount is 0 the first time action is called.
         For each subsequent call to action,
@@ -807,47 +1900,109 @@ class Cultist(Monster):
         starting at 0 for the first call.
 
         Returns:
-
-            A dictionary containing the damage and weak values.
-            {
-                'damage': damage_amount,
-                'weak': weak_amount
-            }
+            MonsterAction:
+            A record containing the damage and weak values.
         """
-        # set damage to 0 if action has not been called
-        if self._num_calls == 0:
-            self._damage_amount = 0
-        # calculate new damage amount using number of times action has been called
-        else:
-            self._damage_amount = self._num_calls + 6
-        # set weak amount to alternate between 0 and 1
-        self._weak_amount = self._num_calls % 2
+        # look up this call's damage and weak amounts in the schedule
+        action = Cultist.scheduled_action(self._num_calls)
+        self._damage_amount = action.damage
+        self._weak_amount = action.weak
         # update the number of times action has been called
         self._num_calls += 1
-        return {"damage": self._damage_amount, "weak": self._weak_amount}
+        if self._hash is not None:
+            keys = zobrist_keys[HASH_EXTRA]
+            self._hash ^= keys[self._num_calls - 1] ^ keys[self._num_calls]
+        return action
+
+    def forecast(self, turns: int = 1) -> tuple[Intent, ...]:
+        """
+        Returns the Intent of this Cultist's next turns, read from the shared
+        schedule. They do not depend on the player, so they are exact.
+
+        Args:
+            turns (int): The number of turns to forecast.
+
+        Returns:
+            tuple[Intent, ...]: The Intent of each of the next turns, in order.
+        """
+        calls = self._num_calls
+        return tuple(
+            exact_intent(Cultist.scheduled_action(calls + turn))
+            for turn in range(turns)
+        )
 
 
 class JawWorm(Monster):
     """
     A class representing a monster called JawWorm, which inherits from the Monster class.
+
+    Its actions only depend on the damage it deals, so they are shared
+    between every JawWorm and created once for each amount of damage.
     """
 
-    def __init__(self, max_hp: int) -> None:
+    __slots__ = ("_damage_taken", "_damage_amount")
+
+    _actions: dict[int, MonsterAction] = {}
+
+    def __init__(self, max_hp: int, monster_id: int | None = None) -> None:
         """
         Initializes a new instance of the JawWorm class
         with the given maximum HP
 
         Args:
             max_hp (int): The maximum HP of the monster.
+            monster_id (int | None): The id of the monster. Defaults to the
+            next unique ID number.
+
+        Returns:
+            None
+        """
+        super().__init__(max_hp, monster_id)
+        self._damage_taken = 0
+        self._damage_amount = 0
+
+    def snapshot(self) -> tuple:
+        """
+        Returns a compact, immutable copy of this JawWorm's state.
+
+        Returns:
+            tuple: The state of this JawWorm.
+        """
+        return super().snapshot() + (self._damage_taken, self._damage_amount)
+
+    def restore(self, state: tuple) -> None:
+        """
+        Returns this JawWorm to a state previously returned by snapshot.
+
+        Parameters:
+            tuple: A state returned by snapshot on this JawWorm.
+
+        Returns:
+            None
+        """
+        super().restore(state)
+        self._damage_taken, self._damage_amount = state[6:]
+
+    def reset(
+        self, max_hp: int, rng: GameRNG | None = None, monster_id: int | None = None
+    ) -> None:
+        """
+        Returns this JawWorm to the state of a new one, before its first action.
+
+        Parameters:
+            int: The maximum HP of the monster.
+            GameRNG | None: Unused, as JawWorms do not use randomness.
+            int | None: The id of the monster. Defaults to the next unique ID
+            number.
 
         Returns:
             None
         """
-        super().__init__(max_hp)
         self._damage_taken = 0
         self._damage_amount = 0
+        super().reset(max_hp, rng, monster_id)
 
-    def action(self) -> dict[str, int]:
+    def action(self) -> MonsterAction:
         """
         Each time action is called on a JawWorm instance, the following effects occur:
         - Half of the amount of damage the jaw worm has taken so far (rounding up)
@@ -859,15 +2014,39 @@ class JawWorm(Monster):
         between the jaw worm's maximum HP and its current HP.
 
         Returns:
-            dict[str, int]:
-            A dictionary describing the effects this monster's action should cause to its target.
+            MonsterAction:
+            A record describing the effects this monster's action should cause to its target.
         """
         self._damage_taken = self._max_hp - self._hp
         # round up for block amount
+        old_block = self._block
         self._block = (self._damage_taken + 1) // 2
+        if self._hash is not None:
+            keys = zobrist_keys[HASH_BLOCK]
+            self._hash ^= keys[old_block] ^ keys[self._block]
         # round down for damage taken
         self._damage_amount = self._damage_taken // 2
-        return {"damage": self._damage_amount}
+        action = JawWorm._actions.get(self._damage_amount)
+        if action is None:
+            action = MonsterAction(self._damage_amount)
+            JawWorm._actions[self._damage_amount] = action
+        return action
+
+    def forecast(self, turns: int = 1) -> tuple[Intent, ...]:
+        """
+        Returns the Intent of this JawWorm's next turns. Its damage is half the
+        damage it has taken by the time it acts, so each turn deals at least
+        what it would deal now, and at most what it would deal on 1 HP.
+
+        Args:
+            turns (int): The number of turns to forecast.
+
+        Returns:
+            tuple[Intent, ...]: The Intent of each of the next turns, in order.
+        """
+        least = (self._max_hp - self._hp) // 2
+        most = max(least, (self._max_hp - 1) // 2)
+        return (Intent(least, max_damage=most),) * turns
 
 
 class Encounter:
@@ -875,9 +2054,20 @@ class Encounter:
     Each encounter in the game is represented as an instance of the Encounter class.
     This class manages one player and a set of 1 to 3 monsters,
     and facilitates the interactions between the player and monsters.
+
+    Only monsters that have not been defeated are kept, both in order and in
+    an index by id, so finding a target and checking whether the encounter
+    is still active are O(1).
     """
 
-    def __init__(self, player: Player, monsters: list[tuple[str, int]]) -> None:
+    def __init__(
+        self,
+        player: Player,
+        monsters: list[tuple[str, int]],
+        rng: GameRNG | None = None,
+        bus: EventBus | None = None,
+        first_id: int | None = None,
+    ) -> None:
         """
         Initializes a new encounter for the player with a list of monsters.
 
@@ -886,23 +2076,110 @@ class Encounter:
             monsters (list[tuple[str, int]]):
             A list of tuples describing the monsters in the encounter. Each tuple contains
             the name (type) of the monster and the monster's max HP.
+            rng (GameRNG | None): The generator used for any randomness when
+            creating monsters. Defaults to the player's generator.
+            bus (EventBus | None): Receives the events of this encounter,
+            starting with the player's first turn. Defaults to None, meaning
+            no events are built.
+            first_id (int | None): If given, the monsters are numbered from
+            first_id in order. Defaults to None, meaning they take the next
+            unique ID numbers.
 
         Returns:
             None
         """
-        self._player = player
         self._monsters = []
+        self._monster_index = {}
+        # Every monster this encounter has built, defeated or not, for reset
+        # to use again.
+        self._built = []
+        self.reset(player, monsters, rng, bus, first_id)
+
+    def reset(
+        self,
+        player: Player,
+        monsters: list[tuple[str, int]],
+        rng: GameRNG | None = None,
+        bus: EventBus | None = None,
+        first_id: int | None = None,
+    ) -> None:
+        """
+        Starts a new encounter in this object, exactly as building a new
+        Encounter with the same arguments would, including the order in which
+        rng is used and the ids given to the monsters. Monsters this encounter
+        built before are reset in place where one of the right type is free,
+        and the lists and index are refilled in place. Snapshots taken before
+        a reset cannot be restored after it.
+
+        Parameters:
+            Player: The player participating in the encounter.
+            list[tuple[str, int]]: The name (type) and max HP of each monster.
+            GameRNG | None: The generator used for any randomness when creating
+            monsters. Defaults to the player's generator.
+            EventBus | None: Receives the events of this encounter.
+            int | None: If given, the monsters are numbered from it in order,
+            rather than taking the next unique ID numbers.
+
+        Returns:
+            None
+        """
+        self._player = player
+        if rng is None:
+            rng = player.get_rng()
+        self._monsters.clear()
+        built = self._built
         # iterate over monsters to create the required monster instances
         for monster_type, max_hp in monsters:
-            if monster_type == "Louse":
-                self._monsters.append(Louse(max_hp))
-            elif monster_type == "Cultist":
-                self._monsters.append(Cultist(max_hp))
-            elif monster_type == "JawWorm":
-                self._monsters.append(JawWorm(max_hp))
+            monster_class = MONSTER_TYPES.get(monster_type)
+            if monster_class is None:
+                continue
+            # The monsters in use are kept at the front of built
+            used = len(self._monsters)
+            monster_id = None if first_id is None else first_id + used
+            for position in range(used, len(built)):
+                monster = built[position]
+                if type(monster) is monster_class:
+                    built[position] = built[used]
+                    monster.reset(max_hp, rng, monster_id)
+                    break
+            else:
+                monster = monster_class.create(max_hp, rng, monster_id)
+                built.append(built[used] if used < len(built) else monster)
+            built[used] = monster
+            self._monsters.append(monster)
+        self._monster_index.clear()
+        for monster in self._monsters:
+            self._monster_index[monster.get_id()] = monster
+        self.set_event_bus(bus)
         self._player.start_new_encounter()
         self._player_turn = True
+        self._undo_log = None
         self._player.new_turn()
+        if bus is not None:
+            bus.emit(TurnStarted(self._player))
+
+    def set_event_bus(self, bus: EventBus | None) -> None:
+        """
+        Sends the events of this encounter, and of its player and remaining
+        monsters, to bus from now on, or stops building events if bus is
+        None. The player reports to the bus of the encounter it joined last.
+
+        Args:
+            bus (EventBus | None): The bus, or None.
+        """
+        self._bus = bus
+        self._player._bus = bus
+        for monster in self._monsters:
+            monster._bus = bus
+
+    def get_event_bus(self) -> EventBus | None:
+        """
+        Returns the bus this encounter's events are sent to.
+
+        Returns:
+            EventBus | None: The bus, or None if events are not built.
+        """
+        return self._bus
 
     def start_new_turn(self) -> None:
         """
@@ -912,6 +2189,8 @@ class Encounter:
         """
         self._player_turn = True
         self._player.new_turn()
+        if self._bus is not None:
+            self._bus.emit(TurnStarted(self._player))
 
     def end_player_turn(self) -> None:
         """
@@ -923,10 +2202,114 @@ class Encounter:
         """
         self._player_turn = False
         self._player.end_turn()
+        if self._bus is not None:
+            self._bus.emit(TurnEnded(self._player))
+        if self._undo_log is not None:
+            self._undo_log.clear()
         # start a new turn for each monster
         for monster in self._monsters:
             monster.new_turn()
 
+    def snapshot(self) -> tuple:
+        """
+        Returns a compact copy of the state of this encounter: the player's
+        state, each remaining monster with its state, and whose turn it is.
+        It holds references to this encounter's monsters and can only be
+        restored into this encounter. Random generators are not included.
+
+        Returns:
+            tuple: The state of this encounter.
+        """
+        return (
+            self._player.snapshot(),
+            tuple((monster, monster.snapshot()) for monster in self._monsters),
+            self._player_turn,
+        )
+
+    def restore(self, state: tuple) -> None:
+        """
+        Returns this encounter to a state previously returned by snapshot,
+        bringing back any monsters defeated since. The undo log is cleared.
+
+        Parameters:
+            tuple: A state returned by snapshot on this encounter.
+
+        Returns:
+            None
+        """
+        player_state, monster_states, self._player_turn = state
+        self._player.restore(player_state)
+        self._monsters[:] = [monster for monster, _ in monster_states]
+        self._monster_index.clear()
+        for monster, monster_state in monster_states:
+            monster.restore(monster_state)
+            self._monster_index[monster.get_id()] = monster
+        if self._undo_log is not None:
+            self._undo_log.clear()
+
+    def state_hash(self) -> int:
+        """
+        Returns a 64-bit hash of the full state of this encounter: the player,
+        including their piles as multisets, each remaining monster in order,
+        and whose turn it is. Equivalent states, e.g. the same cards in a
+        different order, or the same monsters with different ids, have the
+        same hash. After the first call, which starts hashing the player and
+        monsters, it costs O(1) per monster, as the parts are maintained
+        incrementally as the state changes.
+
+        Returns:
+            int: The hash of the state of this encounter.
+        """
+        state = hash_mix(self._player.state_hash() + self._player_turn)
+        for monster in self._monsters:
+            state = hash_mix(state + monster.state_hash())
+        return state
+
+    def enable_undo(self) -> None:
+        """
+        Starts recording successful calls to player_apply_card so that they can
+        be reverted with undo. Each record costs a bounded amount of work,
+        independent of the size of the deck. The log is cleared whenever the
+        player's turn ends, so only plays in the current turn can be undone.
+        """
+        if self._undo_log is None:
+            self._undo_log = []
+
+    def disable_undo(self) -> None:
+        """
+        Stops recording plays and discards the undo log.
+        """
+        self._undo_log = None
+
+    def undo(self) -> bool:
+        """
+        Reverts the most recent recorded play, including any damage and status
+        applied to its target, and brings the target back if it was defeated.
+
+        Returns:
+            bool: True if a play was reverted, and False if there was none.
+        """
+        if not self._undo_log:
+            return False
+        player_state, target, target_state, position = self._undo_log.pop()
+        self._player.undo_play(player_state)
+        if target is not None:
+            target.restore(target_state)
+            if position is not None:
+                self._monsters.insert(position, target)
+                self._monster_index[target.get_id()] = target
+        return True
+
+    def is_player_turn(self) -> bool:
+        """
+        Returns True if it is the player's turn, i.e. the player is permitted to
+        attempt to apply cards, and False otherwise.
+
+        Returns:
+            bool: True if it is the player's turn, and False otherwise.
+        """
+        return self._player_turn
+
     def get_player(self) -> Player:
         """
         Returns the player in this encounter.
@@ -939,18 +2322,28 @@ class Encounter:
     def get_monsters(self) -> list[Monster]:
         """
         Returns a list of Monster objects representing the monsters remaining in this encounter.
+        The list is maintained by the encounter rather than built on each
+        call, so it must not be modified, and it changes as monsters are
+        defeated.
 
         Returns:
             list[Monster]:
             A list of Monster objects representing the monsters remaining in this encounter.
         """
-        remaining_monsters = []
+        return self._monsters
 
-        # iterate over monsters to check defeated status
-        for monster in self._monsters:
-            if monster.is_defeated() is False:
-                remaining_monsters.append(monster)
-        return remaining_monsters
+    def get_monster(self, monster_id: int) -> Monster | None:
+        """
+        Returns the remaining monster with the given id, in O(1).
+
+        Args:
+            monster_id (int): The id of the monster.
+
+        Returns:
+            Monster | None: The monster, or None if no monster with that id
+            remains in this encounter.
+        """
+        return self._monster_index.get(monster_id)
 
     def is_active(self) -> bool:
         """
@@ -959,10 +2352,91 @@ class Encounter:
         Returns:
             bool: True if there are monsters remaining in this encounter, and False otherwise
         """
-        for monster in self._monsters:
-            if monster.is_defeated() is False:
-                return True
-        return False
+        return len(self._monsters) > 0
+
+    def rejection_reason(
+        self, card_name: str, target_id: int | None = None
+    ) -> str | None:
+        """
+        Returns why player_apply_card would refuse to play a card, checking in
+        the same order. This is for reporting only, and is not used when cards
+        are played.
+
+        Args:
+            card_name (str): The name of the card.
+            target_id (int | None): The id of the target monster, if any.
+
+        Returns:
+            str | None: One of "no energy", "not player turn", "unknown card",
+            "missing target", "unknown target", "not in hand" and "too
+            expensive", or None if the card can be played.
+        """
+        player = self._player
+        if player.get_energy() <= 0:
+            return "no energy"
+        if not self._player_turn:
+            return "not player turn"
+        effect = CARD_EFFECTS.get(card_name)
+        if effect is None:
+            return "unknown card"
+        if effect.target and target_id is None:
+            return "missing target"
+        if target_id is not None and target_id not in self._monster_index:
+            return "unknown target"
+        if not player.get_hand_counts().get(card_name):
+            return "not in hand"
+        if player.get_energy() < effect.cost:
+            return "too expensive"
+        return None
+
+    def incoming_damage(
+        self, turns: int = 1, monster_id: int | None = None
+    ) -> tuple[DamageForecast, ...]:
+        """
+        Forecasts the damage the player will take from the remaining monsters
+        in each of the next enemy turns, from the monsters' forecasts, without
+        changing any state. The enemy turns are followed as enemy_turn plays
+        them: each monster's strength, the vulnerable its actions give the
+        player, and the wearing off of the player's vulnerable and the
+        monsters' weak between turns. The low end assumes the player does not
+        damage or weaken the monsters any further; the high end holds
+        whatever the player does. Monsters the player defeats deal nothing,
+        so both ends assume every monster survives.
+
+        Args:
+            turns (int): The number of enemy turns to forecast.
+            monster_id (int | None): If given, only the damage of this monster
+            is counted.
+
+        Returns:
+            tuple[DamageForecast, ...]: The damage of each of the next enemy
+            turns, before block.
+        """
+        monsters = self._monsters
+        forecasts = [monster.forecast(turns) for monster in monsters]
+        strengths = [monster.get_strength() for monster in monsters]
+        vulnerable = self._player.get_vulnerable()
+        # The monsters' weak wears off as the player's turn ends, before they
+        # act, unless the player's turn has already ended.
+        elapsed = 1 if self._player_turn else 0
+        results = []
+        for turn in range(turns):
+            low = high = 0
+            for position, monster in enumerate(monsters):
+                intent = forecasts[position][turn]
+                vulnerable += intent.vulnerable
+                strengths[position] += intent.strength
+                if monster_id is not None and monster.get_id() != monster_id:
+                    continue
+                strength = strengths[position]
+                is_vulnerable = vulnerable > 0
+                weak = monster.get_weak() > turn + elapsed
+                low += scale_damage(strength + intent.damage, is_vulnerable, weak)
+                high += scale_damage(strength + intent.max_damage, is_vulnerable, weak)
+            results.append(DamageForecast(low, high))
+            # The player's vulnerable wears off as their next turn starts.
+            vulnerable = max(vulnerable - 1, 0)
+        return tuple(results)
 
     def player_apply_card(self, card_name: str, target_id: int | None = None) -> bool:
         """
@@ -992,9 +2466,8 @@ class Encounter:
             If the target is vulnerable (i.e. their vulnerable stat is non-zero)
             the damage should be multiplied by 1.5 and if the player is weak
             (i.e. their weak stat is non-zero) it should be multiplied by 0.75.
-            The damage amount should be converted to an int before being applied to the target.
-            Int conversions should round down
-            (note that this is the default behaviour of type casting to an int).
+            The damage is truncated toward zero, as int() would, using exact
+            integer arithmetic (see sts_damage.scale_damage).
             (c) If the target has been defeated, remove them from the list of monsters.
 
         5. Return True to indicate that the function executed successfully.
@@ -1016,48 +2489,69 @@ class Encounter:
         if not self._player_turn:
             return False
 
-        if card_name not in ("Strike", "Defend", "Bash", "Neutralize", "Survivor"):
+        effect = CARD_EFFECTS.get(card_name)
+        if effect is None:
             return False
 
-        if card_name in ("Strike", "Bash", "Neutralize") and target_id is None:
+        if effect.target and target_id is None:
             return False
 
-        monster_ids = []
-        for monster in self._monsters:
-            monster_ids.append(monster.get_id())
-        if target_id is not None and target_id not in monster_ids:
-            return False
+        target = None
+        if target_id is not None:
+            target = self._monster_index.get(target_id)
+            if target is None:
+                return False
+
+        # Record what the play may change, so that it can be undone
+        undo_log = self._undo_log
+        if undo_log is not None:
+            undo_entry = [
+                self._player.save_play_state(),
+                target,
+                None if target is None else target.snapshot(),
+                None,
+            ]
 
         # Step 2: attempt to play the card, if played store it in a variable
         card = self._player.play_card(card_name)
 
         if card is None:
             return False
+        bus = self._bus
+        if bus is not None:
+            bus.emit(CardPlayed(self._player, card_name, target))
 
         # Step 3: add any block and strength from the card to the player
-        self._player.add_block(card.get_block())
-        if "strength" in card.get_status_modifiers():
-            self._player.add_strength(card.get_status_modifiers()["strength"])
+        if effect.block:
+            self._player.add_block(effect.block)
+        if effect.strength:
+            self._player.add_strength(effect.strength)
 
         # Step 4: if a target was specified, apply vulnerable and weak, calculate and apply damage
-        for monster in self._monsters:
-            if monster.get_id() == target_id:
-                target = monster
-                if "vulnerable" in card.get_status_modifiers():
-                    target.add_vulnerable(card.get_status_modifiers()["vulnerable"])
-                if "weak" in card.get_status_modifiers():
-                    target.add_weak(card.get_status_modifiers()["weak"])
-
-                damage = card.get_damage_amount() + self._player.get_strength()
-                if target.get_vulnerable() > 0:
-                    damage *= 1.5
-                if self._player.get_weak() > 0:
-                    damage *= 0.75
-
-                damage = int(damage)
-                target.reduce_hp(damage)
-                if target.is_defeated() is True:
-                    self._monsters.remove(target)
+        if target is not None:
+            if effect.vulnerable:
+                target.add_vulnerable(effect.vulnerable)
+            if effect.weak:
+                target.add_weak(effect.weak)
+
+            damage = effect.damage + self._player.get_strength()
+            vulnerable = target.get_vulnerable() > 0
+            weak = self._player.get_weak() > 0
+            if vulnerable or weak:
+                damage = scale_damage(damage, vulnerable, weak)
+            if bus is not None:
+                bus.emit(DamageApplied(self._player, target, damage))
+            target.reduce_hp(damage)
+            if target.is_defeated() is True:
+                if undo_log is not None:
+                    undo_entry[3] = self._monsters.index(target)
+                self._monsters.remove(target)
+                del self._monster_index[target_id]
+                if bus is not None:
+                    bus.emit(MonsterDefeated(target))
+
+        if undo_log is not None:
+            undo_log.append(tuple(undo_entry))
 
         # Step 5: return True to indicate success
         return True
@@ -1075,7 +2569,7 @@ class Encounter:
         the monster’s action, plus the strength of the monster.
         If the player is vulnerable the damage should be
         multiplied by 1.5 and if the monster is weak it should be multiplied by 0.75.
-        The damage amount should be converted to an int before being applied to the player.
+        The damage is truncated toward zero with sts_damage.scale_damage.
         Once all monster’s have played an action, this method starts a new turn.
 
         Returns:
@@ -1090,29 +2584,246 @@ class Encounter:
             action = monster.action()
 
             # Add weak and vulnerable to player
-            if "weak" in action:
-                self._player.add_weak(action["weak"])
-            if "vulnerable" in action:
-                self._player.add_vulnerable(action["vulnerable"])
+            if action.weak:
+                self._player.add_weak(action.weak)
+            if action.vulnerable:
+                self._player.add_vulnerable(action.vulnerable)
 
             # Add strength to monster
-            if "strength" in action:
-                monster.add_strength(action["strength"])
+            if action.strength:
+                monster.add_strength(action.strength)
 
             # Damage calculation and application
-            damage = +monster.get_strength() + action["damage"]
-            if self._player.get_vulnerable() > 0:
-                damage *= 1.5
-            if monster.get_weak() > 0:
-                damage *= 0.75
-            damage = int(damage)
+            damage = monster.get_strength() + action.damage
+            vulnerable = self._player.get_vulnerable() > 0
+            weak = monster.get_weak() > 0
+            if vulnerable or weak:
+                damage = scale_damage(damage, vulnerable, weak)
+            if self._bus is not None:
+                self._bus.emit(DamageApplied(monster, self._player, damage))
             self._player.reduce_hp(damage)
 
         # Start a new turn
         self.start_new_turn()
 
 
-def main():
+PLAYER_TYPES = {"ironclad": IronClad, "silent": Silent}
+
+
+class GameSession:
+    """
+    One game as played by main(), driven one line of input at a time. The
+    session asks for a player type, then a game file, then moves until the game
+    is won or lost, and writes exactly what main() prints. It does no input of
+    its own, so a game can be played from a script, a recording or a network
+    connection as well as from the terminal.
+
+    Monster ids are numbered from 0 within each session, as in a fresh run of
+    main(), however many other sessions are in progress.
+    """
+
+    def __init__(
+        self,
+        renderer: Renderer | None = None,
+        rng: GameRNG | None = None,
+        output: IO[str] | None = None,
+        game_loader: Callable[[str], Sequence[Sequence[tuple[str, int]]]] = (
+            read_game_file
+        ),
+    ) -> None:
+        """
+        Starts a session, waiting for the player type.
+
+        Args:
+            renderer (Renderer | None): Draws the encounter states. Defaults to
+            a Renderer drawing every state on output.
+            rng (GameRNG | None): The generator for the game. Defaults to the
+            shared default_rng, as used by main().
+            output (IO[str] | None): Where to write. Defaults to whatever
+            sys.stdout is at the time.
+            game_loader (Callable): Reads a game file into its encounters.
+            Defaults to read_game_file.
+
+        Returns:
+            None
+        """
+        self._renderer = renderer if renderer is not None else Renderer(output)
+        self._rng = rng
+        self._output = output
+        self._game_loader = game_loader
+        self._player = None
+        self._encounters = iter(())
+        self._encounter = None
+        self._monster_count = 0
+        self._prompt = PLAYER_TYPE_PROMPT
+        self._won = False
+
+    def get_prompt(self) -> str | None:
+        """
+        Returns the prompt for the next line of input.
+
+        Returns:
+            str | None: The prompt, or None once the game is over.
+        """
+        return self._prompt
+
+    def is_finished(self) -> bool:
+        """
+        Returns whether the game is over.
+
+        Returns:
+            bool: True once the game has been won or lost.
+        """
+        return self._prompt is None
+
+    def has_won(self) -> bool:
+        """
+        Returns whether the player has won the game.
+
+        Returns:
+            bool: True if every encounter has been won.
+        """
+        return self._won
+
+    def get_player(self) -> Player | None:
+        """
+        Returns the player, once the player type has been given.
+
+        Returns:
+            Player | None: The player, or None before the player type is given.
+        """
+        return self._player
+
+    def get_encounter(self) -> Encounter | None:
+        """
+        Returns the encounter in progress, or the last one played.
+
+        Returns:
+            Encounter | None: The encounter, or None before the game file is
+            given.
+        """
+        return self._encounter
+
+    def _write(self, text: str) -> None:
+        """
+        Writes text to the session's output.
+
+        Args:
+            text (str): The text to write.
+        """
+        (self._output if self._output is not None else sys.stdout).write(text)
+
+    def send(self, line: str) -> None:
+        """
+        Processes one line of input, the answer to the current prompt, and
+        writes the game's response.
+
+        Args:
+            line (str): The line of input, without its newline.
+
+        Raises:
+            ValueError: If the game is over or the player type is not known.
+            Errors from reading the game file are passed on.
+        """
+        if self._prompt == MOVE_PROMPT:
+            self._move(line)
+        elif self._prompt == PLAYER_TYPE_PROMPT:
+            player_class = PLAYER_TYPES.get(line)
+            if player_class is None:
+                raise ValueError(f"unknown player type {line!r}")
+            self._player = player_class(self._rng)
+            self._prompt = GAME_FILE_PROMPT
+        elif self._prompt == GAME_FILE_PROMPT:
+            self._encounters = iter(self._game_loader(line))
+            self._next_encounter()
+        else:
+            raise ValueError("the game is over")
+
+    def _next_encounter(self) -> None:
+        """
+        Starts the next encounter of the game file, or wins the game if there
+        are none left.
+        """
+        for monsters in self._encounters:
+            self._encounter = Encounter(
+                self._player, monsters, first_id=self._monster_count
+            )
+            self._monster_count += len(self._encounter.get_monsters())
+            self._write("New encounter!\n\n")
+            self._renderer.render(self._encounter, force=True)
+            if self._encounter.is_active():
+                self._prompt = MOVE_PROMPT
+                return
+            self._player.end_turn()
+            self._write(f"{ENCOUNTER_WIN_MESSAGE}\n")
+        self._write(f"{GAME_WIN_MESSAGE}\n")
+        self._prompt = None
+        self._won = True
+
+    def _move(self, move_name: str) -> None:
+        """
+        Carries out one move, as described in main().
+
+        Args:
+            move_name (str): The move entered.
+        """
+        encounter = self._encounter
+        player = self._player
+        if move_name == "end turn":
+            encounter.end_player_turn()
+            encounter.enemy_turn()
+            if player.is_defeated():
+                self._write(f"{GAME_LOSE_MESSAGE}\n")
+                self._prompt = None
+                return
+            self._renderer.render(encounter)
+
+        elif move_name == "inspect deck":
+            self._write(f"\n{player.get_deck()}\n\n")
+
+        elif move_name == "inspect discard":
+            self._write(f"\n{player.get_discarded()}\n\n")
+
+        elif move_name[0:9] == "describe " and move_name[9:] in CARD_EFFECTS:
+            self._write(f"\n{CARD_EFFECTS[move_name[9:]].description}\n\n")
+
+        elif move_name[0:4] == "play":
+            words = move_name.split()
+            if len(words) == 2:
+                applied = encounter.player_apply_card(words[1])
+            elif len(words) == 3 and _is_int(words[2]):
+                applied = encounter.player_apply_card(words[1], int(words[2]))
+            else:
+                applied = False
+            if applied:
+                self._renderer.render(encounter)
+            else:
+                self._write(f"{CARD_FAILURE_MESSAGE}\n")
+
+        if not encounter.is_active():
+            player.end_turn()
+            self._write(f"{ENCOUNTER_WIN_MESSAGE}\n")
+            self._next_encounter()
+
+
+def _is_int(text: str) -> bool:
+    """
+    Returns whether text is an integer, as accepted by int().
+
+    Args:
+        text (str): The text to check.
+
+    Returns:
+        bool: True if int(text) would succeed.
+    """
+    try:
+        int(text)
+    except ValueError:
+        return False
+    return True
+
+
+def main(renderer: Renderer | None = None):
     """
     This function prompts the user to select a type of player ('ironclad' or 'silent')
     and creates the relevant player instance.
@@ -1151,94 +2862,40 @@ def main():
                         the card is played on the monster with the specified target_id,
                         if it exists in the encounter.
                          Otherwise, an error message is printed.
+
+    Args:
+        renderer (Renderer | None): Draws the encounter states. Each encounter
+        is always drawn when it starts, unless the renderer is quiet. Defaults
+        to a Renderer that draws every state on standard output.
     """
     # Implement this only once you've finished and tested ALL of the required
     # classes.
 
-    # ask for player type and store as variable
-    player_type = input("Enter a player type: ")
-    if player_type == "ironclad":
-        player = IronClad()
-    elif player_type == "silent":
-        player = Silent()
-
-    # ask for file and store as variable
-    filename = input("Enter a game file: ")
-    game_data = read_game_file(filename)
-
-    # iterate over data in game file to create encounters
-    for monster_data in game_data:
-        encounter = Encounter(player, monster_data)
-        print("New encounter!\n")
-        display_encounter(encounter)
-
-        # while the encounter is active implement the moves and their behaviours
-        while encounter.is_active() is True:
-            move_name = input("Enter a move: ")
-
-            if move_name == "end turn":
-                encounter.end_player_turn()
-                encounter.enemy_turn()
-                if player.is_defeated() is False:
-                    display_encounter(encounter)
-                # check if player has lost
-                elif player.is_defeated() is True:
-                    print(GAME_LOSE_MESSAGE)
-                    return
-
-            elif move_name == "inspect deck":
-                print(f"\n{encounter.get_player().get_deck()}\n")
-
-            elif move_name == "inspect discard":
-                print(f"\n{encounter.get_player().get_discarded()}\n")
-
-            elif move_name == "describe Strike":
-                print(f"\n{Strike().get_description()}\n")
-
-            elif move_name == "describe Defend":
-                print(f"\n{Defend().get_description()}\n")
-
-            elif move_name == "describe Bash":
-                print(f"\n{Bash().get_description()}\n")
-
-            elif move_name == "describe Neutralize":
-                print(f"\n{Neutralize().get_description()}\n")
-
-            elif move_name == "describe Survivor":
-                print(f"\n{Survivor().get_description()}\n")
-
-            elif move_name[0:4] == "play":
-                list_of_words = move_name.split()
-
-                if len(list_of_words) == 2:
-                    card_name = list_of_words[1]
-                    apply_card_result = encounter.player_apply_card(card_name)
-
-                elif len(list_of_words) == 3:
-                    card_name = list_of_words[1]
-                    target_id = int(list_of_words[2])
-                    apply_card_result = encounter.player_apply_card(
-                        card_name, target_id
-                    )
-
-                if apply_card_result is False:
-                    print(CARD_FAILURE_MESSAGE)
-
-                elif apply_card_result is True:
-                    display_encounter(encounter)
-
-        # check if player has won encounter
-        if (
-            encounter.is_active() is False
-            and encounter.get_player().is_defeated() is False
-        ):
-            encounter.get_player().end_turn()
-            print(f"{ENCOUNTER_WIN_MESSAGE}")
-
-    # if player completes all encounters print win message and end the game
-    print(GAME_WIN_MESSAGE)
-    return
+    session = GameSession(renderer)
+    while not session.is_finished():
+        session.send(input(session.get_prompt()))
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Play a game interactively.")
+    parser.add_argument(
+        "--quiet", action="store_true", help="do not draw the encounter states"
+    )
+    parser.add_argument(
+        "--render-every",
+        type=int,
+        default=1,
+        metavar="N",
+        help="draw the encounter state only after every Nth move",
+    )
+    parser.add_argument(
+        "--intents",
+        action="store_true",
+        help="show what each monster will do in its next turn",
+    )
+    args = parser.parse_args()
+    if args.render_every < 1:
+        parser.error("--render-every must be at least 1")
+    main(Renderer(every=args.render_every, quiet=args.quiet, intents=args.intents))
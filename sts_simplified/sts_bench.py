@@ -0,0 +1,814 @@
+"""
+Benchmarks for the game engine.
+
+Run every benchmark with python sts_bench.py, or name the ones to run, e.g.
+python sts_bench.py state_memory. Results can be saved as JSON with --output,
+and compared with a saved run with --compare, which lists every result that got
+worse by more than --threshold and exits with status 1 if there are any:
+
+python sts_bench.py --output before.json
+python sts_bench.py --output after.json --compare before.json
+python sts_bench.py --compare before.json after.json
+"""
+
+import argparse
+import contextlib
+import copy
+import gc
+import io
+import json
+import mmap
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, TypeVar
+
+from sts import Cultist, Encounter, Entity
+from sts_pool import GamePool
+from sts_simulate import PLAYER_TYPES, load_game, run_game
+from sts_support import (
+    GameRNG,
+    Renderer,
+    display_encounter,
+    draw_cards,
+    iter_game_file,
+    read_game_file,
+)
+
+# The default relative change beyond which --compare reports a regression.
+DEFAULT_THRESHOLD = 0.10
+
+GAME_FILES = ("games/game1.txt", "games/game2.txt", "games/game3.txt")
+
+# Results whose keys contain any of these are better when smaller.
+LOWER_IS_BETTER = ("bytes", "built", "collections")
+
+State = TypeVar("State")
+
+
+def _best_rate(
+    make_state: Callable[[], State],
+    run: Callable[[State], None],
+    calls: int,
+    rounds: int = 5,
+) -> float:
+    """
+    Times run on a fresh state from make_state in each of several rounds, and
+    returns the best rate. Making the state is not timed.
+
+    Args:
+        make_state (Callable[[], State]): Makes the state for one round.
+        run (Callable[[State], None]): The code to time.
+        calls (int): The number of operations run performs.
+        rounds (int): The number of rounds.
+
+    Returns:
+        float: Operations per second in the fastest round.
+    """
+    best = 0.0
+    for _ in range(rounds):
+        state = make_state()
+        start = time.perf_counter()
+        run(state)
+        best = max(best, calls / (time.perf_counter() - start))
+    return best
+
+
+def _opening_encounter(player_type: str = "silent") -> Encounter:
+    """
+    Returns the opening state of the last encounter of games/game3.txt.
+    """
+    monsters = load_game("games/game3.txt")[-1]
+    return Encounter(PLAYER_TYPES[player_type](GameRNG(0)), monsters)
+
+
+def bench_state_memory(count: int = 10_000) -> dict[str, float]:
+    """
+    Measures the memory held by live game states: a player plus the encounter
+    built for the first encounter of games/game3.txt, for both player types.
+
+    Args:
+        count (int): The number of game states of each type to keep alive.
+
+    Returns:
+        dict[str, float]: Bytes per game state for each player type.
+    """
+    monsters = load_game("games/game3.txt")[-1]
+    results = {}
+    for player_type, player_class in PLAYER_TYPES.items():
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        states = []
+        for index in range(count):
+            player = player_class(GameRNG.for_game(0, index))
+            states.append(Encounter(player, monsters))
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        # The generators are part of the state but are the same size either
+        # way, so report them separately from the engine objects.
+        rng_bytes = count * GameRNG().__sizeof__()
+        results[f"{player_type}_bytes_per_state"] = (after - before) / count
+        results[f"{player_type}_bytes_per_state_excluding_rng"] = (
+            after - before - rng_bytes
+        ) / count
+        del states
+    return results
+
+
+def bench_vector_combat(size: int = 10_000, rounds: int = 5) -> dict[str, float]:
+    """
+    Compares the throughput of the object-oriented engine with BatchEncounter
+    on the last encounter of games/game3.txt. Each round plays three Strikes
+    on the first remaining monster, ends the turn and runs the enemy turn
+    (including drawing the next hand).
+
+    Args:
+        size (int): The number of encounters.
+        rounds (int): The number of rounds to play in every encounter.
+
+    Returns:
+        dict[str, float]: Encounter-rounds per second for each engine, and the
+        speedup of the batch engine.
+    """
+    import numpy as np
+
+    from sts_vector import BatchEncounter
+
+    monsters = load_game("games/game3.txt")[-1]
+    player_types = list(PLAYER_TYPES.values())
+
+    def make_encounters():
+        return [
+            Encounter(player_types[row % 2](GameRNG.for_game(0, row)), monsters)
+            for row in range(size)
+        ]
+
+    encounters = make_encounters()
+    start = time.perf_counter()
+    for encounter in encounters:
+        for _ in range(rounds):
+            for _ in range(3):
+                monsters_left = encounter.get_monsters()
+                if monsters_left:
+                    encounter.player_apply_card("Strike", monsters_left[0].get_id())
+            encounter.end_player_turn()
+            encounter.enemy_turn()
+    oop_rate = size * rounds / (time.perf_counter() - start)
+
+    batch = BatchEncounter.from_encounters(make_encounters())
+    generator = np.random.default_rng(0)
+    strikes = np.full(size, batch.card_table.column("Strike"))
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for _ in range(3):
+            batch.apply_card(strikes, batch.monster_alive.argmax(axis=1))
+        batch.end_player_turn()
+        batch.draw_hands(generator, batch.enemy_turn())
+    batch_rate = size * rounds / (time.perf_counter() - start)
+
+    return {
+        "oop_rounds_per_second": oop_rate,
+        "batch_rounds_per_second": batch_rate,
+        "speedup": batch_rate / oop_rate,
+    }
+
+
+def bench_snapshot(repeats: int = 20_000) -> dict[str, float]:
+    """
+    Compares ways of saving and returning to an encounter state during search,
+    on the last encounter of games/game3.txt: copy.deepcopy of the encounter,
+    Encounter.snapshot/restore, and playing a card then reverting it with undo.
+
+    Args:
+        repeats (int): The number of save/return cycles to time for each method.
+
+    Returns:
+        dict[str, float]: Cycles per second for each method.
+    """
+    monsters = load_game("games/game3.txt")[-1]
+    encounter = Encounter(PLAYER_TYPES["silent"](GameRNG(0)), monsters)
+    target_id = encounter.get_monsters()[0].get_id()
+    card_name = encounter.get_player().get_hand()[0].get_name()
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        copy.deepcopy(encounter)
+    deepcopy_rate = repeats / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        encounter.restore(encounter.snapshot())
+    snapshot_rate = repeats / (time.perf_counter() - start)
+
+    encounter.enable_undo()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        encounter.player_apply_card(card_name, target_id)
+        encounter.undo()
+    undo_rate = repeats / (time.perf_counter() - start)
+
+    return {
+        "deepcopy_per_second": deepcopy_rate,
+        "snapshot_restore_per_second": snapshot_rate,
+        "play_and_undo_per_second": undo_rate,
+        "snapshot_speedup": snapshot_rate / deepcopy_rate,
+    }
+
+
+def bench_apply_card(count: int = 5_000, rounds: int = 10) -> dict[str, float]:
+    """
+    Measures Encounter.player_apply_card on the last encounter of
+    games/game3.txt. Copies of the opening state are made up front. In each
+    copy, a card that is not in the hand is asked for, and then every card in
+    the opening hand that can be afforded is played. The best of several
+    rounds is reported.
+
+    Args:
+        count (int): The number of copies of the opening state per round.
+        rounds (int): The number of rounds.
+
+    Returns:
+        dict[str, float]: Calls to player_apply_card per second.
+    """
+    monsters = load_game("games/game3.txt")[-1]
+    rng = GameRNG(0)
+    encounter = Encounter(PLAYER_TYPES["silent"](rng), monsters)
+    target_id = encounter.get_monsters()[0].get_id()
+    moves = [("Bash", target_id)]
+    trial = copy.deepcopy(encounter, {id(rng): rng})
+    for card in encounter.get_player().get_hand():
+        move = (card.get_name(), target_id if card.requires_target() else None)
+        if trial.player_apply_card(*move):
+            moves.append(move)
+
+    best = 0.0
+    for _ in range(rounds):
+        # Share the generator between the copies, as it is not used here.
+        copies = [copy.deepcopy(encounter, {id(rng): rng}) for _ in range(count)]
+        start = time.perf_counter()
+        for copied in copies:
+            for card_name, move_target in moves:
+                copied.player_apply_card(card_name, move_target)
+        best = max(best, count * len(moves) / (time.perf_counter() - start))
+
+    return {"apply_card_per_second": best}
+
+
+def bench_draws(turns: int = 100_000) -> dict[str, float]:
+    """
+    Compares Player.new_turn with the default draws, which reproduce the
+    transcripts, and with fast_draws, for the Silent deck. Each hand is
+    discarded with Player.end_turn before the next is dealt.
+
+    Args:
+        turns (int): The number of hands to deal with each kind of draw.
+
+    Returns:
+        dict[str, float]: Hands dealt per second for each kind of draw, and the
+        speedup of fast draws.
+    """
+    results = {}
+    for label, fast_draws in (("default", False), ("fast", True)):
+        player = PLAYER_TYPES["silent"](GameRNG(0), fast_draws=fast_draws)
+        start = time.perf_counter()
+        for _ in range(turns):
+            player.new_turn()
+            player.end_turn()
+        results[f"{label}_hands_per_second"] = turns / (time.perf_counter() - start)
+    results["speedup"] = (
+        results["fast_hands_per_second"] / results["default_hands_per_second"]
+    )
+    return results
+
+
+def bench_render(frames: int = 20_000) -> dict[str, float]:
+    """
+    Measures drawing the last encounter of games/game3.txt with a Renderer
+    into an in-memory stream, and with print-based drawing of the same frame
+    (one print per line, as display_encounter used to do).
+
+    Args:
+        frames (int): The number of frames to draw with each method.
+
+    Returns:
+        dict[str, float]: Frames per second for each method, and the speedup
+        of the Renderer.
+    """
+    monsters = load_game("games/game3.txt")[-1]
+    encounter = Encounter(PLAYER_TYPES["silent"](GameRNG(0)), monsters)
+    stream = io.StringIO()
+    renderer = Renderer(stream)
+    lines = renderer.frame(encounter).splitlines()
+
+    start = time.perf_counter()
+    for _ in range(frames):
+        for line in lines:
+            print(line, file=stream)
+    print_rate = frames / (time.perf_counter() - start)
+
+    stream.seek(0)
+    stream.truncate()
+    start = time.perf_counter()
+    for _ in range(frames):
+        renderer.render(encounter)
+    render_rate = frames / (time.perf_counter() - start)
+
+    return {
+        "print_frames_per_second": print_rate,
+        "renderer_frames_per_second": render_rate,
+        "speedup": render_rate / print_rate,
+    }
+
+
+def bench_play_card(count: int = 20_000) -> dict[str, float]:
+    """
+    Measures Player.play_card: every affordable card in the opening hand of
+    the last encounter of games/game3.txt is played in each of count copies of
+    the player, and a card that is not in the hand is asked for once.
+
+    Args:
+        count (int): The number of copies of the player per round.
+
+    Returns:
+        dict[str, float]: Calls to play_card per second.
+    """
+    encounter = _opening_encounter()
+    player = encounter.get_player()
+    rng = player.get_rng()
+    names = ["Bash"]
+    trial = copy.deepcopy(player, {id(rng): rng})
+    for card in player.get_hand():
+        if trial.play_card(card.get_name()) is not None:
+            names.append(card.get_name())
+
+    def run(players):
+        for copied in players:
+            for name in names:
+                copied.play_card(name)
+
+    rate = _best_rate(
+        lambda: [copy.deepcopy(player, {id(rng): rng}) for _ in range(count)],
+        run,
+        count * len(names),
+    )
+    return {"play_card_per_second": rate}
+
+
+def bench_enemy_turn(count: int = 5_000) -> dict[str, float]:
+    """
+    Measures Encounter.enemy_turn, including dealing the player's next hand,
+    on copies of the last encounter of games/game3.txt after the player has
+    ended their first turn.
+
+    Args:
+        count (int): The number of copies of the encounter per round.
+
+    Returns:
+        dict[str, float]: Calls to enemy_turn per second.
+    """
+    encounter = _opening_encounter()
+    encounter.end_player_turn()
+    rng = encounter.get_player().get_rng()
+
+    def run(encounters):
+        for copied in encounters:
+            copied.enemy_turn()
+
+    rate = _best_rate(
+        lambda: [copy.deepcopy(encounter, {id(rng): rng}) for _ in range(count)],
+        run,
+        count,
+    )
+    return {"enemy_turn_per_second": rate}
+
+
+def bench_reduce_hp(count: int = 5_000, hits: int = 10) -> dict[str, float]:
+    """
+    Measures Entity.reduce_hp, hitting monsters that have no block.
+
+    Args:
+        count (int): The number of monsters per round.
+        hits (int): The number of hits on each monster.
+
+    Returns:
+        dict[str, float]: Calls to reduce_hp per second.
+    """
+
+    def run(monsters):
+        for monster in monsters:
+            for _ in range(hits):
+                monster.reduce_hp(6)
+
+    rate = _best_rate(lambda: [Cultist(1000) for _ in range(count)], run, count * hits)
+    return {"reduce_hp_per_second": rate}
+
+
+def bench_draw_cards(count: int = 50_000) -> dict[str, float]:
+    """
+    Measures draw_cards dealing a hand of 5 from a full Silent deck.
+
+    Args:
+        count (int): The number of hands to deal per round.
+
+    Returns:
+        dict[str, float]: Calls to draw_cards per second.
+    """
+    deck = PLAYER_TYPES["silent"]().get_deck()
+    rng = GameRNG(0)
+
+    def run(decks):
+        for copied in decks:
+            draw_cards(copied, [], [], rng)
+
+    rate = _best_rate(lambda: [list(deck) for _ in range(count)], run, count)
+    return {"draw_cards_per_second": rate}
+
+
+def bench_read_game_file(count: int = 2_000) -> dict[str, float]:
+    """
+    Measures read_game_file on the game files in games/.
+
+    Args:
+        count (int): The number of times each game file is read per round.
+
+    Returns:
+        dict[str, float]: Game files read per second.
+    """
+
+    def run(_):
+        for _ in range(count):
+            for game_file in GAME_FILES:
+                read_game_file(game_file)
+
+    rate = _best_rate(lambda: None, run, count * len(GAME_FILES))
+    return {"read_game_file_per_second": rate}
+
+
+def bench_display_encounter(count: int = 10_000) -> dict[str, float]:
+    """
+    Measures display_encounter on the last encounter of games/game3.txt, with
+    standard output sent to an in-memory stream.
+
+    Args:
+        count (int): The number of calls per round.
+
+    Returns:
+        dict[str, float]: Calls to display_encounter per second.
+    """
+    encounter = _opening_encounter()
+
+    def run(stream):
+        with contextlib.redirect_stdout(stream):
+            for _ in range(count):
+                display_encounter(encounter)
+
+    rate = _best_rate(io.StringIO, run, count)
+    return {"display_encounter_per_second": rate}
+
+
+def bench_games(games: int = 300, rounds: int = 3) -> dict[str, float]:
+    """
+    Measures whole games per second played by run_game with the greedy policy,
+    for each game file in games/ and each player type. Game i is played with
+    GameRNG.for_game(0, i), so every run plays the same games.
+
+    Args:
+        games (int): The number of games per round.
+        rounds (int): The number of rounds.
+
+    Returns:
+        dict[str, float]: Games per second for each player type and game file.
+    """
+    results = {}
+    for game_file in GAME_FILES:
+        load_game(game_file)
+        name = os.path.splitext(os.path.basename(game_file))[0]
+        for player_type in PLAYER_TYPES:
+
+            def run(_):
+                for index in range(games):
+                    run_game(player_type, game_file, rng=GameRNG.for_game(0, index))
+
+            results[f"{player_type}_{name}_games_per_second"] = _best_rate(
+                lambda: None, run, games, rounds
+            )
+    return results
+
+
+def bench_vector_games(games: int = 10_000, rounds: int = 3) -> dict[str, float]:
+    """
+    Measures whole games per second played in lockstep by sts_vector.run_games,
+    the batches run_monte_carlo(..., vectorized=True) plays, for each game file
+    in games/ and each player type. Comparable with bench_games.
+
+    Args:
+        games (int): The number of games in each batch.
+        rounds (int): The number of rounds.
+
+    Returns:
+        dict[str, float]: Games per second for each player type and game file.
+    """
+    import numpy as np
+
+    from sts_vector import run_games
+
+    results = {}
+    for game_file in GAME_FILES:
+        name = os.path.splitext(os.path.basename(game_file))[0]
+        for player_type in PLAYER_TYPES:
+
+            def run(generator):
+                run_games(player_type, game_file, games, generator)
+
+            results[f"{player_type}_{name}_vector_games_per_second"] = _best_rate(
+                lambda: np.random.default_rng(0), run, games, rounds
+            )
+    return results
+
+
+def bench_pool(games: int = 2_000, rounds: int = 3) -> dict[str, float]:
+    """
+    Compares silent games on games/game3.txt played by run_game with and
+    without a GamePool: games per second, the entities (players and monsters)
+    and encounters built per game, and the garbage collections run per 1000
+    games, by generation. Construction is counted in a separate, untimed pass.
+
+    Args:
+        games (int): The number of games per round.
+        rounds (int): The number of timed rounds.
+
+    Returns:
+        dict[str, float]: The results for unpooled and pooled games.
+    """
+    game_file = "games/game3.txt"
+    load_game(game_file)
+    built = [0]
+    entity_init = Entity.__init__
+    encounter_init = Encounter.__init__
+
+    def counting(init):
+        def wrapper(self, *args, **kwargs):
+            built[0] += 1
+            init(self, *args, **kwargs)
+
+        return wrapper
+
+    results = {}
+    for mode, make_pool in (("unpooled", lambda: None), ("pooled", GamePool)):
+
+        def run(pool):
+            for index in range(games):
+                run_game("silent", game_file, rng=GameRNG.for_game(0, index), pool=pool)
+
+        gc.collect()
+        before = [stats["collections"] for stats in gc.get_stats()]
+        results[f"{mode}_games_per_second"] = _best_rate(make_pool, run, games, rounds)
+        after = [stats["collections"] for stats in gc.get_stats()]
+        for generation, (start, stop) in enumerate(zip(before, after)):
+            results[f"{mode}_gen{generation}_collections_per_1000_games"] = (
+                (stop - start) * 1000 / (games * rounds)
+            )
+
+        pool = make_pool()
+        if pool is not None:
+            # Fill the pool first, as a long-running batch would have.
+            run_game("silent", game_file, pool=pool)
+        built[0] = 0
+        Entity.__init__ = counting(entity_init)
+        Encounter.__init__ = counting(encounter_init)
+        try:
+            run(pool)
+        finally:
+            Entity.__init__ = entity_init
+            Encounter.__init__ = encounter_init
+        results[f"{mode}_objects_built_per_game"] = built[0] / games
+    return results
+
+
+def bench_game_file_reader(megabytes: int = 20) -> dict[str, float]:
+    """
+    Measures the throughput of iter_game_file on a generated game file of
+    about the given size, read by name and through an mmap.
+
+    Args:
+        megabytes (int): The approximate size of the generated file.
+
+    Returns:
+        dict[str, float]: Megabytes and encounters read per second.
+    """
+    rng = GameRNG(0)
+    monster_types = ("Louse", "Cultist", "JawWorm")
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as file:
+        filename = file.name
+        encounters = 0
+        while file.tell() < megabytes * 1_000_000:
+            lines = [f"Encounter {encounters + 1}"]
+            for _ in range(rng.randint(1, 3)):
+                lines.append(f"{rng.choice(monster_types)} {rng.randint(5, 60)}")
+            file.write("\n".join(lines) + "\n")
+            encounters += 1
+    size = os.path.getsize(filename) / 1_000_000
+
+    try:
+        start = time.perf_counter()
+        for _ in iter_game_file(filename):
+            pass
+        path_time = time.perf_counter() - start
+
+        with open(filename, "rb") as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                start = time.perf_counter()
+                for _ in iter_game_file(mapped):
+                    pass
+                mmap_time = time.perf_counter() - start
+    finally:
+        os.remove(filename)
+
+    return {
+        "path_megabytes_per_second": size / path_time,
+        "path_encounters_per_second": encounters / path_time,
+        "mmap_megabytes_per_second": size / mmap_time,
+    }
+
+
+BENCHMARKS = {
+    "play_card": bench_play_card,
+    "apply_card": bench_apply_card,
+    "enemy_turn": bench_enemy_turn,
+    "reduce_hp": bench_reduce_hp,
+    "draw_cards": bench_draw_cards,
+    "read_game_file": bench_read_game_file,
+    "display_encounter": bench_display_encounter,
+    "games": bench_games,
+    "pool": bench_pool,
+    "draws": bench_draws,
+    "game_file_reader": bench_game_file_reader,
+    "render": bench_render,
+    "state_memory": bench_state_memory,
+    "snapshot": bench_snapshot,
+    "vector_combat": bench_vector_combat,
+    "vector_games": bench_vector_games,
+}
+
+
+def run_benchmarks(names: list[str]) -> dict[str, float]:
+    """
+    Runs the named benchmarks, printing each result as it is measured.
+
+    Args:
+        names (list[str]): The names of the benchmarks, from BENCHMARKS.
+
+    Returns:
+        dict[str, float]: Every result, keyed by "{benchmark}.{result}".
+    """
+    results = {}
+    for name in names:
+        for key, value in BENCHMARKS[name]().items():
+            results[f"{name}.{key}"] = value
+            print(f"{name}.{key}: {value:.1f}", flush=True)
+    return results
+
+
+def save_results(results: dict[str, float], filename: str) -> None:
+    """
+    Saves benchmark results as JSON, with the Python version and time of the
+    run.
+
+    Args:
+        results (dict[str, float]): The results, as from run_benchmarks.
+        filename (str): The file to write.
+    """
+    document = {
+        "python": platform.python_version(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+    with open(filename, "w") as file:
+        json.dump(document, file, indent=2, sort_keys=True)
+        file.write("\n")
+
+
+def load_results(filename: str) -> dict[str, float]:
+    """
+    Loads benchmark results saved by save_results.
+
+    Args:
+        filename (str): The file to read.
+
+    Returns:
+        dict[str, float]: The results.
+    """
+    with open(filename) as file:
+        return json.load(file)["results"]
+
+
+def higher_is_better(key: str) -> bool:
+    """
+    Returns whether a larger value of a result is an improvement. Memory
+    results and counts of objects built or collections run are better when
+    smaller, and every other result is a rate.
+
+    Args:
+        key (str): The key of the result, as from run_benchmarks.
+
+    Returns:
+        bool: True unless the result measures bytes, objects built or
+        collections.
+    """
+    return not any(word in key for word in LOWER_IS_BETTER)
+
+
+def compare_results(
+    baseline: dict[str, float],
+    current: dict[str, float],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> list[tuple[str, float, float, float]]:
+    """
+    Finds the results that got worse by more than threshold. Only results
+    present in both runs are compared.
+
+    Args:
+        baseline (dict[str, float]): The results to compare against.
+        current (dict[str, float]): The new results.
+        threshold (float): The largest relative change that is not reported,
+        e.g. 0.1 for 10%.
+
+    Returns:
+        list[tuple[str, float, float, float]]: The key, baseline value, current
+        value and relative change of each regression. The change is negative
+        when the value fell.
+    """
+    regressions = []
+    for key in sorted(baseline.keys() & current.keys()):
+        before = baseline[key]
+        after = current[key]
+        if not before:
+            continue
+        change = (after - before) / before
+        worse = -change if higher_is_better(key) else change
+        if worse > threshold:
+            regressions.append((key, before, after, change))
+    return regressions
+
+
+def main() -> None:
+    """
+    Command line entry point. Runs the named benchmarks (all by default) and
+    prints their results, or compares two saved runs.
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="\n".join(__doc__.strip().splitlines()[2:]),
+    )
+    parser.add_argument("names", nargs="*", help=", ".join(BENCHMARKS))
+    parser.add_argument("--output", help="save the results to this JSON file")
+    parser.add_argument(
+        "--compare",
+        nargs="+",
+        metavar="RESULTS",
+        help="a saved baseline to compare this run with, or a baseline and a "
+        "saved run to compare without running anything",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help=f"the relative change that counts as a regression "
+        f"(default {DEFAULT_THRESHOLD})",
+    )
+    args = parser.parse_args()
+    for name in args.names:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark {name!r}")
+    if args.compare is not None and len(args.compare) > 2:
+        parser.error("--compare takes a baseline and at most one other run")
+
+    if args.compare is not None and len(args.compare) == 2:
+        results = load_results(args.compare[1])
+    else:
+        results = run_benchmarks(args.names or list(BENCHMARKS))
+    if args.output is not None:
+        save_results(results, args.output)
+    if args.compare is None:
+        return
+
+    baseline = load_results(args.compare[0])
+    regressions = compare_results(baseline, results, args.threshold)
+    for key, before, after, change in regressions:
+        print(f"REGRESSION {key}: {before:.1f} -> {after:.1f} ({change:+.1%})")
+    compared = len(baseline.keys() & results.keys())
+    print(
+        f"{len(regressions)} of {compared} results regressed by more than "
+        f"{args.threshold:.0%}"
+    )
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Exact integer damage resolution, shared by every engine.
+
+An attack deals its base damage (including the attacker's strength) multiplied
+by 1.5 if the target is vulnerable and by 0.75 if the attacker is weak,
+truncated toward zero. The engine used to compute this with float multiplies
+and int(). Here each of the four multipliers is a fraction with a power-of-two
+denominator: 1, 3/4, 3/2 and 9/8. Damage is multiplied by the numerator and
+shifted right by the exponent of the denominator, so no floats are involved.
+The float products were exact too, as every factor is a dyadic fraction, so
+the results are the same for every damage a float can represent exactly.
+verify checks that exhaustively over a range of damage.
+
+python sts_damage.py --limit 1000000
+"""
+
+import argparse
+import sys
+
+# The multiplier for each combination of the target being vulnerable and the
+# attacker being weak, as (numerator, shift) for numerator / 2 ** shift,
+# indexed by 2 * vulnerable + weak.
+MULTIPLIERS = ((1, 0), (3, 2), (3, 1), (9, 3))
+
+# The default range of damage verify checks, in each direction from 0.
+DEFAULT_LIMIT = 100_000
+
+
+def scale_damage(damage: int, vulnerable: bool, weak: bool) -> int:
+    """
+    Returns damage after the vulnerable (x1.5) and weak (x0.75) multipliers,
+    truncated toward zero.
+
+    Args:
+        damage (int): The base damage, including the attacker's strength.
+        vulnerable (bool): Whether the target is vulnerable.
+        weak (bool): Whether the attacker is weak.
+
+    Returns:
+        int: The damage dealt before block.
+    """
+    numerator, shift = MULTIPLIERS[2 * vulnerable + weak]
+    if damage >= 0:
+        return (damage * numerator) >> shift
+    return -((-damage * numerator) >> shift)
+
+
+def _float_damage(damage: int, vulnerable: bool, weak: bool) -> int:
+    """
+    The float computation scale_damage replaced, kept as the reference for
+    verify.
+    """
+    if vulnerable:
+        damage *= 1.5
+    if weak:
+        damage *= 0.75
+    return int(damage)
+
+
+def verify(limit: int = DEFAULT_LIMIT) -> list[tuple[int, bool, bool]]:
+    """
+    Compares scale_damage with the float computation it replaced for every
+    damage from -limit to limit and every combination of vulnerable and weak.
+
+    Args:
+        limit (int): The largest damage checked, in each direction.
+
+    Returns:
+        list[tuple[int, bool, bool]]: The (damage, vulnerable, weak) that
+        disagreed; empty if none did.
+    """
+    mismatches = []
+    for vulnerable in (False, True):
+        for weak in (False, True):
+            for damage in range(-limit, limit + 1):
+                if scale_damage(damage, vulnerable, weak) != _float_damage(
+                    damage, vulnerable, weak
+                ):
+                    mismatches.append((damage, vulnerable, weak))
+    return mismatches
+
+
+def main() -> None:
+    """
+    Command line entry point. Runs verify and exits with status 1 if any
+    damage disagreed.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    args = parser.parse_args()
+
+    mismatches = verify(args.limit)
+    if mismatches:
+        print(f"Mismatches: {mismatches[:20]}")
+        sys.exit(1)
+    print(f"OK: {4 * (2 * args.limit + 1)} cases")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1085 @@
+"""
+Fast-forwards encounters whose outcome under greedy_policy is already decided.
+
+Late in an encounter the rest of it is often decided, or nearly so: a lone
+Louse at low HP against a player with plenty of HP, say. FastForward works out
+the rest of an encounter played by greedy_policy, from the start of a player
+turn, without playing it. It first bounds the encounter analytically: the
+fewest turns in which the monsters could all be defeated, from the most damage
+any hand of the player's cards could deal, and the enemy turns the player is
+sure to survive, from Encounter.incoming_damage. Only if the bounds allow the
+encounter to end within the horizon is the rest of it resolved by a bounded
+dynamic program over the solver's model of the encounter (see sts_solver).
+greedy_policy's moves follow from the hand, so the chance nodes are the draws,
+and its choices between cards it ranks equally, which follow from the order of
+the hand. The result is the exact distribution of the outcome. If some line of
+play outlasts the horizon or the node budget, the encounter is played as usual.
+
+Resolutions, and the positions the bounds rule out, are cached across games.
+Positions in which the player cannot be defeated within the horizon share a
+cache entry, whatever the player's HP. Other positions are only searched as
+far as the next enemy turn. The shortcut pays off where encounters are won:
+with a warm cache, IronClad's games of game2.txt run about 1.5 times as fast.
+Where the player is losing, few positions can be resolved, so once finish has
+checked WARM_UP_CHECKS positions and they have saved fewer than min_saving
+turns each on average, it only checks one position in PROBE_INTERVAL, and
+those games run about as fast as games played in full.
+
+FastForwardGame only fast-forwards the final encounter of a game, finishing
+it with an outcome drawn from the distribution with the game's generator.
+finish leaves the player's cards in an order play would not have, and that
+order decides greedy_policy's choice between tied cards, such as Silent's
+Strike and Neutralize, so an encounter after a fast-forwarded one would not be
+played as in a full game. As the final encounter is fast-forwarded from the
+position play reached, its games have the same distribution of results as
+games played in full. They do not reproduce the games of a given seed,
+though, and which positions finish checks depends on the positions it
+checked before, so a game's result also depends on the games played before
+it with the same FastForward. --check compares the shortcut with full
+simulation, from every position of a batch of games that it can resolve.
+
+python sts_fastforward.py ironclad games/game2.txt --games 2000 --warm 5000
+python sts_fastforward.py silent games/game3.txt --games 200 --check
+"""
+
+import argparse
+import copy
+import math
+import sys
+import time
+from typing import NamedTuple
+
+from sts import Card, Encounter, Player
+from sts_damage import scale_damage
+from sts_pool import GamePool
+from sts_simulate import (
+    MAX_TURNS,
+    PLAYER_TYPES,
+    EncounterFinish,
+    Game,
+    GameResult,
+    card_score,
+    greedy_policy,
+    load_game,
+)
+from sts_solver import (
+    ENERGY,
+    HAND_SIZE,
+    HP,
+    M_HP,
+    STRENGTH,
+    VULNERABLE,
+    WEAK,
+    CardModel,
+    Solver,
+    add_counts,
+    card_models,
+    draw_outcomes,
+    resolve_enemy_turn,
+    sub_counts,
+)
+from sts_support import GameRNG, default_rng
+
+# The most enemy turns a resolution may play through.
+DEFAULT_HORIZON = 3
+# The most positions one resolution may expand before giving up.
+DEFAULT_MAX_NODES = 5_000
+# The most resolutions to keep; the oldest are evicted first.
+DEFAULT_CACHE_SIZE = 200_000
+# The fewest player turns checking a position must save on average for finish
+# to keep checking every position. A check costs about half a turn of play.
+DEFAULT_MIN_SAVING = 0.5
+# The positions finish checks before it compares their saving with min_saving.
+WARM_UP_CHECKS = 200
+# While checks save too little, finish checks one position in this many.
+PROBE_INTERVAL = 128
+# The energy the player has at the start of each turn.
+TURN_ENERGY = 3
+# The player's HP in the model of a position in which they cannot be defeated
+# within the horizon.
+SURVIVING_HP = 1 << 30
+# How many standard errors a sampled mean may be from the resolved one in
+# --check before it counts as a mismatch.
+CHECK_SIGMAS = 5.0
+
+
+class Outcome(NamedTuple):
+    """
+    How the rest of an encounter played by greedy_policy ends.
+
+    Attributes:
+    - hp_lost (int): The HP the player loses; all of it if they are defeated.
+    - defeated (bool): True if the player is defeated.
+    - strength (int): The player's strength at the end of the encounter.
+    - weak (int): The player's weak at the end of the encounter.
+    - vulnerable (int): The player's vulnerable at the end of the encounter.
+    - turns (int): The enemy turns the player survives.
+    - cards_played (int): The number of cards played.
+    """
+
+    hp_lost: int
+    defeated: bool
+    strength: int
+    weak: int
+    vulnerable: int
+    turns: int
+    cards_played: int
+
+
+class Resolution(NamedTuple):
+    """
+    The exact distribution of the outcome of the rest of an encounter.
+
+    Attributes:
+    - outcomes (tuple[Outcome, ...]): Every possible outcome.
+    - probabilities (tuple[float, ...]): The probability of each outcome.
+    """
+
+    outcomes: tuple[Outcome, ...]
+    probabilities: tuple[float, ...]
+
+    def is_decided(self) -> bool:
+        """
+        Returns whether only one outcome is possible.
+
+        Returns:
+            bool: True if the outcome is certain.
+        """
+        return len(self.outcomes) == 1
+
+    def win_probability(self) -> float:
+        """
+        Returns the probability that the player wins the encounter.
+
+        Returns:
+            float: The probability of winning.
+        """
+        return sum(
+            probability
+            for outcome, probability in zip(self.outcomes, self.probabilities)
+            if not outcome.defeated
+        )
+
+    def expected_hp_lost(self) -> float:
+        """
+        Returns the expected HP the player loses.
+
+        Returns:
+            float: The expected HP lost.
+        """
+        return sum(
+            outcome.hp_lost * probability
+            for outcome, probability in zip(self.outcomes, self.probabilities)
+        )
+
+    def hp_lost_deviation(self) -> float:
+        """
+        Returns the standard deviation of the HP the player loses.
+
+        Returns:
+            float: The standard deviation of the HP lost.
+        """
+        mean = self.expected_hp_lost()
+        return math.sqrt(
+            sum(
+                (outcome.hp_lost - mean) ** 2 * probability
+                for outcome, probability in zip(self.outcomes, self.probabilities)
+            )
+        )
+
+    def sample(self, rng: GameRNG | None = None) -> Outcome:
+        """
+        Draws an outcome with its probability.
+
+        Args:
+            rng (GameRNG | None): The generator to draw with. Defaults to the
+            shared default_rng.
+
+        Returns:
+            Outcome: The outcome drawn.
+        """
+        if rng is None:
+            rng = default_rng
+        point = rng.random()
+        for outcome, probability in zip(self.outcomes, self.probabilities):
+            point -= probability
+            if point < 0:
+                return outcome
+        return self.outcomes[-1]
+
+
+class Bounds(NamedTuple):
+    """
+    What can be said about the rest of an encounter without searching it.
+
+    Attributes:
+    - min_turns (int): The fewest player turns, this one included, in which
+                       the monsters could all be defeated. Values above the
+                       horizon + 1 only mean the encounter cannot end within
+                       the horizon.
+    - safe_turns (int): The enemy turns, up to the horizon, the player is
+                        sure to survive whatever they do.
+    """
+
+    min_turns: int
+    safe_turns: int
+
+
+class _OutOfNodes(Exception):
+    """Raised when a resolution expands more than its node budget."""
+
+
+class FastForward:
+    """
+    Resolves the rest of encounters played by greedy_policy for one player's
+    cards. A FastForward can be reused for many games of the same player
+    type; its cache is kept between them.
+    """
+
+    def __init__(
+        self,
+        cards: list[CardModel],
+        horizon: int = DEFAULT_HORIZON,
+        max_nodes: int = DEFAULT_MAX_NODES,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+        min_saving: float = DEFAULT_MIN_SAVING,
+    ) -> None:
+        """
+        Args:
+            cards (list[CardModel]): The card types the player can hold, as
+            returned by card_models.
+            horizon (int): The most enemy turns a resolution may play through.
+            max_nodes (int): The most positions one resolution may expand.
+            cache_size (int): The most resolutions to keep.
+            min_saving (float): The fewest player turns finish must save per
+            position checked to keep checking every position.
+        """
+        self._cards = tuple(cards)
+        self._solver = Solver(cards)
+        self._scores = tuple(card_score(Card.from_name(card.name)) for card in cards)
+        # The card types greedy_policy ranks equally with another type, for
+        # which its choice depends on the order of the hand.
+        self._tied = frozenset(
+            index
+            for index, score in enumerate(self._scores)
+            if self._scores.count(score) > 1
+        )
+        self._names = tuple(card.name for card in cards)
+        self._index = {name: index for index, name in enumerate(self._names)}
+        self._horizon = horizon
+        self._max_nodes = max_nodes
+        self._cache_size = cache_size
+        self._min_saving = min_saving
+        # (model state, tied cards in hand order) -> Resolution, or None if the
+        # position cannot be resolved.
+        self._cache = {}
+        # The arguments of _hand_bound and _turn_bound -> their results.
+        self._hand_bounds = {}
+        self._turn_bounds = {}
+        self._nodes = 0
+        self._attempts = 0
+        self._resolved = 0
+        self._hits = 0
+        # The positions passed to finish, those it checked, and the player
+        # turns its outcomes saved.
+        self._positions = 0
+        self._checked = 0
+        self._turns_saved = 0
+
+    def get_horizon(self) -> int:
+        """
+        Returns the most enemy turns a resolution may play through.
+
+        Returns:
+            int: The horizon.
+        """
+        return self._horizon
+
+    def get_stats(self) -> dict[str, int]:
+        """
+        Returns counters of the work done so far: the positions for which a
+        resolution was attempted (those that passed the bounds), those
+        resolved, the cache hits, the nodes expanded, and the positions
+        finish skipped while checks saved too little.
+
+        Returns:
+            dict[str, int]: The counters.
+        """
+        return {
+            "attempts": self._attempts,
+            "resolved": self._resolved,
+            "cache_hits": self._hits,
+            "nodes": self._nodes,
+            "cache_entries": len(self._cache),
+            "skipped": self._positions - self._checked,
+        }
+
+    def _hand_bound(
+        self,
+        hand: tuple[int, ...],
+        strength: int,
+        energy: int,
+        vulnerable: bool,
+        weak: bool,
+    ) -> tuple[int, int]:
+        """
+        Returns the most damage the cards of hand could deal with energy,
+        starting with strength, and the most strength they could gain. Each
+        attack is counted as if all the strength gained came first, and its
+        target were vulnerable if vulnerable is set or the cards played apply
+        vulnerable. weak is whether the player is weak.
+        """
+        key = (hand, strength, energy, vulnerable, weak)
+        bound = self._hand_bounds.get(key)
+        if bound is not None:
+            return bound
+        cards = [
+            self._cards[index] for index, count in enumerate(hand) for _ in range(count)
+        ]
+        most_damage = most_gain = 0
+        for mask in range(1 << len(cards)):
+            chosen = [card for bit, card in enumerate(cards) if mask >> bit & 1]
+            if sum(card.cost for card in chosen) > energy:
+                continue
+            gain = sum(card.strength for card in chosen)
+            exposed = vulnerable or any(card.vulnerable for card in chosen)
+            damage = sum(
+                max(scale_damage(card.damage + strength + gain, exposed, weak), 0)
+                for card in chosen
+                if card.target
+            )
+            most_damage = max(most_damage, damage)
+            most_gain = max(most_gain, gain)
+        bound = (most_damage, most_gain)
+        self._hand_bounds[key] = bound
+        return bound
+
+    def _turn_bound(
+        self, cards: tuple[int, ...], strength: int, vulnerable: bool
+    ) -> tuple[int, int]:
+        """
+        Returns the most damage, and strength gained, of any hand that could be
+        drawn from cards at the start of a turn, as for _hand_bound with the
+        player not weak.
+        """
+        key = (cards, strength, vulnerable)
+        bound = self._turn_bounds.get(key)
+        if bound is None:
+            most_damage = most_gain = 0
+            for hand, _ in draw_outcomes(cards, min(HAND_SIZE, sum(cards))):
+                damage, gain = self._hand_bound(
+                    hand, strength, TURN_ENERGY, vulnerable, False
+                )
+                most_damage = max(most_damage, damage)
+                most_gain = max(most_gain, gain)
+            bound = (most_damage, most_gain)
+            self._turn_bounds[key] = bound
+        return bound
+
+    def _min_turns(self, encounter: Encounter, most: int) -> int:
+        """
+        Returns Bounds.min_turns for an encounter, counting up to most + 1.
+        """
+        player = encounter.get_player()
+        monsters = encounter.get_monsters()
+        remaining = sum(monster.get_hp() for monster in monsters)
+        # The number of turns, this one included, some monster stays vulnerable.
+        exposed = max(monster.get_vulnerable() for monster in monsters)
+        hand_counts = player.get_hand_counts()
+        hand = tuple(hand_counts.get(name, 0) for name in self._names)
+        damage, gain = self._hand_bound(
+            hand,
+            player.get_strength(),
+            player.get_energy(),
+            exposed > 0,
+            player.get_weak() > 0,
+        )
+        remaining -= damage
+        strength = player.get_strength() + gain
+        deck_counts = player.get_deck_counts()
+        discard_counts = player.get_discard_counts()
+        cards = tuple(
+            count + deck_counts.get(name, 0) + discard_counts.get(name, 0)
+            for name, count in zip(self._names, hand)
+        )
+        turns = 1
+        while remaining > 0 and turns <= most:
+            damage, gain = self._turn_bound(cards, strength, exposed > turns)
+            remaining -= damage
+            strength += gain
+            turns += 1
+        return turns
+
+    def _safe_turns(self, encounter: Encounter) -> int:
+        """
+        Returns Bounds.safe_turns for an encounter.
+        """
+        hp = encounter.get_player().get_hp()
+        safe = 0
+        for forecast in encounter.incoming_damage(self._horizon):
+            hp -= forecast.high
+            if hp <= 0:
+                break
+            safe += 1
+        return safe
+
+    def bounds(self, encounter: Encounter) -> Bounds:
+        """
+        Bounds the rest of an encounter at the start of a player turn without
+        searching it.
+
+        Args:
+            encounter (Encounter): The encounter. It is not modified.
+
+        Returns:
+            Bounds: The bounds.
+        """
+        return Bounds(
+            self._min_turns(encounter, self._horizon + 1), self._safe_turns(encounter)
+        )
+
+    def _greedy_moves(self, state: tuple) -> list[tuple[int, int | None]]:
+        """
+        Returns the moves greedy_policy might make in a model state, as (card
+        index, target index or None): one for each card type it ranks highest
+        among the affordable cards in hand, as its choice between those
+        depends on the order of the hand. Empty if it ends the turn.
+        """
+        player, hand, _, _, monsters = state
+        energy = player[ENERGY]
+        if energy <= 0:
+            return []
+        best = None
+        indices = []
+        for index, card in enumerate(self._cards):
+            if hand[index] == 0 or card.cost > energy:
+                continue
+            score = self._scores[index]
+            if best is None or score > best:
+                best = score
+                indices = [index]
+            elif score == best:
+                indices.append(index)
+        target = 0
+        for position in range(1, len(monsters)):
+            if monsters[position][M_HP] < monsters[target][M_HP]:
+                target = position
+        return [
+            (index, target if self._cards[index].target else None)
+            for index in indices
+        ]
+
+    def _resolve(
+        self, state: tuple, turns: int, shuffled: bool, memo: dict
+    ) -> dict | None:
+        """
+        Returns the distribution of the outcome from a model state during a
+        player turn, as {Outcome: probability}, or None if it cannot be
+        resolved within turns more enemy turns. shuffled is whether the hand
+        is in uniformly random order.
+        """
+        key = (state, turns, shuffled)
+        if key in memo:
+            return memo[key]
+        self._nodes += 1
+        memo["nodes"] += 1
+        if memo["nodes"] > self._max_nodes:
+            raise _OutOfNodes()
+        distribution = self._play_turn(state, turns, shuffled, None, memo)
+        memo[key] = distribution
+        return distribution
+
+    def _play_turn(
+        self,
+        state: tuple,
+        turns: int,
+        shuffled: bool,
+        order: list[int] | None,
+        memo: dict,
+    ) -> dict | None:
+        """
+        Returns the distribution of the outcome from a model state during a
+        player turn, as for _resolve. order lists the card types of the tied
+        cards in the hand in the hand's order, if it is known.
+
+        When greedy_policy's choice between tied card types depends on an
+        order that is not known, every choice is followed. A hand drawn at
+        random is in uniformly random order, so it chooses each type with
+        probability in proportion to its count. A hand that includes the
+        rest of the deck after a refill is not, so the turn is only resolved
+        if every choice leads to the same distribution.
+        """
+        hp = state[0][HP]
+        played = 0
+        while state[4]:
+            moves = self._greedy_moves(state)
+            if not moves:
+                break
+            move = moves[0]
+            if len(moves) > 1:
+                if order is None:
+                    distribution = self._branch(state, moves, turns, shuffled, memo)
+                    return _shifted(distribution, 0, 0, played)
+                # greedy_policy plays the first of the tied cards in the hand.
+                moves = dict(moves)
+                first = next(index for index in order if index in moves)
+                move = first, moves[first]
+            if order is not None and move[0] in self._tied:
+                order.remove(move[0])
+            state = self._solver.play(state, *move)
+            played += 1
+        else:
+            player = state[0]
+            outcome = Outcome(
+                0, False, player[STRENGTH], player[WEAK], player[VULNERABLE], 0, played
+            )
+            return {outcome: 1.0}
+
+        player, hand, deck, discard, monsters = resolve_enemy_turn(state)
+        if player[HP] == 0:
+            return {Outcome(hp, True, 0, 0, 0, 0, played): 1.0}
+        if turns == 0:
+            return None
+        lost = hp - player[HP]
+        # Deal the next hand as Solver does, swapping in the discard pile if
+        # the deck runs short.
+        refilled = sum(deck) < HAND_SIZE
+        if refilled:
+            hand, deck, discard = deck, discard, hand
+        distribution = {}
+        for drawn, probability in draw_outcomes(deck, HAND_SIZE - sum(hand)):
+            child = (
+                player,
+                add_counts(hand, drawn),
+                sub_counts(deck, drawn),
+                discard,
+                monsters,
+            )
+            rest = self._resolve(child, turns - 1, not refilled, memo)
+            if rest is None:
+                return None
+            _combine(distribution, rest, probability, lost, 1, played)
+        return distribution
+
+    def _branch(
+        self, state: tuple, moves: list, turns: int, shuffled: bool, memo: dict
+    ) -> dict | None:
+        """
+        Returns the distribution of the outcome over greedy_policy's choice
+        between the tied moves, as described in _play_turn.
+        """
+        hand = state[1]
+        total = sum(hand[index] for index, _ in moves)
+        distribution = {}
+        for move in moves:
+            rest = self._resolve(self._solver.play(state, *move), turns, shuffled, memo)
+            if rest is None:
+                return None
+            rest = _shifted(rest, 0, 0, 1)
+            if not shuffled:
+                if distribution and not _same(distribution, rest):
+                    return None
+                distribution = rest
+                continue
+            _combine(distribution, rest, hand[move[0]] / total, 0, 0, 0)
+        return distribution
+
+    def resolve(self, encounter: Encounter) -> Resolution | None:
+        """
+        Works out the distribution of the outcome of the rest of an encounter
+        played by greedy_policy, from the start of a player turn, before any
+        card is played.
+
+        Args:
+            encounter (Encounter): The encounter. It is not modified.
+
+        Returns:
+            Resolution | None: The distribution, or None if the encounter
+            might not end within the horizon, or resolving it would take more
+            than the node budget.
+        """
+        state = self._solver.encode(encounter)
+        order = ()
+        if self._tied:
+            order = tuple(
+                self._index[card.get_name()]
+                for card in encounter.get_player().get_hand()
+                if self._index[card.get_name()] in self._tied
+            )
+        key = (state, order)
+        if key in self._cache:
+            self._hits += 1
+            return self._cache[key]
+        # The bounds rule out most positions that cannot be resolved before
+        # they are searched. Where the player might be defeated within the
+        # horizon, only the next enemy turn is searched, which resolves
+        # nothing unless the monsters could be defeated this turn or the
+        # player could be in that enemy turn.
+        resolution = None
+        safe_turns = self._safe_turns(encounter)
+        most = self._horizon + 1 if safe_turns >= self._horizon else 1
+        if safe_turns == 0 or self._min_turns(encounter, most) <= most:
+            resolution = self._search(state, order, safe_turns)
+        self._store(key, resolution)
+        return resolution
+
+    def _search(
+        self, state: tuple, order: tuple[int, ...], safe_turns: int
+    ) -> Resolution | None:
+        """
+        Resolves a position that is not in the cache, as for resolve, given
+        its Bounds.safe_turns. A position in which the player cannot be
+        defeated within the horizon is searched, and cached, with SURVIVING_HP
+        in place of the player's HP. Any other position depends on the exact
+        HP, so is unlikely to be seen again, and is only searched up to the
+        end of the next enemy turn, which is cheap as there are no draws.
+        """
+        key = None
+        turns = 0
+        if safe_turns >= self._horizon:
+            state = ((SURVIVING_HP,) + state[0][1:],) + state[1:]
+            key = (state, order)
+            if key in self._cache:
+                self._hits += 1
+                return self._cache[key]
+            turns = self._horizon
+        self._attempts += 1
+        try:
+            distribution = self._play_turn(
+                state, turns, False, list(order), {"nodes": 0}
+            )
+        except _OutOfNodes:
+            distribution = None
+        resolution = None
+        if distribution is not None:
+            self._resolved += 1
+            outcomes = tuple(distribution)
+            resolution = Resolution(
+                outcomes, tuple(distribution[outcome] for outcome in outcomes)
+            )
+        if key is not None:
+            self._store(key, resolution)
+        return resolution
+
+    def _store(self, key: tuple, resolution: Resolution | None) -> None:
+        """Caches a resolution, evicting the oldest if the cache is full."""
+        if len(self._cache) >= self._cache_size:
+            del self._cache[next(iter(self._cache))]
+        self._cache[key] = resolution
+
+    def finish(self, encounter: Encounter) -> Outcome | None:
+        """
+        Resolves the rest of an encounter and, if it can be resolved, draws an
+        outcome with the player's generator and leaves the player as they
+        would be at the end of the encounter: their HP and statuses set, and
+        every card in their deck. The monsters are left as they are. The deck
+        is not in the order play would have left it in, which decides
+        greedy_policy's choice between tied cards in later encounters, so
+        FastForwardGame only finishes the final encounter.
+
+        Once WARM_UP_CHECKS positions have been checked, while they have saved
+        fewer than min_saving player turns each on average, only one position
+        in PROBE_INTERVAL is checked, so that losing games, in which few
+        positions can be resolved, are not slowed down by the checks.
+
+        Args:
+            encounter (Encounter): The encounter, at the start of a player turn.
+
+        Returns:
+            Outcome | None: The outcome drawn, or None if the encounter must be
+            played.
+        """
+        self._positions += 1
+        if (
+            self._checked >= WARM_UP_CHECKS
+            and self._turns_saved < self._min_saving * self._checked
+            and self._positions % PROBE_INTERVAL
+        ):
+            return None
+        self._checked += 1
+        resolution = self.resolve(encounter)
+        if resolution is None:
+            return None
+        player = encounter.get_player()
+        outcome = resolution.sample(player.get_rng())
+        # The rest of this turn is not played either.
+        self._turns_saved += outcome.turns + 1
+        cards = player.get_deck() + player.get_hand() + player.get_discarded()
+        player.restore(
+            (
+                player.get_max_hp(),
+                player.get_hp() - outcome.hp_lost,
+                0,
+                outcome.strength,
+                outcome.weak,
+                outcome.vulnerable,
+                TURN_ENERGY,
+                tuple(cards),
+                (),
+                (),
+            )
+        )
+        return outcome
+
+
+def _combine(
+    distribution: dict,
+    rest: dict,
+    probability: float,
+    hp_lost: int,
+    turns: int,
+    cards_played: int,
+) -> None:
+    """
+    Adds the outcomes of rest, with probability and the HP lost, turns and
+    cards played before them, to distribution.
+    """
+    for outcome, chance in rest.items():
+        outcome = outcome._replace(
+            hp_lost=outcome.hp_lost + hp_lost,
+            turns=outcome.turns + turns,
+            cards_played=outcome.cards_played + cards_played,
+        )
+        distribution[outcome] = distribution.get(outcome, 0.0) + probability * chance
+
+
+def _shifted(
+    distribution: dict | None, hp_lost: int, turns: int, cards_played: int
+) -> dict | None:
+    """Returns distribution with the outcomes of what came before it added."""
+    if distribution is None or hp_lost == turns == cards_played == 0:
+        return distribution
+    shifted = {}
+    _combine(shifted, distribution, 1.0, hp_lost, turns, cards_played)
+    return shifted
+
+
+def _same(left: dict, right: dict) -> bool:
+    """Returns whether two distributions are equal, up to rounding."""
+    return left.keys() == right.keys() and all(
+        abs(left[outcome] - right[outcome]) < 1e-9 for outcome in left
+    )
+
+
+def fast_forward_for(player: Player, **options) -> FastForward:
+    """
+    Returns a FastForward for the given player's cards.
+
+    Args:
+        player (Player): The player whose encounters will be resolved.
+        **options: Passed on to FastForward.
+
+    Returns:
+        FastForward: The fast-forward.
+    """
+    return FastForward(card_models(player), **options)
+
+
+class FastForwardGame(Game):
+    """
+    A game played by greedy_policy in which the final encounter is finished
+    by a FastForward as soon as it can be resolved.
+    """
+
+    def __init__(
+        self,
+        player: Player,
+        encounters,
+        fast_forward: FastForward,
+        max_turns: int = MAX_TURNS,
+        pool: GamePool | None = None,
+    ) -> None:
+        """
+        Args:
+            player (Player): The player taking part in the game.
+            encounters (Sequence[list[tuple[str, int]]]): The monsters in each
+            encounter.
+            fast_forward (FastForward): Resolves the encounters, for the
+            player's cards.
+            max_turns (int): The number of player turns after which the game
+            is abandoned.
+            pool (GamePool | None): As for Game.
+        """
+        super().__init__(player, encounters, greedy_policy, max_turns, pool)
+        self._fast_forward = fast_forward
+
+    def finish_early(
+        self, encounter: Encounter, turns: int
+    ) -> EncounterFinish | None:
+        """
+        Finishes the final encounter with a resolved outcome if it can be
+        resolved and the game cannot reach max_turns within the horizon.
+        Earlier encounters are played, as the order finish leaves the deck in
+        is not the order play would have left it in, and that order decides
+        greedy_policy's choice between tied cards in the encounters after.
+        """
+        if self._started < len(self._encounters):
+            return None
+        if turns + self._fast_forward.get_horizon() >= self._max_turns:
+            return None
+        outcome = self._fast_forward.finish(encounter)
+        if outcome is None:
+            return None
+        return EncounterFinish(outcome.turns, outcome.cards_played, outcome.defeated)
+
+
+def run_fast_forward_game(
+    player_type: str,
+    game_file: str,
+    fast_forward: FastForward | None = None,
+    rng: GameRNG | None = None,
+    fast_draws: bool = False,
+    pool: GamePool | None = None,
+) -> GameResult:
+    """
+    Plays one game with greedy_policy, fast-forwarding the final encounter
+    once it can be resolved.
+
+    Args:
+        player_type (str): 'ironclad' or 'silent'.
+        game_file (str): The name of the game file describing the encounters.
+        fast_forward (FastForward | None): The fast-forward to use, so that
+        its cache is shared between games. Defaults to a new one.
+        rng (GameRNG | None): The generator for the game.
+        fast_draws (bool): Whether the player draws cards in O(1) per card.
+        pool (GamePool | None): As for run_game.
+
+    Returns:
+        GameResult: The outcome of the game.
+    """
+    if pool is None:
+        player = PLAYER_TYPES[player_type.lower()](rng, fast_draws=fast_draws)
+    else:
+        player = pool.acquire_player(player_type, rng, fast_draws)
+    if fast_forward is None:
+        fast_forward = fast_forward_for(player)
+    encounters = load_game(game_file)
+    result = FastForwardGame(player, encounters, fast_forward, pool=pool).play()
+    if pool is not None:
+        pool.release_player(player)
+    return result
+
+
+def play_out(encounter: Encounter) -> Outcome:
+    """
+    Plays the rest of an encounter with greedy_policy, as Game does, and
+    returns how it ended.
+
+    Args:
+        encounter (Encounter): The encounter, at the start of a player turn.
+
+    Returns:
+        Outcome: The outcome.
+    """
+    player = encounter.get_player()
+    hp = player.get_hp()
+    turns = played = 0
+    while encounter.is_active():
+        move = greedy_policy(encounter)
+        if move is not None and encounter.player_apply_card(*move):
+            played += 1
+            continue
+        encounter.end_player_turn()
+        encounter.enemy_turn()
+        if player.is_defeated():
+            return Outcome(hp, True, 0, 0, 0, turns, played)
+        turns += 1
+    return Outcome(
+        hp - player.get_hp(),
+        False,
+        player.get_strength(),
+        player.get_weak(),
+        player.get_vulnerable(),
+        turns,
+        played,
+    )
+
+
+class _CheckingGame(Game):
+    """
+    A game played in full that, at each position a FastForward can resolve,
+    plays the rest of the encounter from copies of it and compares the
+    outcomes with the resolution.
+    """
+
+    def __init__(self, player, encounters, fast_forward, samples, seed, report):
+        super().__init__(player, encounters, greedy_policy)
+        self._fast_forward = fast_forward
+        self._samples = samples
+        self._seed = seed
+        self._report = report
+
+    def finish_early(self, encounter, turns):
+        resolution = self._fast_forward.resolve(encounter)
+        if resolution is None:
+            return None
+        self._report["positions"] += 1
+        support = set(resolution.outcomes)
+        lost = wins = 0
+        for sample in range(self._samples):
+            trial = copy.deepcopy(encounter)
+            index = self._report["positions"] * self._samples + sample
+            trial.get_player().get_rng().setstate(
+                GameRNG.for_game(self._seed + 1, index).getstate()
+            )
+            outcome = play_out(trial)
+            if outcome not in support:
+                self._report["mismatches"].append(
+                    f"outcome {outcome} not in the resolution"
+                )
+                return None
+            lost += outcome.hp_lost
+            wins += not outcome.defeated
+        deviation = resolution.hp_lost_deviation() / math.sqrt(self._samples)
+        error = abs(lost / self._samples - resolution.expected_hp_lost())
+        if error > CHECK_SIGMAS * deviation + 1e-9:
+            self._report["mismatches"].append(
+                f"mean HP lost {lost / self._samples:.2f}, "
+                f"resolved {resolution.expected_hp_lost():.2f}"
+            )
+        win_rate = resolution.win_probability()
+        deviation = math.sqrt(max(win_rate * (1 - win_rate), 0.0) / self._samples)
+        if abs(wins / self._samples - win_rate) > CHECK_SIGMAS * deviation + 1e-9:
+            self._report["mismatches"].append(
+                f"win rate {wins / self._samples:.3f}, resolved {win_rate:.3f}"
+            )
+        return None
+
+
+def check(
+    player_type: str,
+    game_file: str,
+    games: int,
+    samples: int = 200,
+    seed: int = 0,
+    **options,
+) -> dict:
+    """
+    Checks FastForward against full simulation. Games are played in full, and
+    from every position where the rest of the encounter can be resolved, it
+    is also played out samples times from copies with different generators.
+    Every sampled outcome must be one the resolution gives, and the sampled
+    mean HP lost and win rate must be within CHECK_SIGMAS standard errors of
+    the resolved ones.
+
+    Args:
+        player_type (str): 'ironclad' or 'silent'.
+        game_file (str): The name of the game file to play.
+        games (int): The number of games to play.
+        samples (int): The number of play-outs from each resolved position.
+        seed (int): The seed for the games and the play-outs.
+        **options: Passed on to FastForward.
+
+    Returns:
+        dict: The number of positions checked, and a description of each
+        mismatch.
+    """
+    report = {"positions": 0, "mismatches": []}
+    fast_forward = None
+    for index in range(games):
+        player = PLAYER_TYPES[player_type](GameRNG.for_game(seed, index))
+        if fast_forward is None:
+            fast_forward = fast_forward_for(player, **options)
+        _CheckingGame(
+            player, load_game(game_file), fast_forward, samples, seed, report
+        ).play()
+    return report
+
+
+def _summarise(results: list[GameResult]) -> str:
+    """Returns the win rate and mean final HP of some games, as text."""
+    wins = sum(result.won for result in results)
+    mean_hp = sum(result.hp for result in results) / len(results)
+    return f"win rate {wins / len(results):.3f}, mean HP {mean_hp:.2f}"
+
+
+def main() -> None:
+    """
+    Command line entry point. Plays a batch of greedy games in full and with
+    fast-forwarding, and reports the time taken and the results of each, or
+    with --check, checks the resolutions against full simulation.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("player_type", choices=list(PLAYER_TYPES))
+    parser.add_argument("game_file")
+    parser.add_argument("--games", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--horizon", type=int, default=DEFAULT_HORIZON)
+    parser.add_argument("--max-nodes", type=int, default=DEFAULT_MAX_NODES)
+    parser.add_argument(
+        "--warm",
+        type=int,
+        default=0,
+        help="fast-forward games to play first, to fill the cache",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="check the resolutions against full simulation",
+    )
+    parser.add_argument(
+        "--samples",
+        type=int,
+        default=200,
+        help="play-outs from each position checked",
+    )
+    args = parser.parse_args()
+    options = {"horizon": args.horizon, "max_nodes": args.max_nodes}
+    load_game(args.game_file)
+
+    if args.check:
+        report = check(
+            args.player_type,
+            args.game_file,
+            args.games,
+            args.samples,
+            args.seed,
+            **options,
+        )
+        for mismatch in report["mismatches"]:
+            print(f"MISMATCH {mismatch}")
+        print(
+            f"{report['positions']} positions checked, "
+            f"{len(report['mismatches'])} mismatches"
+        )
+        if report["mismatches"]:
+            sys.exit(1)
+        return
+
+    player_class = PLAYER_TYPES[args.player_type]
+    start = time.perf_counter()
+    full = [
+        Game(
+            player_class(GameRNG.for_game(args.seed, index)),
+            load_game(args.game_file),
+        ).play()
+        for index in range(args.games)
+    ]
+    full_time = time.perf_counter() - start
+    fast_forward = fast_forward_for(player_class(), **options)
+    for index in range(args.warm):
+        run_fast_forward_game(
+            args.player_type,
+            args.game_file,
+            fast_forward,
+            GameRNG.for_game(args.seed + 1, index),
+        )
+    start = time.perf_counter()
+    fast = [
+        run_fast_forward_game(
+            args.player_type,
+            args.game_file,
+            fast_forward,
+            GameRNG.for_game(args.seed, index),
+        )
+        for index in range(args.games)
+    ]
+    fast_time = time.perf_counter() - start
+    print(f"Full:         {args.games / full_time:8.1f} games/s, {_summarise(full)}")
+    print(f"Fast-forward: {args.games / fast_time:8.1f} games/s, {_summarise(fast)}")
+    stats = fast_forward.get_stats()
+    print(", ".join(f"{key} {value}" for key, value in stats.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""
+Opt-in counters and timers for the engine's hot paths.
+
+Instrumentation.install replaces Encounter.player_apply_card, enemy_turn,
+end_player_turn and start_new_turn, Entity.reduce_hp, and the draw_cards and
+draw_from_end functions used by Player, with wrappers that count and time each
+call, and uninstall puts the originals back. Nothing in the engine checks
+whether instrumentation is on, so it costs nothing while it is not installed.
+
+The times of nested calls are included in their callers' times, e.g.
+start_new_turn includes draw_cards, and enemy_turn includes start_new_turn.
+
+python sts_instrument.py silent games/game3.txt --games 2000 --output run.json
+"""
+
+import argparse
+import functools
+import json
+import time
+from typing import Any, Callable
+
+import sts
+from sts import Encounter, Entity, Player
+from sts_simulate import PLAYER_TYPES, load_game, run_game
+from sts_support import GameRNG
+
+# Where each instrumented function lives, by the name it is reported under.
+TIMED = {
+    "player_apply_card": Encounter,
+    "enemy_turn": Encounter,
+    "end_player_turn": Encounter,
+    "start_new_turn": Encounter,
+    "reduce_hp": Entity,
+    "draw_cards": sts,
+    "draw_from_end": sts,
+}
+
+
+class CallStats:
+    """
+    The number of calls to one function and the wall time spent in them.
+    """
+
+    __slots__ = ("_calls", "_time_ns")
+
+    def __init__(self) -> None:
+        self._calls = 0
+        self._time_ns = 0
+
+    def add(self, elapsed_ns: int) -> None:
+        """
+        Records one call.
+
+        Args:
+            elapsed_ns (int): The wall time of the call, in nanoseconds.
+        """
+        self._calls += 1
+        self._time_ns += elapsed_ns
+
+    def merge(self, other: "CallStats") -> None:
+        """
+        Adds the calls recorded by other to these.
+
+        Args:
+            other (CallStats): The statistics to add.
+        """
+        self._calls += other._calls
+        self._time_ns += other._time_ns
+
+    def get_calls(self) -> int:
+        """
+        Returns the number of calls.
+
+        Returns:
+            int: The number of calls recorded.
+        """
+        return self._calls
+
+    def get_time(self) -> float:
+        """
+        Returns the total wall time of the calls.
+
+        Returns:
+            float: The time in seconds.
+        """
+        return self._time_ns / 1e9
+
+
+class Instrumentation:
+    """
+    Counts and times calls to the engine's hot paths while installed, and
+    records why cards were refused, the damage dealt to monsters and taken by
+    the player (HP actually lost), and the damage absorbed by block. Only one
+    Instrumentation can be installed at a time. It can be used as a context
+    manager:
+
+    with Instrumentation() as stats:
+        run_game("silent", "games/game3.txt")
+    print(stats)
+    """
+
+    # The Instrumentation currently installed, if any.
+    _installed = None
+
+    def __init__(self) -> None:
+        self._calls = {name: CallStats() for name in TIMED}
+        self._rejections = {}
+        self._damage_dealt = 0
+        self._damage_taken = 0
+        self._block_absorbed_by_player = 0
+        self._block_absorbed_by_monsters = 0
+        self._run_time_ns = 0
+        self._originals = {}
+        self._started_ns = 0
+
+    def is_installed(self) -> bool:
+        """
+        Returns whether this instrumentation is installed.
+
+        Returns:
+            bool: True between install and uninstall.
+        """
+        return Instrumentation._installed is self
+
+    def install(self) -> None:
+        """
+        Replaces the instrumented functions with counting wrappers.
+
+        Raises:
+            RuntimeError: If an Instrumentation is already installed.
+        """
+        if Instrumentation._installed is not None:
+            raise RuntimeError("instrumentation is already installed")
+        for name, owner in TIMED.items():
+            original = getattr(owner, name)
+            self._originals[name] = original
+            setattr(owner, name, self._wrap(name, original))
+        Instrumentation._installed = self
+        self._started_ns = time.perf_counter_ns()
+
+    def uninstall(self) -> None:
+        """
+        Puts back the original functions. Does nothing if this instrumentation
+        is not installed.
+        """
+        if not self.is_installed():
+            return
+        self._run_time_ns += time.perf_counter_ns() - self._started_ns
+        for name, owner in TIMED.items():
+            setattr(owner, name, self._originals[name])
+        self._originals.clear()
+        Instrumentation._installed = None
+
+    def __enter__(self) -> "Instrumentation":
+        self.install()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.uninstall()
+
+    def _wrap(self, name: str, original: Callable) -> Callable:
+        """
+        Returns the wrapper that replaces original while installed.
+
+        Args:
+            name (str): The name of the function, from TIMED.
+            original (Callable): The function to wrap.
+
+        Returns:
+            Callable: The wrapper.
+        """
+        stats = self._calls[name]
+        clock = time.perf_counter_ns
+
+        if name == "player_apply_card":
+
+            @functools.wraps(original)
+            def wrapper(encounter, card_name, target_id=None):
+                start = clock()
+                played = original(encounter, card_name, target_id)
+                stats.add(clock() - start)
+                if not played:
+                    # A refused card changes nothing, so the reason can be
+                    # found afterwards, off the timed path.
+                    reason = encounter.rejection_reason(card_name, target_id)
+                    self._rejections[reason] = self._rejections.get(reason, 0) + 1
+                return played
+
+        elif name == "reduce_hp":
+
+            @functools.wraps(original)
+            def wrapper(entity, amount):
+                hp = entity.get_hp()
+                block = entity.get_block()
+                start = clock()
+                original(entity, amount)
+                stats.add(clock() - start)
+                lost = hp - entity.get_hp()
+                absorbed = block - entity.get_block()
+                if isinstance(entity, Player):
+                    self._damage_taken += lost
+                    self._block_absorbed_by_player += absorbed
+                else:
+                    self._damage_dealt += lost
+                    self._block_absorbed_by_monsters += absorbed
+
+        else:
+
+            @functools.wraps(original)
+            def wrapper(*args, **kwargs):
+                start = clock()
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    stats.add(clock() - start)
+
+        return wrapper
+
+    def merge(self, other: "Instrumentation") -> None:
+        """
+        Adds everything recorded by other to this, e.g. to combine the
+        instrumentation of several runs.
+
+        Args:
+            other (Instrumentation): The instrumentation to add.
+        """
+        for name, stats in other._calls.items():
+            self._calls[name].merge(stats)
+        for reason, count in other._rejections.items():
+            self._rejections[reason] = self._rejections.get(reason, 0) + count
+        self._damage_dealt += other._damage_dealt
+        self._damage_taken += other._damage_taken
+        self._block_absorbed_by_player += other._block_absorbed_by_player
+        self._block_absorbed_by_monsters += other._block_absorbed_by_monsters
+        self._run_time_ns += other._run_time_ns
+
+    def get_calls(self, name: str) -> CallStats:
+        """
+        Returns the statistics for one instrumented function.
+
+        Args:
+            name (str): The name of the function, from TIMED.
+
+        Returns:
+            CallStats: The calls recorded.
+        """
+        return self._calls[name]
+
+    def get_rejections(self) -> dict[str, int]:
+        """
+        Returns the number of cards refused for each reason, as given by
+        Encounter.rejection_reason.
+
+        Returns:
+            dict[str, int]: The number of refusals by reason.
+        """
+        return dict(self._rejections)
+
+    def summary(self) -> dict[str, Any]:
+        """
+        Returns everything recorded, in a form that can be saved as JSON. The
+        run time is the wall time spent installed.
+
+        Returns:
+            dict[str, Any]: The summary.
+        """
+        return {
+            "run_seconds": self._run_time_ns / 1e9,
+            "calls": {
+                name: {"calls": stats.get_calls(), "seconds": stats.get_time()}
+                for name, stats in self._calls.items()
+            },
+            "rejections": dict(sorted(self._rejections.items())),
+            "damage_dealt": self._damage_dealt,
+            "damage_taken": self._damage_taken,
+            "block_absorbed_by_player": self._block_absorbed_by_player,
+            "block_absorbed_by_monsters": self._block_absorbed_by_monsters,
+        }
+
+    def __str__(self) -> str:
+        run_time = self._run_time_ns / 1e9
+        lines = [
+            f"{'function':<20}{'calls':>10}{'seconds':>10}{'us/call':>10}{'share':>8}"
+        ]
+        for name, stats in self._calls.items():
+            calls = stats.get_calls()
+            seconds = stats.get_time()
+            per_call = seconds / calls * 1e6 if calls else 0.0
+            share = seconds / run_time if run_time else 0.0
+            lines.append(
+                f"{name:<20}{calls:>10}{seconds:>10.3f}{per_call:>10.2f}{share:>8.1%}"
+            )
+        lines.append(f"Run time: {run_time:.3f} s")
+        rejections = ", ".join(
+            f"{reason} {count}" for reason, count in sorted(self._rejections.items())
+        )
+        lines.append(f"Cards refused: {rejections or 'none'}")
+        lines.append(f"Damage dealt: {self._damage_dealt}, taken: {self._damage_taken}")
+        lines.append(
+            f"Block absorbed by player: {self._block_absorbed_by_player}, "
+            f"by monsters: {self._block_absorbed_by_monsters}"
+        )
+        return "\n".join(lines)
+
+
+def main() -> None:
+    """
+    Command line entry point. Plays a batch of greedy games under
+    instrumentation in this process and prints, and optionally saves, the
+    summary.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("player_type", choices=list(PLAYER_TYPES))
+    parser.add_argument("game_file")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="save the summary to this JSON file")
+    args = parser.parse_args()
+
+    load_game(args.game_file)
+    with Instrumentation() as stats:
+        for index in range(args.games):
+            run_game(
+                args.player_type, args.game_file, rng=GameRNG.for_game(args.seed, index)
+            )
+    print(stats)
+    if args.output is not None:
+        summary = {"games": args.games, **stats.summary()}
+        with open(args.output, "w") as file:
+            json.dump(summary, file, indent=2)
+            file.write("\n")
+
+
+if __name__ == "__main__":
+    main()
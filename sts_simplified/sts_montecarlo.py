@@ -0,0 +1,542 @@
+"""
+Monte Carlo runner that plays large batches of headless games across processes.
+
+Games are split into chunks of consecutive game indices. Each chunk is played
+in a worker process, which sends back a BatchSummary rather than one record
+per game, and the summaries are merged as they arrive. Every game gets its own
+generator from GameRNG.for_game(seed, index), so a game's outcome does not
+depend on which worker played it or how many workers there were, and any
+single game can be replayed with run_game(..., rng=GameRNG.for_game(seed, k)).
+
+With vectorized=True each chunk is instead played in lockstep by
+sts_vector.run_games, which is many times faster but needs NumPy. Its games
+have the same distribution as run_game's, but are drawn from one generator
+per chunk, so the results depend on the chunk size and no single game can be
+replayed.
+
+With fast_forward=True the games are played by
+sts_fastforward.run_fast_forward_game, which finishes the final encounter
+without playing it once its outcome is decided. Each chunk has its own
+FastForward, whose cache and checks depend on the games before, so these
+results also depend on the chunk size.
+"""
+
+import argparse
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import TYPE_CHECKING, Callable, Sequence
+
+from sts_fastforward import fast_forward_for, run_fast_forward_game
+from sts_pool import GamePool
+from sts_simulate import PLAYER_TYPES, GameResult, Policy, greedy_policy, run_game
+from sts_support import GameRNG
+
+if TYPE_CHECKING:
+    from sts_vector import BatchGameResult
+
+DEFAULT_CHUNK_SIZE = 10_000
+
+
+class RunningStats:
+    """
+    Exact summary statistics for a stream of integer samples.
+
+    Sums are kept as Python integers, so merging summaries gives the same
+    result regardless of the order in which they are merged.
+    """
+
+    def __init__(self) -> None:
+        self._count = 0
+        self._total = 0
+        self._total_squares = 0
+        self._min = None
+        self._max = None
+
+    def add(self, value: int) -> None:
+        """
+        Adds one sample.
+
+        Args:
+            value (int): The sample to add.
+
+        Returns:
+            None
+        """
+        self._count += 1
+        self._total += value
+        self._total_squares += value * value
+        if self._min is None or value < self._min:
+            self._min = value
+        if self._max is None or value > self._max:
+            self._max = value
+
+    def add_all(self, values: Sequence[int]) -> None:
+        """
+        Adds many samples at once. Requires NumPy, and is much faster than
+        calling add for each sample of a NumPy array.
+
+        Args:
+            values (Sequence[int]): The samples to add.
+
+        Returns:
+            None
+        """
+        import numpy as np
+
+        values = np.asarray(values, dtype=np.int64)
+        if values.size == 0:
+            return
+        other = RunningStats()
+        other._count = int(values.size)
+        other._total = int(values.sum())
+        other._total_squares = int((values * values).sum())
+        other._min = int(values.min())
+        other._max = int(values.max())
+        self.merge(other)
+
+    def merge(self, other: "RunningStats") -> None:
+        """
+        Adds every sample summarised by other to this summary.
+
+        Args:
+            other (RunningStats): The summary to merge in.
+
+        Returns:
+            None
+        """
+        if other._count == 0:
+            return
+        self._count += other._count
+        self._total += other._total
+        self._total_squares += other._total_squares
+        if self._min is None or other._min < self._min:
+            self._min = other._min
+        if self._max is None or other._max > self._max:
+            self._max = other._max
+
+    def get_count(self) -> int:
+        """
+        Returns the number of samples.
+
+        Returns:
+            int: The number of samples.
+        """
+        return self._count
+
+    def get_mean(self) -> float:
+        """
+        Returns the mean of the samples, or 0.0 if there are none.
+
+        Returns:
+            float: The mean of the samples.
+        """
+        if self._count == 0:
+            return 0.0
+        return self._total / self._count
+
+    def get_variance(self) -> float:
+        """
+        Returns the population variance of the samples, or 0.0 if there are
+        none.
+
+        Returns:
+            float: The variance of the samples.
+        """
+        if self._count == 0:
+            return 0.0
+        numerator = self._count * self._total_squares - self._total * self._total
+        return numerator / (self._count * self._count)
+
+    def get_min(self) -> int | None:
+        """
+        Returns the smallest sample, or None if there are none.
+
+        Returns:
+            int | None: The smallest sample.
+        """
+        return self._min
+
+    def get_max(self) -> int | None:
+        """
+        Returns the largest sample, or None if there are none.
+
+        Returns:
+            int | None: The largest sample.
+        """
+        return self._max
+
+    def __str__(self) -> str:
+        """
+        Returns the string representation in the format
+        'mean {mean} sd {standard deviation} [{min}, {max}]'.
+
+        Returns:
+            str: The string representation of the summary.
+        """
+        return (
+            f"mean {self.get_mean():.3f} sd {self.get_variance() ** 0.5:.3f} "
+            f"[{self._min}, {self._max}]"
+        )
+
+
+class BatchSummary:
+    """
+    Merged statistics for a batch of games: the number of games and wins, and
+    the distributions of turns taken, HP remaining and cards played.
+    """
+
+    def __init__(self) -> None:
+        self._games = 0
+        self._wins = 0
+        self._turns = RunningStats()
+        self._hp = RunningStats()
+        self._cards_played = RunningStats()
+
+    def add(self, result: GameResult) -> None:
+        """
+        Adds the result of one game.
+
+        Args:
+            result (GameResult): The result to add.
+
+        Returns:
+            None
+        """
+        self._games += 1
+        if result.won:
+            self._wins += 1
+        self._turns.add(result.turns)
+        self._hp.add(result.hp)
+        self._cards_played.add(result.cards_played)
+
+    def add_batch(self, results: "BatchGameResult") -> None:
+        """
+        Adds the results of a batch of games played by sts_vector.run_games.
+
+        Args:
+            results (BatchGameResult): The results to add.
+
+        Returns:
+            None
+        """
+        self._games += len(results.won)
+        self._wins += int(results.won.sum())
+        self._turns.add_all(results.turns)
+        self._hp.add_all(results.hp)
+        self._cards_played.add_all(results.cards_played)
+
+    def merge(self, other: "BatchSummary") -> None:
+        """
+        Adds every game summarised by other to this summary.
+
+        Args:
+            other (BatchSummary): The summary to merge in.
+
+        Returns:
+            None
+        """
+        self._games += other._games
+        self._wins += other._wins
+        self._turns.merge(other._turns)
+        self._hp.merge(other._hp)
+        self._cards_played.merge(other._cards_played)
+
+    def get_games(self) -> int:
+        """
+        Returns the number of games summarised.
+
+        Returns:
+            int: The number of games summarised.
+        """
+        return self._games
+
+    def get_wins(self) -> int:
+        """
+        Returns the number of games won.
+
+        Returns:
+            int: The number of games won.
+        """
+        return self._wins
+
+    def get_win_rate(self) -> float:
+        """
+        Returns the fraction of games won, or 0.0 if there are no games.
+
+        Returns:
+            float: The fraction of games won.
+        """
+        if self._games == 0:
+            return 0.0
+        return self._wins / self._games
+
+    def get_turns(self) -> RunningStats:
+        """
+        Returns the statistics for the number of turns taken per game.
+
+        Returns:
+            RunningStats: The statistics for turns taken.
+        """
+        return self._turns
+
+    def get_hp(self) -> RunningStats:
+        """
+        Returns the statistics for the player's HP at the end of each game.
+
+        Returns:
+            RunningStats: The statistics for HP remaining.
+        """
+        return self._hp
+
+    def get_cards_played(self) -> RunningStats:
+        """
+        Returns the statistics for the number of cards played per game.
+
+        Returns:
+            RunningStats: The statistics for cards played.
+        """
+        return self._cards_played
+
+    def __str__(self) -> str:
+        """
+        Returns a multi-line, human readable report of the summary.
+
+        Returns:
+            str: The report.
+        """
+        return (
+            f"Games: {self._games}\n"
+            f"Win rate: {self.get_win_rate():.4f}\n"
+            f"Turns: {self._turns}\n"
+            f"HP: {self._hp}\n"
+            f"Cards played: {self._cards_played}"
+        )
+
+
+def run_chunk(
+    player_type: str,
+    game_file: str,
+    policy: Policy,
+    seed: int,
+    start: int,
+    stop: int,
+    fast_draws: bool = False,
+    vectorized: bool = False,
+    fast_forward: bool = False,
+) -> BatchSummary:
+    """
+    Plays games start to stop - 1 of a run and summarises them. This is the
+    unit of work sent to each worker process.
+
+    Args:
+        player_type (str): 'ironclad' or 'silent'.
+        game_file (str): The name of the game file to play.
+        policy (Policy): Chooses each move. Must be picklable, i.e. defined at
+        module level.
+        seed (int): The seed for the whole run.
+        start (int): The index of the first game in the chunk.
+        stop (int): One more than the index of the last game in the chunk.
+        fast_draws (bool): Whether the players draw cards in O(1) per card.
+        vectorized (bool): Whether to play the chunk with sts_vector.run_games,
+        from a generator seeded with seed and start.
+        fast_forward (bool): Whether to play the games with
+        run_fast_forward_game, sharing one FastForward.
+
+    Returns:
+        BatchSummary: The summary of the games in the chunk.
+    """
+    summary = BatchSummary()
+    if vectorized:
+        import numpy as np
+
+        from sts_vector import run_games
+
+        generator = np.random.default_rng([seed, start])
+        summary.add_batch(run_games(player_type, game_file, stop - start, generator))
+        return summary
+    # The games of a chunk are played one after another, so they can share one
+    # player and encounter.
+    pool = GamePool(max_free=1)
+    forward = None
+    if fast_forward:
+        forward = fast_forward_for(PLAYER_TYPES[player_type.lower()]())
+    for index in range(start, stop):
+        rng = GameRNG.for_game(seed, index)
+        if forward is not None:
+            result = run_fast_forward_game(
+                player_type, game_file, forward, rng, fast_draws, pool
+            )
+        else:
+            result = run_game(
+                player_type,
+                game_file,
+                policy,
+                rng=rng,
+                fast_draws=fast_draws,
+                pool=pool,
+            )
+        summary.add(result)
+    return summary
+
+
+def run_monte_carlo(
+    player_type: str,
+    game_file: str,
+    games: int,
+    policy: Policy = greedy_policy,
+    seed: int = 0,
+    workers: int | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    on_chunk: Callable[[BatchSummary], None] | None = None,
+    fast_draws: bool = False,
+    vectorized: bool = False,
+    fast_forward: bool = False,
+) -> BatchSummary:
+    """
+    Plays a batch of games, spread over a pool of worker processes, and
+    returns the merged statistics.
+
+    At most two chunks per worker are in flight at any time, so memory use
+    does not grow with the number of games. The merged result is identical
+    for any number of workers and any chunk size.
+
+    Args:
+        player_type (str): 'ironclad' or 'silent'.
+        game_file (str): The name of the game file to play.
+        games (int): The number of games to play.
+        policy (Policy): Chooses each move. Must be picklable.
+        seed (int): The seed for the whole run.
+        workers (int | None): The number of worker processes. Defaults to the
+        number of CPUs. With 1 worker the games are played in this process.
+        chunk_size (int): The number of games in each unit of work.
+        on_chunk (Callable[[BatchSummary], None] | None): Called with each
+        chunk summary as it arrives, e.g. to report progress.
+        fast_draws (bool): Whether the players draw cards in O(1) per card.
+        The results are still reproducible, but differ from those of the
+        default draws for the same seed.
+        vectorized (bool): Whether to play each chunk in lockstep with
+        sts_vector.run_games. Only greedy_policy is supported, and the
+        results depend on the chunk size as well as the seed.
+        fast_forward (bool): Whether to finish the final encounter without
+        playing it once its outcome is decided. Only greedy_policy is
+        supported. The results have the same distribution, but depend on the
+        chunk size as well as the seed.
+
+    Returns:
+        BatchSummary: The merged statistics for every game played.
+
+    Raises:
+        ValueError: If vectorized or fast_forward is combined with another
+        policy, or vectorized with fast_draws or fast_forward.
+    """
+    if (vectorized or fast_forward) and policy is not greedy_policy:
+        raise ValueError(
+            "vectorized and fast-forward games can only be played with "
+            "greedy_policy"
+        )
+    if vectorized and fast_draws:
+        raise ValueError("vectorized games cannot use fast_draws")
+    if vectorized and fast_forward:
+        raise ValueError("vectorized games cannot be fast-forwarded")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    chunks = [
+        (start, min(start + chunk_size, games)) for start in range(0, games, chunk_size)
+    ]
+    total = BatchSummary()
+
+    if workers == 1:
+        for start, stop in chunks:
+            summary = run_chunk(
+                player_type,
+                game_file,
+                policy,
+                seed,
+                start,
+                stop,
+                fast_draws,
+                vectorized,
+                fast_forward,
+            )
+            total.merge(summary)
+            if on_chunk is not None:
+                on_chunk(summary)
+        return total
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        remaining = iter(chunks)
+        while True:
+            for start, stop in remaining:
+                pending.add(
+                    executor.submit(
+                        run_chunk,
+                        player_type,
+                        game_file,
+                        policy,
+                        seed,
+                        start,
+                        stop,
+                        fast_draws,
+                        vectorized,
+                        fast_forward,
+                    )
+                )
+                if len(pending) >= 2 * workers:
+                    break
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                summary = future.result()
+                total.merge(summary)
+                if on_chunk is not None:
+                    on_chunk(summary)
+    return total
+
+
+def main() -> None:
+    """
+    Command line entry point, e.g.
+    python sts_montecarlo.py ironclad games/game3.txt --games 100000
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("player_type", choices=["ironclad", "silent"])
+    parser.add_argument("game_file")
+    parser.add_argument("--games", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument(
+        "--fast-draws",
+        action="store_true",
+        help="draw cards in O(1) per card (not seed-compatible with the default)",
+    )
+    parser.add_argument(
+        "--vectorized",
+        action="store_true",
+        help="play each chunk in lockstep with NumPy (greedy policy only)",
+    )
+    parser.add_argument(
+        "--fast-forward",
+        action="store_true",
+        help="finish a decided final encounter without playing it (greedy policy only)",
+    )
+    args = parser.parse_args()
+
+    summary = run_monte_carlo(
+        args.player_type,
+        args.game_file,
+        args.games,
+        seed=args.seed,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        fast_draws=args.fast_draws,
+        vectorized=args.vectorized,
+        fast_forward=args.fast_forward,
+    )
+    print(summary)
+
+
+if __name__ == "__main__":
+    main()
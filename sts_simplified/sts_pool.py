@@ -0,0 +1,143 @@
+"""
+Recycles players and encounters between games instead of building new ones.
+
+A game normally builds a new player, a new Encounter for each of its encounters,
+and new monsters for each of those. With a GamePool, a finished game's player
+and encounter are released back to the pool and reset in place by the next
+game that acquires them. An encounter keeps the monsters it has built and
+resets them for the next encounter it hosts, so monsters are recycled with
+their encounter. A reset player, encounter or monster behaves exactly like a
+new one built with the same arguments, including its use of the generator and
+the ids given to monsters, so pooled games play out the same as unpooled ones.
+
+pool = GamePool()
+for index in range(1000):
+    run_game("silent", "games/game3.txt", rng=GameRNG.for_game(0, index), pool=pool)
+"""
+
+from sts import PLAYER_TYPES, Encounter, Player
+from sts_support import EventBus, GameRNG
+
+# The most players of each type, and encounters, a pool keeps by default.
+DEFAULT_MAX_FREE = 64
+
+
+class GamePool:
+    """
+    Free lists of players, by type, and of encounters. Only release objects
+    that are no longer used anywhere else, as they will be reset and handed
+    out again.
+    """
+
+    def __init__(self, max_free: int = DEFAULT_MAX_FREE) -> None:
+        """
+        Args:
+            max_free (int): The most players of each type, and the most
+            encounters, to keep. Objects released beyond this are dropped.
+        """
+        self._max_free = max_free
+        self._free_players = {player_type: [] for player_type in PLAYER_TYPES}
+        self._free_encounters = []
+        self._built = 0
+        self._reused = 0
+
+    def get_built(self) -> int:
+        """
+        Returns the number of players and encounters this pool has had to build.
+
+        Returns:
+            int: The number of objects built.
+        """
+        return self._built
+
+    def get_reused(self) -> int:
+        """
+        Returns the number of players and encounters handed out again.
+
+        Returns:
+            int: The number of objects reused.
+        """
+        return self._reused
+
+    def acquire_player(
+        self,
+        player_type: str,
+        rng: GameRNG | None = None,
+        fast_draws: bool = False,
+    ) -> Player:
+        """
+        Returns a player at the start of a game, reset from the pool if one is
+        free.
+
+        Args:
+            player_type (str): 'ironclad' or 'silent'.
+            rng (GameRNG | None): The generator for the game.
+            fast_draws (bool): Whether the player draws cards in O(1) per card.
+
+        Returns:
+            Player: The player.
+        """
+        player_type = player_type.lower()
+        free = self._free_players[player_type]
+        if free:
+            player = free.pop()
+            player.reset(rng, fast_draws)
+            self._reused += 1
+            return player
+        self._built += 1
+        return PLAYER_TYPES[player_type](rng, fast_draws=fast_draws)
+
+    def release_player(self, player: Player) -> None:
+        """
+        Gives a player whose game is over back to the pool.
+
+        Args:
+            player (Player): The player, of one of PLAYER_TYPES.
+        """
+        for player_type, player_class in PLAYER_TYPES.items():
+            if type(player) is player_class:
+                free = self._free_players[player_type]
+                if len(free) < self._max_free:
+                    free.append(player)
+                return
+
+    def acquire_encounter(
+        self,
+        player: Player,
+        monsters: list[tuple[str, int]],
+        rng: GameRNG | None = None,
+        bus: EventBus | None = None,
+        first_id: int | None = None,
+    ) -> Encounter:
+        """
+        Returns a new encounter, reset from the pool if one is free. The
+        arguments are those of Encounter.
+
+        Args:
+            player (Player): The player participating in the encounter.
+            monsters (list[tuple[str, int]]): The name and max HP of each
+            monster.
+            rng (GameRNG | None): The generator for creating monsters.
+            bus (EventBus | None): Receives the events of the encounter.
+            first_id (int | None): If given, the id of the first monster.
+
+        Returns:
+            Encounter: The encounter, with the player's first turn started.
+        """
+        if self._free_encounters:
+            encounter = self._free_encounters.pop()
+            encounter.reset(player, monsters, rng, bus, first_id)
+            self._reused += 1
+            return encounter
+        self._built += 1
+        return Encounter(player, monsters, rng, bus, first_id)
+
+    def release_encounter(self, encounter: Encounter) -> None:
+        """
+        Gives a finished encounter, and the monsters it built, back to the pool.
+
+        Args:
+            encounter (Encounter): The encounter.
+        """
+        if len(self._free_encounters) < self._max_free:
+            self._free_encounters.append(encounter)
@@ -0,0 +1,252 @@
+"""
+Replays recorded gameplay transcripts headlessly and checks them.
+
+A transcript is the text of an interactive game as it appeared on the terminal,
+such as gameplay/example_game_1.txt: each prompt followed by the line typed at
+it, and everything the game printed. The player type, game file and moves are
+read back from the prompts. A game played with a generator other than the one
+main() uses starts with a line giving its seed, e.g. "# seed: 42". The game is
+then played again through GameSession with a fresh generator seeded with the
+recording's seed, and its output is
+compared with the transcript. Trailing whitespace is ignored, both on the lines
+typed and in the comparison, as terminals record it inconsistently. Game files
+are found relative to the current directory, as they were when the game was
+recorded.
+
+python sts_replay.py gameplay/*.txt
+"""
+
+import argparse
+import difflib
+import io
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, NamedTuple, Sequence
+
+from sts import GameSession
+from sts_simulate import load_game
+from sts_support import (
+    DEFAULT_SEED,
+    GAME_FILE_PROMPT,
+    MOVE_PROMPT,
+    PLAYER_TYPE_PROMPT,
+    GameRNG,
+    Renderer,
+)
+
+# The first line of a transcript played with a seed other than DEFAULT_SEED.
+SEED_HEADER = "# seed: "
+
+# Matches every line of input in a transcript: the prompt and the line typed.
+_INPUT_LINE = re.compile(
+    "^("
+    + "|".join(
+        re.escape(prompt)
+        for prompt in (PLAYER_TYPE_PROMPT, GAME_FILE_PROMPT, MOVE_PROMPT)
+    )
+    + r")(.*?)[ \t]*$",
+    re.MULTILINE,
+)
+
+# Diffs longer than this are cut short.
+MAX_DIFF_LINES = 40
+
+
+class Recording(NamedTuple):
+    """
+    Everything needed to play a recorded game again.
+    """
+
+    player_type: str
+    game_file: str
+    moves: tuple[str, ...]
+    seed: int = DEFAULT_SEED
+
+
+class ReplayResult(NamedTuple):
+    """
+    The outcome of checking one transcript.
+    """
+
+    path: str
+    ok: bool
+    diff: str
+
+
+def parse_transcript(text: str, seed: int = DEFAULT_SEED) -> Recording:
+    """
+    Reads the player type, game file and moves back from a transcript.
+
+    Args:
+        text (str): The transcript.
+        seed (int): The seed the game was played with, if the transcript does
+        not give one. Transcripts of main() are played with DEFAULT_SEED.
+
+    Returns:
+        Recording: The recorded game.
+
+    Raises:
+        ValueError: If the transcript does not start with the player type and
+        game file prompts, or its seed is not an integer.
+    """
+    if text.startswith(SEED_HEADER):
+        header, _, text = text.partition("\n")
+        seed = int(header[len(SEED_HEADER) :])
+    player_type = game_file = None
+    moves = []
+    for prompt, line in _INPUT_LINE.findall(text):
+        if prompt == MOVE_PROMPT:
+            moves.append(line)
+        elif prompt == PLAYER_TYPE_PROMPT and player_type is None:
+            player_type = line
+        elif prompt == GAME_FILE_PROMPT and game_file is None:
+            game_file = line
+    if player_type is None or game_file is None:
+        raise ValueError("not a transcript: no player type or game file prompt")
+    return Recording(player_type, game_file, tuple(moves), seed)
+
+
+def replay(recording: Recording) -> str:
+    """
+    Plays a recorded game again and returns its transcript, with each line of
+    input echoed after its prompt as a terminal would show it. Play stops when
+    the game is over or the recorded moves run out. The transcript starts with
+    a seed line unless the seed is DEFAULT_SEED.
+
+    Args:
+        recording (Recording): The game to play.
+
+    Returns:
+        str: The transcript of the game.
+    """
+    output = io.StringIO()
+    if recording.seed != DEFAULT_SEED:
+        output.write(f"{SEED_HEADER}{recording.seed}\n")
+    session = GameSession(
+        Renderer(output), GameRNG(recording.seed), output, game_loader=load_game
+    )
+    lines = iter((recording.player_type, recording.game_file) + recording.moves)
+    for line in lines:
+        output.write(f"{session.get_prompt()}{line}\n")
+        session.send(line)
+        if session.is_finished():
+            break
+    return output.getvalue()
+
+
+def _normalise(text: str) -> list[str]:
+    """
+    Returns the lines of text for comparison, without trailing whitespace or
+    trailing blank lines.
+    """
+    return [line.rstrip() + "\n" for line in text.rstrip().splitlines()]
+
+
+def verify_transcript(path: str, seed: int = DEFAULT_SEED) -> ReplayResult:
+    """
+    Replays the transcript at path and compares the result with it, ignoring
+    trailing whitespace on each line and trailing blank lines.
+
+    Args:
+        path (str): The transcript file.
+        seed (int): The seed the game was played with, if the transcript does
+        not give one.
+
+    Returns:
+        ReplayResult: Whether the replay matched, and a unified diff if not.
+    """
+    with open(path) as file:
+        expected = file.read()
+    try:
+        actual = replay(parse_transcript(expected, seed))
+    except (OSError, ValueError) as error:
+        return ReplayResult(path, False, f"{path}: {error}\n")
+    if actual.rstrip() == expected.rstrip():
+        return ReplayResult(path, True, "")
+    expected_lines = _normalise(expected)
+    actual_lines = _normalise(actual)
+    if actual_lines == expected_lines:
+        return ReplayResult(path, True, "")
+    diff = list(
+        difflib.unified_diff(
+            expected_lines, actual_lines, fromfile=path, tofile="replay", n=2
+        )
+    )
+    if len(diff) > MAX_DIFF_LINES:
+        diff = diff[:MAX_DIFF_LINES] + ["...\n"]
+    return ReplayResult(path, False, "".join(diff))
+
+
+def _verify_chunk(paths: Sequence[str], seed: int) -> list[ReplayResult]:
+    """
+    Checks a chunk of transcripts. This is the unit of work sent to each worker
+    process.
+    """
+    return [verify_transcript(path, seed) for path in paths]
+
+
+def verify_transcripts(
+    paths: Sequence[str],
+    seed: int = DEFAULT_SEED,
+    workers: int | None = None,
+) -> Iterator[ReplayResult]:
+    """
+    Checks many transcripts, spread over a pool of worker processes. Results
+    are produced in the order of paths.
+
+    Args:
+        paths (Sequence[str]): The transcript files.
+        seed (int): The seed for transcripts that do not give one.
+        workers (int | None): The number of worker processes. Defaults to the
+        number of CPUs. With 1 worker the transcripts are checked in this
+        process.
+
+    Returns:
+        Iterator[ReplayResult]: The result for each transcript.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers == 1 or len(paths) <= 1:
+        for path in paths:
+            yield verify_transcript(path, seed)
+        return
+    # A few chunks per worker keeps the workers busy without sending each
+    # transcript separately.
+    chunk_size = max(1, -(-len(paths) // (4 * workers)))
+    chunks = [
+        paths[start : start + chunk_size] for start in range(0, len(paths), chunk_size)
+    ]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for results in executor.map(_verify_chunk, chunks, [seed] * len(chunks)):
+            yield from results
+
+
+def main() -> None:
+    """
+    Command line entry point. Prints a line for each transcript that does not
+    match, with its diff, and a summary. Exits with status 1 if any failed.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("transcripts", nargs="+")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--quiet", action="store_true", help="do not print the diffs")
+    args = parser.parse_args()
+
+    failed = 0
+    for result in verify_transcripts(args.transcripts, args.seed, args.workers):
+        if not result.ok:
+            failed += 1
+            print(f"FAIL {result.path}")
+            if not args.quiet:
+                print(result.diff)
+    total = len(args.transcripts)
+    print(f"{total - failed}/{total} transcripts match")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
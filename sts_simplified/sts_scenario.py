@@ -0,0 +1,476 @@
+"""
+Compiled binary scenarios: game files encoded as packed integers.
+
+A scenario file holds the encounters of a game file in a compact binary form
+that can be mapped into memory and used without parsing:
+
+    header      SCENARIO_HEADER (little-endian): magic, version, the number of
+                monster types, encounters and monsters, the size of the name
+                table, and the mtime, size and content hash of the source file
+    names       the monster type names, UTF-8, separated by newlines, padded to
+                a multiple of 4 bytes
+    offsets     uint32[encounters + 1]: encounter i is monsters
+                offsets[i] to offsets[i + 1] - 1
+    hp          uint32[monsters]: the start HP of each monster
+    kinds       uint8[monsters]: each monster's index into the name table
+
+load_game_file keeps a compiled copy of each game file in a cache directory,
+keyed by the source's path. The directory is private to the user, under
+$XDG_CACHE_HOME (by default ~/.cache). The cached copy is used as long as the source's
+mtime and size are unchanged, or, if they have changed, its content hash
+still matches. Otherwise it is recompiled. Every process that loads the same
+game file maps the same cached file, so pool workers share one copy of the
+data instead of each re-tokenizing the text.
+"""
+
+import argparse
+import array
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from collections.abc import Sequence
+from typing import Iterable
+
+from sts_support import iter_game_file
+
+MAGIC = b"STSC"
+VERSION = 1
+SCENARIO_HEADER = struct.Struct("<4sHHIIIqq16s4x")
+HASH_SIZE = 16
+# The position of the source mtime within SCENARIO_HEADER.
+MTIME_OFFSET = struct.calcsize("<4sHHIII")
+MAX_MONSTER_TYPES = 256
+
+# The cache directory's name within the user's cache directory.
+CACHE_DIR_NAME = "sts_scenarios"
+
+
+class ScenarioError(ValueError):
+    """
+    Raised when a file is not a valid compiled scenario.
+    """
+
+
+class Scenario(Sequence):
+    """
+    The encounters of a game, backed by packed integer arrays. Indexing a
+    Scenario gives the monsters in one encounter in the format of
+    read_game_file, a list of (monster_type, start_hp) tuples, so a Scenario
+    can be used anywhere the list returned by read_game_file can.
+
+    A Scenario loaded by load_scenario reads straight from a memory mapped
+    file. close() releases the mapping; it is also released when the
+    Scenario is garbage collected.
+    """
+
+    def __init__(
+        self,
+        type_names: Iterable[str],
+        offsets: Sequence[int],
+        hp: Sequence[int],
+        kinds: Sequence[int],
+        mapping: mmap.mmap | None = None,
+    ) -> None:
+        """
+        Args:
+            type_names (Iterable[str]): The monster type names, indexed by
+            kind.
+            offsets (Sequence[int]): The index of the first monster of each
+            encounter, followed by the total number of monsters.
+            hp (Sequence[int]): The start HP of each monster.
+            kinds (Sequence[int]): The type of each monster.
+            mapping (mmap.mmap | None): The memory map the arrays are views
+            of, if any, to be closed by close().
+
+        Returns:
+            None
+        """
+        self._type_names = tuple(type_names)
+        self._offsets = offsets
+        self._hp = hp
+        self._kinds = kinds
+        self._mapping = mapping
+
+    def __len__(self) -> int:
+        """
+        Returns the number of encounters.
+
+        Returns:
+            int: The number of encounters.
+        """
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int | slice) -> list:
+        """
+        Returns the monsters in an encounter, or a list of encounters for a
+        slice.
+
+        Args:
+            index (int | slice): The index of the encounter.
+
+        Returns:
+            list: The (monster_type, start_hp) tuples of the encounter.
+        """
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("scenario index out of range")
+        names = self._type_names
+        hp = self._hp
+        kinds = self._kinds
+        return [
+            (names[kinds[i]], hp[i])
+            for i in range(self._offsets[index], self._offsets[index + 1])
+        ]
+
+    def get_type_names(self) -> tuple[str, ...]:
+        """
+        Returns the monster type names, indexed by kind.
+
+        Returns:
+            tuple[str, ...]: The monster type names.
+        """
+        return self._type_names
+
+    def get_monster_count(self) -> int:
+        """
+        Returns the total number of monsters in all encounters.
+
+        Returns:
+            int: The number of monsters.
+        """
+        return len(self._hp)
+
+    def close(self) -> None:
+        """
+        Releases the memory map behind this scenario, if any. The scenario
+        cannot be used afterwards.
+        """
+        if self._mapping is None:
+            return
+        for view in (self._offsets, self._hp, self._kinds):
+            if isinstance(view, memoryview):
+                view.release()
+        self._offsets = self._hp = self._kinds = ()
+        self._mapping.close()
+        self._mapping = None
+
+    def __enter__(self) -> "Scenario":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _file_digest(path: str) -> bytes:
+    """Returns the content hash used to validate cached scenarios."""
+    digest = hashlib.blake2b(digest_size=HASH_SIZE)
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.digest()
+
+
+def _pad(size: int) -> int:
+    """Returns size rounded up to a multiple of 4."""
+    return (size + 3) & ~3
+
+
+def encode_encounters(
+    encounters: Iterable[list[tuple[str, int]]],
+    source_mtime_ns: int = 0,
+    source_size: int = 0,
+    source_hash: bytes = bytes(HASH_SIZE),
+) -> bytes:
+    """
+    Encodes encounters, in the format of read_game_file, as a compiled
+    scenario.
+
+    Args:
+        encounters (Iterable[list[tuple[str, int]]]): The encounters to encode.
+        source_mtime_ns (int): The mtime of the source file, for the cache.
+        source_size (int): The size of the source file, for the cache.
+        source_hash (bytes): The content hash of the source file.
+
+    Returns:
+        bytes: The compiled scenario.
+
+    Raises:
+        ScenarioError: If there are more than MAX_MONSTER_TYPES monster types.
+    """
+    type_ids: dict[str, int] = {}
+    offsets = array.array("I", [0])
+    hp = array.array("I")
+    kinds = array.array("B")
+    for monsters in encounters:
+        for monster_type, start_hp in monsters:
+            kind = type_ids.setdefault(monster_type, len(type_ids))
+            if kind >= MAX_MONSTER_TYPES:
+                raise ScenarioError(
+                    f"more than {MAX_MONSTER_TYPES} monster types in one scenario"
+                )
+            kinds.append(kind)
+            hp.append(start_hp)
+        offsets.append(len(hp))
+
+    for values in (offsets, hp):
+        if sys.byteorder != "little":
+            values.byteswap()
+    names = "\n".join(type_ids).encode()
+    header = SCENARIO_HEADER.pack(
+        MAGIC,
+        VERSION,
+        len(type_ids),
+        len(offsets) - 1,
+        len(hp),
+        len(names),
+        source_mtime_ns,
+        source_size,
+        source_hash,
+    )
+    return b"".join(
+        (
+            header,
+            names.ljust(_pad(len(names)), b"\0"),
+            offsets.tobytes(),
+            hp.tobytes(),
+            kinds.tobytes(),
+        )
+    )
+
+
+def _write_atomically(data: bytes, destination: str) -> None:
+    """
+    Writes data to a temporary file next to destination and moves it into
+    place, so that readers see either the old file or the whole new one.
+    Processes that have the old file mapped keep their copy.
+
+    Args:
+        data (bytes): The new contents.
+        destination (str): The file to replace.
+    """
+    directory = os.path.dirname(os.path.abspath(destination))
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(data)
+        os.replace(temporary, destination)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+def compile_game_file(source: str, destination: str) -> None:
+    """
+    Compiles a game file into a scenario file. The destination is replaced
+    atomically, so processes loading it concurrently never see a partly
+    written file.
+
+    Args:
+        source (str): The game file to compile.
+        destination (str): The scenario file to write.
+
+    Returns:
+        None
+
+    Raises:
+        GameFileError: If the game file is not valid.
+    """
+    stat = os.stat(source)
+    data = encode_encounters(
+        iter_game_file(source), stat.st_mtime_ns, stat.st_size, _file_digest(source)
+    )
+    _write_atomically(data, destination)
+
+
+def read_header(path: str) -> tuple:
+    """
+    Reads and checks the header of a scenario file.
+
+    Args:
+        path (str): The scenario file.
+
+    Returns:
+        tuple: The unpacked SCENARIO_HEADER fields.
+
+    Raises:
+        ScenarioError: If the file is not a scenario of this version.
+    """
+    with open(path, "rb") as file:
+        data = file.read(SCENARIO_HEADER.size)
+    if len(data) < SCENARIO_HEADER.size or data[:4] != MAGIC:
+        raise ScenarioError(f"{path} is not a compiled scenario")
+    header = SCENARIO_HEADER.unpack(data)
+    if header[1] != VERSION:
+        raise ScenarioError(f"{path} has version {header[1]}, expected {VERSION}")
+    return header
+
+
+def load_scenario(path: str) -> Scenario:
+    """
+    Maps a scenario file into memory. The encounters are read from the
+    mapping on demand, without copying or parsing the file.
+
+    Args:
+        path (str): The scenario file.
+
+    Returns:
+        Scenario: The encounters in the file.
+
+    Raises:
+        ScenarioError: If the file is not a valid scenario.
+    """
+    _, _, type_count, encounters, monsters, names_size, *_ = read_header(path)
+    with open(path, "rb") as file:
+        mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    position = SCENARIO_HEADER.size
+    names = mapping[position : position + names_size].decode()
+    position += _pad(names_size)
+    sizes = ((encounters + 1) * 4, monsters * 4, monsters)
+    if len(mapping) != position + sum(sizes):
+        mapping.close()
+        raise ScenarioError(f"{path} is truncated or corrupt")
+
+    view = memoryview(mapping)
+    offsets = view[position : position + sizes[0]].cast("I")
+    position += sizes[0]
+    hp = view[position : position + sizes[1]].cast("I")
+    position += sizes[1]
+    kinds = view[position : position + sizes[2]]
+    view.release()
+    if sys.byteorder != "little":
+        # The arrays are stored little-endian, so they must be copied here.
+        swapped = []
+        for values in (offsets, hp):
+            values_copy = array.array("I", values.tobytes())
+            values_copy.byteswap()
+            values.release()
+            swapped.append(values_copy)
+        offsets, hp = swapped
+    type_names = names.split("\n") if type_count else []
+    return Scenario(type_names, offsets, hp, kinds, mapping)
+
+
+def default_cache_dir() -> str:
+    """
+    Returns the user's scenario cache directory, under $XDG_CACHE_HOME, or
+    ~/.cache if that is not set.
+
+    Returns:
+        str: The cache directory, which may not exist yet.
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_home, CACHE_DIR_NAME)
+
+
+def cache_path(source: str, cache_dir: str | None = None) -> str:
+    """
+    Returns the path of the cached scenario for a game file, which is derived
+    from the game file's absolute path.
+
+    Args:
+        source (str): The game file.
+        cache_dir (str | None): The cache directory. Defaults to
+        default_cache_dir().
+
+    Returns:
+        str: The path of the cached scenario.
+    """
+    if cache_dir is None:
+        cache_dir = default_cache_dir()
+    key = hashlib.blake2b(os.path.abspath(source).encode(), digest_size=16)
+    return os.path.join(cache_dir, f"{key.hexdigest()}.stsc")
+
+
+def _record_mtime(path: str, mtime_ns: int) -> None:
+    """
+    Replaces a scenario file with a copy recording a new source mtime.
+
+    Args:
+        path (str): The scenario file.
+        mtime_ns (int): The source's mtime in nanoseconds.
+    """
+    with open(path, "rb") as file:
+        data = bytearray(file.read())
+    struct.pack_into("<q", data, MTIME_OFFSET, mtime_ns)
+    _write_atomically(data, path)
+
+
+def load_game_file(source: str, cache_dir: str | None = None) -> Scenario:
+    """
+    Loads a game file through the scenario cache, compiling it only if there
+    is no valid compiled copy. A cached copy is valid if the game file's
+    mtime and size match those it was compiled from, or, failing that, its
+    content hash does. A cached copy that cannot be read is compiled again.
+
+    Args:
+        source (str): The game file.
+        cache_dir (str | None): The cache directory, created if needed,
+        readable only by the user. Defaults to default_cache_dir().
+
+    Returns:
+        Scenario: The encounters in the game file.
+
+    Raises:
+        GameFileError: If the game file is not valid.
+    """
+    if cache_dir is None:
+        cache_dir = default_cache_dir()
+    path = cache_path(source, cache_dir)
+    stat = os.stat(source)
+    try:
+        header = read_header(path)
+    except (OSError, ScenarioError):
+        header = None
+    if header is not None:
+        mtime_ns, size, digest = header[6:9]
+        valid = (mtime_ns, size) == (stat.st_mtime_ns, stat.st_size)
+        if not valid and size == stat.st_size and digest == _file_digest(source):
+            # The file was touched but not changed. Record its new mtime so
+            # that the next load does not need to hash it again.
+            _record_mtime(path, stat.st_mtime_ns)
+            valid = True
+        if valid:
+            try:
+                return load_scenario(path)
+            except (OSError, ScenarioError):
+                pass
+    os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+    compile_game_file(source, path)
+    return load_scenario(path)
+
+
+def main() -> None:
+    """
+    Command line entry point, e.g.
+    python sts_scenario.py compile games/game3.txt game3.stsc
+    python sts_scenario.py show game3.stsc
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    compile_parser = commands.add_parser("compile", help="compile a game file")
+    compile_parser.add_argument("source")
+    compile_parser.add_argument("destination")
+    show_parser = commands.add_parser("show", help="print a compiled scenario")
+    show_parser.add_argument("scenario")
+    args = parser.parse_args()
+
+    if args.command == "compile":
+        compile_game_file(args.source, args.destination)
+    else:
+        with load_scenario(args.scenario) as scenario:
+            for index, monsters in enumerate(scenario, 1):
+                print(f"Encounter {index}")
+                for monster_type, start_hp in monsters:
+                    print(f"{monster_type} {start_hp}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""
+An asyncio server that hosts many games at once over TCP or a Unix socket.
+
+Each connection plays one game through its own GameSession, with its own
+player, encounters and generator. The protocol is the terminal's: the server
+sends exactly what main() prints, each prompt included (without a newline),
+and the client answers each prompt with one line, using the moves main()
+accepts, e.g. "play Bash 0", "end turn", "inspect deck" or "describe Strike".
+A prompt therefore marks the end of each response. The connection is closed
+when the game is over.
+
+Game files are only read from the games directory. Connection number k of a
+server started with --seed s uses GameRNG.for_game(s, k), so games can be
+reproduced.
+
+python sts_server.py --port 8023
+python sts_server.py --unix /tmp/sts.sock
+"""
+
+import argparse
+import asyncio
+import io
+import itertools
+import os
+import socket
+
+from sts import GameSession
+from sts_simulate import load_game
+from sts_scenario import Scenario
+from sts_support import GameRNG, Renderer
+
+DEFAULT_PORT = 8023
+DEFAULT_IDLE_TIMEOUT = 300.0
+DEFAULT_MAX_SESSIONS = 10_000
+# How many connections may wait to be accepted. asyncio's default of 100 makes
+# clients that connect in a burst wait out SYN retries.
+LISTEN_BACKLOG = 4096
+# The longest line a client may send.
+MAX_LINE_LENGTH = 1024
+
+IDLE_MESSAGE = "\nIdle for too long, goodbye.\n"
+BUSY_MESSAGE = "The server is full, try again later.\n"
+LINE_TOO_LONG_MESSAGE = "\nLine too long, goodbye.\n"
+
+
+class GameServer:
+    """
+    Serves games on one TCP port or Unix socket. Output to each client is
+    collected in a per-session buffer and sent with one write per line of
+    input. The server waits for each write to drain before reading the next
+    line, so a client that stops reading stops its own game rather than
+    filling the server's memory. A client that sends nothing for idle_timeout
+    seconds, or does not read its output for as long, is disconnected.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = DEFAULT_PORT,
+        unix_path: str | None = None,
+        seed: int = 0,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        games_dir: str = "games",
+        quiet: bool = False,
+    ) -> None:
+        """
+        Args:
+            host (str): The address to listen on for TCP.
+            port (int): The TCP port, or 0 for any free port.
+            unix_path (str | None): If given, listen on this Unix socket instead
+            of TCP.
+            seed (int): The seed from which each connection's generator is
+            derived.
+            idle_timeout (float): Seconds a client may stay silent, or leave its
+            output unread, before it is disconnected.
+            max_sessions (int): The most games in progress at once. Further
+            clients are told the server is full and disconnected.
+            games_dir (str): The only directory game files are read from.
+            quiet (bool): Whether to leave out the encounter states, for bots
+            that only need the prompts and messages.
+        """
+        self._host = host
+        self._port = port
+        self._unix_path = unix_path
+        self._seed = seed
+        self._idle_timeout = idle_timeout
+        self._max_sessions = max_sessions
+        self._games_dir = os.path.realpath(games_dir)
+        self._quiet = quiet
+        self._connections = itertools.count()
+        self._active = 0
+        self._served = 0
+        self._server = None
+        # The handler task and writer of each open connection.
+        self._sessions = {}
+
+    def get_active(self) -> int:
+        """
+        Returns the number of games in progress.
+
+        Returns:
+            int: The number of open sessions.
+        """
+        return self._active
+
+    def get_served(self) -> int:
+        """
+        Returns the number of sessions that have ended.
+
+        Returns:
+            int: The number of closed sessions.
+        """
+        return self._served
+
+    async def start(self) -> str | tuple[str, int]:
+        """
+        Starts listening.
+
+        Returns:
+            str | tuple[str, int]: The Unix socket path, or the TCP host and
+            port actually bound.
+        """
+        if self._unix_path is not None:
+            self._server = await asyncio.start_unix_server(
+                self._handle,
+                self._unix_path,
+                limit=MAX_LINE_LENGTH,
+                backlog=LISTEN_BACKLOG,
+            )
+            return self._unix_path
+        self._server = await asyncio.start_server(
+            self._handle,
+            self._host,
+            self._port,
+            limit=MAX_LINE_LENGTH,
+            backlog=LISTEN_BACKLOG,
+        )
+        for sock in self._server.sockets:
+            if sock.family in (socket.AF_INET, socket.AF_INET6):
+                return sock.getsockname()[:2]
+        return self._host, self._port
+
+    async def serve_forever(self) -> None:
+        """
+        Starts listening if need be, and serves until cancelled.
+        """
+        if self._server is None:
+            await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self) -> None:
+        """
+        Stops accepting connections, disconnects every client, dropping any
+        output not yet sent, and waits for their sessions to end. A Unix socket
+        file is removed, so the next server can bind the same path.
+        """
+        if self._server is not None:
+            self._server.close()
+        for writer in self._sessions.values():
+            writer.transport.abort()
+        await asyncio.gather(*self._sessions, return_exceptions=True)
+        if self._server is None:
+            return
+        await self._server.wait_closed()
+        if self._unix_path is not None:
+            try:
+                os.unlink(self._unix_path)
+            except FileNotFoundError:
+                pass
+
+    def load_game(self, game_file: str) -> Scenario:
+        """
+        Reads a game file for a session, if it is in the games directory.
+
+        Args:
+            game_file (str): The file name the client gave.
+
+        Returns:
+            Scenario: The encounters of the game.
+
+        Raises:
+            ValueError: If there is no such file in the games directory.
+        """
+        path = os.path.realpath(game_file)
+        if (
+            os.path.commonpath([path, self._games_dir]) != self._games_dir
+            or not os.path.isfile(path)
+        ):
+            raise ValueError(f"no game file {game_file!r}")
+        return load_game(path)
+
+    async def _send(self, writer: asyncio.StreamWriter, buffer: io.StringIO) -> None:
+        """
+        Sends everything in buffer to the client in one write, empties it, and
+        waits until the client has taken enough of its output.
+        """
+        writer.write(buffer.getvalue().encode())
+        buffer.seek(0)
+        buffer.truncate()
+        await asyncio.wait_for(writer.drain(), self._idle_timeout)
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """
+        Plays one game with a connected client.
+        """
+        if self._active >= self._max_sessions:
+            writer.write(BUSY_MESSAGE.encode())
+            writer.close()
+            return
+        self._active += 1
+        task = asyncio.current_task()
+        self._sessions[task] = writer
+        buffer = io.StringIO()
+        rng = GameRNG.for_game(self._seed, next(self._connections))
+        session = GameSession(
+            Renderer(buffer, quiet=self._quiet), rng, buffer, self.load_game
+        )
+        try:
+            while not session.is_finished():
+                buffer.write(session.get_prompt())
+                await self._send(writer, buffer)
+                try:
+                    line = await asyncio.wait_for(
+                        reader.readline(), self._idle_timeout
+                    )
+                except asyncio.TimeoutError:
+                    buffer.write(IDLE_MESSAGE)
+                    break
+                except ValueError:
+                    buffer.write(LINE_TOO_LONG_MESSAGE)
+                    break
+                if not line:
+                    break
+                try:
+                    session.send(line.decode(errors="replace").rstrip("\r\n"))
+                except (OSError, ValueError) as error:
+                    buffer.write(f"\n{error}\n\n")
+            await self._send(writer, buffer)
+        except ConnectionError:
+            pass
+        except asyncio.TimeoutError:
+            # The client stopped reading, so its output would never be sent.
+            writer.transport.abort()
+        finally:
+            del self._sessions[task]
+            self._active -= 1
+            self._served += 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+
+def main() -> None:
+    """
+    Command line entry point. Serves until interrupted.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--idle-timeout", type=float, default=DEFAULT_IDLE_TIMEOUT)
+    parser.add_argument("--max-sessions", type=int, default=DEFAULT_MAX_SESSIONS)
+    parser.add_argument("--games-dir", default="games")
+    parser.add_argument(
+        "--quiet", action="store_true", help="do not send the encounter states"
+    )
+    args = parser.parse_args()
+
+    server = GameServer(
+        args.host,
+        args.port,
+        args.unix,
+        args.seed,
+        args.idle_timeout,
+        args.max_sessions,
+        args.games_dir,
+        args.quiet,
+    )
+
+    async def serve():
+        address = await server.start()
+        print(f"Serving on {address}", flush=True)
+        await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
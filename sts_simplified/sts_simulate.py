@@ -0,0 +1,301 @@
+"""
+Headless simulation of complete games.
+
+main() in sts.py drives a game through input() and display_encounter, which is
+fine for a human at a terminal but far too slow for running many games. This
+module plays whole games through the same Encounter and Player classes with no
+terminal I/O at all. Moves are chosen by a policy: a callable that receives the
+current encounter and returns either (card_name, target_id) to play a card, or
+None to end the turn.
+"""
+
+from functools import lru_cache
+from typing import Callable, NamedTuple, Sequence
+
+from sts import PLAYER_TYPES, Card, Encounter, Player
+from sts_pool import GamePool
+from sts_scenario import Scenario, load_game_file
+from sts_support import GameRNG
+
+Move = tuple[str, int | None] | None
+Policy = Callable[[Encounter], Move]
+
+# Safety net for policies that never finish an encounter.
+MAX_TURNS = 1000
+
+
+class GameResult(NamedTuple):
+    """
+    The outcome of one simulated game.
+
+    Attributes:
+    - won (bool): True if every encounter in the game was won.
+    - turns (int): The number of player turns taken over the whole game.
+    - hp (int): The player's HP when the game finished.
+    - cards_played (int): The number of cards successfully played.
+    - encounters_won (int): The number of encounters the player won.
+    """
+
+    won: bool
+    turns: int
+    hp: int
+    cards_played: int
+    encounters_won: int
+
+
+class EncounterFinish(NamedTuple):
+    """
+    The rest of an encounter, worked out without playing it, as returned by
+    Game.finish_early.
+
+    Attributes:
+    - turns (int): The number of further player turns started, i.e. the enemy
+                   turns the player survives.
+    - cards_played (int): The number of cards played.
+    - defeated (bool): True if the player is defeated.
+    """
+
+    turns: int
+    cards_played: int
+    defeated: bool
+
+
+_card_scores: dict[str, tuple[int, int]] = {}
+
+
+def card_score(card: Card) -> tuple[int, int]:
+    """
+    Returns the ranking greedy_policy uses for a card, computing it only the
+    first time a card with that name is seen.
+    """
+    score = _card_scores.get(card.get_name())
+    if score is None:
+        score = (
+            card.get_damage_amount() + sum(card.get_status_modifiers().values()),
+            card.get_block(),
+        )
+        _card_scores[card.get_name()] = score
+    return score
+
+
+def greedy_policy(encounter: Encounter) -> Move:
+    """
+    A simple policy that plays the strongest affordable card in hand on the
+    monster with the lowest HP, and ends the turn once nothing can be played.
+
+    Cards are ranked by damage plus any status they apply, then by block.
+
+    Args:
+        encounter (Encounter): The encounter to choose a move in.
+
+    Returns:
+        Move: The (card_name, target_id) to play, or None to end the turn.
+    """
+    player = encounter.get_player()
+    energy = player.get_energy()
+    if energy <= 0:
+        return None
+
+    best = None
+    best_score = None
+    for card in player.get_hand():
+        if card.get_energy_cost() > energy:
+            continue
+        score = card_score(card)
+        if best_score is None or score > best_score:
+            best = card
+            best_score = score
+    if best is None:
+        return None
+
+    if not best.requires_target():
+        return best.get_name(), None
+    target = min(encounter.get_monsters(), key=lambda monster: monster.get_hp())
+    return best.get_name(), target.get_id()
+
+
+@lru_cache(maxsize=None)
+def load_game(game_file: str) -> Scenario:
+    """
+    Loads a game file once per process, through the compiled scenario cache,
+    so that repeated games on the same file, and the worker processes of a
+    batch, do not re-parse it.
+
+    Args:
+        game_file (str): The name of the game file to read.
+
+    Returns:
+        Scenario: The monsters in each encounter, in the format returned by
+        read_game_file.
+    """
+    return load_game_file(game_file)
+
+
+class Game:
+    """
+    A single game played headlessly: one player working through a sequence of
+    encounters, with every move chosen by a policy.
+    """
+
+    def __init__(
+        self,
+        player: Player,
+        encounters: Sequence[list[tuple[str, int]]],
+        policy: Policy = greedy_policy,
+        max_turns: int = MAX_TURNS,
+        pool: GamePool | None = None,
+    ) -> None:
+        """
+        Sets up a game that has not been played yet.
+
+        Args:
+            player (Player): The player taking part in the game.
+            encounters (Sequence[list[tuple[str, int]]]): The monsters in each
+            encounter, in the format returned by read_game_file.
+            policy (Policy): Chooses each move. Defaults to greedy_policy.
+            max_turns (int): The number of player turns after which the game
+            is abandoned and counted as a loss.
+            pool (GamePool | None): If given, the game's encounter is acquired
+            from this pool and released back to it when the game is over.
+
+        Returns:
+            None
+        """
+        self._player = player
+        self._encounters = encounters
+        self._policy = policy
+        self._max_turns = max_turns
+        self._pool = pool
+        # The number of encounters started so far, the current one included.
+        self._started = 0
+
+    def get_player(self) -> Player:
+        """
+        Returns the player in this game.
+
+        Returns:
+            Player: The player in this game.
+        """
+        return self._player
+
+    def finish_early(
+        self, encounter: Encounter, turns: int
+    ) -> EncounterFinish | None:
+        """
+        Called at the start of each player turn, before any card is played, to
+        finish the encounter without playing the rest of it. An override that
+        returns an EncounterFinish must leave the player as they would be at
+        the end of the encounter. Subclasses that do not return None must
+        not let the game run past max_turns. Never finishes early here.
+
+        Args:
+            encounter (Encounter): The encounter being played.
+            turns (int): The number of player turns started so far in the game,
+            this one included.
+
+        Returns:
+            EncounterFinish | None: The rest of the encounter, or None to play
+            it.
+        """
+        return None
+
+    def play(self) -> GameResult:
+        """
+        Plays the game to completion, mirroring the flow of main(): each
+        encounter is played until every monster is defeated, the player's
+        hand is discarded, and the next encounter begins. The game is lost as
+        soon as the player is defeated after an enemy turn.
+
+        A move that the encounter rejects ends the player's turn, so a policy
+        can never stall the game by repeating an invalid move.
+
+        One Encounter is used for the whole game and reset for each encounter
+        after the first.
+
+        Returns:
+            GameResult: The outcome of the game.
+        """
+        player = self._player
+        policy = self._policy
+        turns = 0
+        cards_played = 0
+        encounters_won = 0
+        encounter = None
+        won = True
+
+        for monsters in self._encounters:
+            self._started += 1
+            if encounter is not None:
+                encounter.reset(player, monsters)
+            elif self._pool is not None:
+                encounter = self._pool.acquire_encounter(player, monsters)
+            else:
+                encounter = Encounter(player, monsters)
+            turns += 1
+            finish = self.finish_early(encounter, turns)
+            while finish is None and encounter.is_active():
+                move = policy(encounter)
+                if move is not None and encounter.player_apply_card(*move):
+                    cards_played += 1
+                    continue
+
+                encounter.end_player_turn()
+                encounter.enemy_turn()
+                if player.is_defeated() or turns >= self._max_turns:
+                    won = False
+                    break
+                turns += 1
+                finish = self.finish_early(encounter, turns)
+            if finish is not None:
+                turns += finish.turns
+                cards_played += finish.cards_played
+                won = not finish.defeated
+            if not won:
+                break
+
+            player.end_turn()
+            encounters_won += 1
+
+        if self._pool is not None and encounter is not None:
+            self._pool.release_encounter(encounter)
+        return GameResult(won, turns, player.get_hp(), cards_played, encounters_won)
+
+
+def run_game(
+    player_type: str,
+    game_file: str,
+    policy: Policy = greedy_policy,
+    seed: int | None = None,
+    rng: GameRNG | None = None,
+    fast_draws: bool = False,
+    pool: GamePool | None = None,
+) -> GameResult:
+    """
+    Plays one complete game without any terminal I/O.
+
+    Args:
+        player_type (str): 'ironclad' or 'silent', as accepted by main().
+        game_file (str): The name of the game file describing the encounters.
+        policy (Policy): Chooses each move. Defaults to greedy_policy.
+        seed (int | None): If given, the game uses a new generator seeded with
+        this value, which reproduces main() when it is DEFAULT_SEED.
+        rng (GameRNG | None): The generator for the game, e.g. from
+        GameRNG.for_game. Takes precedence over seed. If neither is given, the
+        shared default_rng is used.
+        fast_draws (bool): Whether the player draws cards in O(1) per card.
+        Fast draws do not reproduce main() for a given seed.
+        pool (GamePool | None): If given, the player and encounter are
+        recycled through this pool rather than built for this game alone.
+
+    Returns:
+        GameResult: The outcome of the game.
+    """
+    if rng is None and seed is not None:
+        rng = GameRNG(seed)
+    if pool is None:
+        player = PLAYER_TYPES[player_type.lower()](rng, fast_draws=fast_draws)
+        return Game(player, load_game(game_file), policy).play()
+    player = pool.acquire_player(player_type, rng, fast_draws)
+    result = Game(player, load_game(game_file), policy, pool=pool).play()
+    pool.release_player(player)
+    return result
@@ -0,0 +1,1172 @@
+"""
+An expectimax solver that finds the best play in an encounter.
+
+The solver works on a compact model of an encounter: plain tuples holding the
+player's stats, the deck, hand and discard pile as per-card-type counts, and
+the stats of each remaining monster. The monsters are kept sorted, so that
+positions that only differ in the order of identical monsters are one
+position. Playing a card is a decision node. Ending the turn resolves the
+monsters' actions and then reaches a chance node over every hand draw_cards
+could deal, weighted by its probability. When solving from a game file's
+description of an encounter, each Louse's damage roll is a chance node as
+well.
+
+The value of a position is the player's expected HP at the end of the
+encounter, and a defeat is worth 0. Values are exact: every line is followed
+to the end of the encounter. Three things keep that affordable.
+
+- The search takes a whole turn at a time. The plays of a turn are enumerated
+  once for each (hand, stats, monsters), merging the orders of play that reach
+  the same position, with cards that only give block folded into the end of
+  the turn. Of the positions an enemy turn can then leave that only differ in
+  the player's HP, only the one with the most HP is searched.
+- Each chance node is searched against a threshold below which its exact
+  value does not matter, as in alpha-beta search, and the value it returns is
+  an upper bound if it is below the threshold. Every search starts with a
+  narrow threshold just below the player's HP, and widens it only as far as
+  needed (see ASPIRATION_MARGINS). Lines are cut as soon as an upper bound
+  rules them out: the player's HP, the least HP a hand can lose, and the value
+  of a relaxed encounter in which the player picks every hand from all of
+  their cards, against all the monsters or any one of them.
+- Exact values and bounds are cached in a bounded transposition table keyed
+  on the canonical position alone, so every search reuses them.
+
+A turn can leave the encounter where it was, with only block and statuses
+changed: ending it without attacking a Louse-free Jaw Worm, say. The chance
+nodes a turn can return to that way form a plateau, solved together by value
+iteration, with the value of each of their hands' other turns bounded or
+searched only where it can change the result. An encounter whose lines never
+end is worth 0, as is one the player can only stall forever; the model has no
+turn limit.
+"""
+
+import argparse
+import math
+import time
+from functools import lru_cache
+from itertools import product
+from math import comb
+from typing import NamedTuple
+
+from sts import MONSTER_TYPES, Cultist, Encounter, Player
+from sts_damage import scale_damage
+from sts_simulate import PLAYER_TYPES, load_game
+from sts_support import GameRNG
+
+LOUSE, CULTIST, JAW_WORM = 0, 1, 2
+# The kind of each type of monster the solver has a model of, by its name in
+# MONSTER_TYPES.
+KIND_NAMES = {"Louse": LOUSE, "Cultist": CULTIST, "JawWorm": JAW_WORM}
+LOUSE_ROLLS = (5, 6, 7)
+
+HAND_SIZE = 5
+DEFAULT_MAX_NODES = 2_000_000
+DEFAULT_TABLE_SIZE = 1_000_000
+# How far below the best value still possible each search sets its threshold
+# in turn, until a search returns an exact value.
+ASPIRATION_MARGINS = (0.5, 2.0, 8.0, 32.0, math.inf)
+# Value iteration over a plateau stops once no value moves by more than this.
+CONVERGENCE = 1e-12
+# Values closer than this are treated as equal, which covers the error left
+# when value iteration stops.
+TOLERANCE = 1e-7
+
+# Indices into the player tuple: (hp, block, strength, weak, vulnerable, energy)
+# and into each monster tuple:
+# (kind, hp, max_hp, block, strength, weak, vulnerable, extra), where extra is
+# a Louse's damage amount or a Cultist's number of actions so far.
+HP, BLOCK, STRENGTH, WEAK, VULNERABLE, ENERGY = range(6)
+KIND, M_HP, M_MAX_HP, M_BLOCK, M_STRENGTH, M_WEAK, M_VULNERABLE, M_EXTRA = range(8)
+
+
+class CardModel(NamedTuple):
+    """
+    The effects of one type of card, as used by the solver.
+    """
+
+    name: str
+    cost: int
+    damage: int
+    block: int
+    strength: int
+    weak: int
+    vulnerable: int
+    target: bool
+
+
+class SolverStats(NamedTuple):
+    """
+    Counters describing the work done by a search.
+
+    Attributes:
+    - nodes (int): Chance nodes expanded and positions reached while
+                   enumerating turns.
+    - lookups (int): Transposition table lookups.
+    - hits (int): Lookups that found a value good enough to use.
+    - elapsed (float): Seconds spent searching.
+    - table_entries (int): Positions held in the table after the search.
+    - exact (bool): Whether every value of the last search is exact. It is
+                    not if the search ran out of nodes, in which case the
+                    values are upper bounds.
+    """
+
+    nodes: int
+    lookups: int
+    hits: int
+    elapsed: float
+    table_entries: int
+    exact: bool
+
+    def nodes_per_second(self) -> float:
+        """
+        Returns the number of nodes expanded per second.
+
+        Returns:
+            float: Nodes per second, or 0.0 if no time was measured.
+        """
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+    def hit_rate(self) -> float:
+        """
+        Returns the fraction of table lookups that were hits.
+
+        Returns:
+            float: The hit rate, or 0.0 if there were no lookups.
+        """
+        return self.hits / self.lookups if self.lookups else 0.0
+
+
+class Solution(NamedTuple):
+    """
+    The result of solving a position.
+
+    Attributes:
+    - move: The best move, as (card_name, target_id), or None to end the turn.
+    - value (float): The expected HP at the end of the encounter with best play.
+    - move_values (dict): The value of every legal move, keyed like move.
+    - stats (SolverStats): The work done to find it.
+    """
+
+    move: tuple[str, int | None] | None
+    value: float
+    move_values: dict
+    stats: SolverStats
+
+
+def reduce_hp(hp: int, block: int, amount: int) -> tuple[int, int]:
+    """
+    Returns the (hp, block) left after taking amount damage, as in
+    Entity.reduce_hp.
+    """
+    if block >= amount:
+        return hp, block - amount
+    return max(hp - (amount - block), 0), 0
+
+
+def monster_kind(name: str) -> int:
+    """
+    Returns the solver's kind for a type of monster.
+
+    Args:
+        name (str): The name of the type, as in MONSTER_TYPES.
+
+    Returns:
+        int: The kind, see KIND_NAMES.
+
+    Raises:
+        ValueError: If the solver has no model of the type.
+    """
+    kind = KIND_NAMES.get(name)
+    if kind is None:
+        raise ValueError(f"the solver has no model of the monster {name!r}")
+    return kind
+
+
+@lru_cache(maxsize=None)
+def draw_outcomes(deck: tuple[int, ...], amount: int) -> tuple:
+    """
+    Returns every hand of amount cards that can be drawn from deck, with its
+    probability, for a uniform draw without replacement as in select_cards.
+
+    Args:
+        deck (tuple[int, ...]): The number of cards of each type in the deck.
+        amount (int): The number of cards to draw.
+
+    Returns:
+        tuple: Pairs of (counts drawn of each type, probability).
+    """
+    total = comb(sum(deck), amount)
+    outcomes = []
+    for drawn in product(*(range(count + 1) for count in deck)):
+        if sum(drawn) == amount:
+            ways = 1
+            for count, taken in zip(deck, drawn):
+                ways *= comb(count, taken)
+            outcomes.append((drawn, ways / total))
+    return tuple(outcomes)
+
+
+def add_counts(left: tuple, right: tuple) -> tuple:
+    """Returns the element-wise sum of two count tuples."""
+    return tuple(a + b for a, b in zip(left, right))
+
+
+def sub_counts(left: tuple, right: tuple) -> tuple:
+    """Returns the element-wise difference of two count tuples."""
+    return tuple(a - b for a, b in zip(left, right))
+
+
+def _progress(player: tuple, monsters: tuple) -> tuple:
+    """
+    Returns what a turn must change for the encounter to have moved on: the
+    player's HP and strength and the monsters' stats other than their
+    statuses. None of these ever goes back, so positions with different
+    progress cannot be reached from each other both ways.
+    """
+    return (player[HP], player[STRENGTH]) + tuple(
+        (m[KIND], m[M_HP], m[M_MAX_HP], m[M_BLOCK], m[M_STRENGTH], m[M_EXTRA])
+        for m in monsters
+    )
+
+
+class _OutOfNodes(Exception):
+    """Raised when a search expands more than its node budget."""
+
+
+class Solver:
+    """
+    Exact expectimax search over encounter states with a bounded
+    transposition table. A Solver can be reused for many positions of the
+    same player; its table is kept between searches.
+    """
+
+    def __init__(
+        self,
+        cards: list[CardModel],
+        max_nodes: int = DEFAULT_MAX_NODES,
+        table_size: int = DEFAULT_TABLE_SIZE,
+    ) -> None:
+        """
+        Creates a solver.
+
+        Args:
+            cards (list[CardModel]): The card types the player can hold, in the
+            order used for pile counts (see card_models).
+            max_nodes (int): The most nodes one call to solve or
+            solve_encounter_start may expand.
+            table_size (int): The most positions to keep in the table, and in
+            each of the caches of turns and bounds; the oldest entries are
+            evicted first.
+
+        Returns:
+            None
+        """
+        self._cards = tuple(cards)
+        self._index = {card.name: index for index, card in enumerate(cards)}
+        self._empty = (0,) * len(cards)
+        # The cards that only give block. Unless the player has strength to
+        # deal by aiming them at a monster, they are folded into the end of
+        # the turn rather than searched.
+        self._block_only = tuple(
+            card.block > 0
+            and not card.target
+            and card.damage == card.strength == card.weak == card.vulnerable == 0
+            for card in cards
+        )
+        self._max_nodes = max_nodes
+        self._table_size = table_size
+        # Chance node -> (value, exact); inexact values are upper bounds.
+        self._table = {}
+        # (player stats but HP, hand, monsters) -> the turns they allow.
+        self._turns = {}
+        # (deck, discard) -> the hands a draw can deal.
+        self._deals = {}
+        # (hand, energy) -> the most block its block-only cards give.
+        self._blocks = {}
+        # (player, monsters) -> [lower, upper] bounds on the relaxed value.
+        self._bounds = {}
+        # Every hand of the cards the bounds are for, see _hold.
+        self._held = None
+        self._held_hands = ()
+        # The chance nodes being searched, and the plateaus being solved.
+        self._active = set()
+        self._nodes = 0
+        self._lookups = 0
+        self._hits = 0
+        self._elapsed = 0.0
+        # The node count at which the current search gives up, if any.
+        self._node_limit = None
+        # Whether a value computed since this was last cleared was cut short.
+        self._estimated = False
+        self._exact = False
+
+    def get_stats(self) -> SolverStats:
+        """
+        Returns the counters accumulated over every search so far.
+
+        Returns:
+            SolverStats: The accumulated counters.
+        """
+        return SolverStats(
+            self._nodes,
+            self._lookups,
+            self._hits,
+            self._elapsed,
+            len(self._table),
+            self._exact,
+        )
+
+    def encode(self, encounter: Encounter) -> tuple:
+        """
+        Returns the solver's model of an encounter on the player's turn, with
+        the monsters in the encounter's order.
+
+        Args:
+            encounter (Encounter): The encounter to encode.
+
+        Returns:
+            tuple: The state (player, hand, deck, discard, monsters).
+
+        Raises:
+            ValueError: If the solver has no model of one of the monsters.
+        """
+        player = encounter.get_player()
+        return (
+            (
+                player.get_hp(),
+                player.get_block(),
+                player.get_strength(),
+                player.get_weak(),
+                player.get_vulnerable(),
+                player.get_energy(),
+            ),
+            self._count(player.get_hand()),
+            self._count(player.get_deck()),
+            self._count(player.get_discarded()),
+            tuple(_encode_monster(monster) for monster in encounter.get_monsters()),
+        )
+
+    def solve(self, encounter: Encounter) -> Solution:
+        """
+        Finds the best move in an encounter on the player's turn, and its
+        exact value.
+
+        Args:
+            encounter (Encounter): The encounter to solve. It is not modified.
+
+        Returns:
+            Solution: The best move, its value and the value of every move;
+            the value of a move worse than the best is only an upper bound on
+            it.
+
+        Raises:
+            ValueError: If the solver has no model of one of the monsters.
+        """
+        start = time.perf_counter()
+        nodes, lookups, hits = self._nodes, self._lookups, self._hits
+        state = self.encode(encounter)
+        ids = [monster.get_id() for monster in encounter.get_monsters()]
+        self._hold(add_counts(add_counts(state[1], state[2]), state[3]))
+
+        move_values = {}
+        self._exact = True
+        self._node_limit = self._nodes + self._max_nodes
+        try:
+            # The value of the whole turn comes first, so that each move only
+            # has to be searched far enough to tell whether it reaches it.
+            value = self._position_value(state, -math.inf)
+            floor = value - TOLERANCE
+            for (card, target), child in self._moves(state):
+                name = self._cards[card].name
+                move = (name, None if target is None else ids[target])
+                move_values[move] = min(self._position_value(child, floor), value)
+            # Ending the turn comes last, so that it loses ties with playing on.
+            move_values[None] = min(self._end_turn_value(state, floor), value)
+        finally:
+            self._node_limit = None
+        move = max(move_values, key=move_values.get)
+
+        self._elapsed += time.perf_counter() - start
+        stats = SolverStats(
+            self._nodes - nodes,
+            self._lookups - lookups,
+            self._hits - hits,
+            time.perf_counter() - start,
+            len(self._table),
+            self._exact,
+        )
+        return Solution(move, move_values[move], move_values, stats)
+
+    def solve_encounter_start(self, player: Player, monsters: list[tuple[str, int]]) -> float:
+        """
+        Returns the expected value of an encounter before it starts, given the
+        player between encounters (with an empty hand) and the monsters as
+        read from a game file. The Louse damage rolls and the first hand are
+        chance nodes. get_stats reports whether the value is exact.
+
+        Args:
+            player (Player): The player about to enter the encounter.
+            monsters (list[tuple[str, int]]): The monsters in the encounter.
+            Names that are not in MONSTER_TYPES are skipped, as by Encounter.
+
+        Returns:
+            float: The expected HP at the end of the encounter with best play.
+
+        Raises:
+            ValueError: If the solver has no model of one of the monsters.
+        """
+        start = time.perf_counter()
+        monsters = [
+            (monster_kind(name), max_hp)
+            for name, max_hp in monsters
+            if name in MONSTER_TYPES
+        ]
+        lice = sum(1 for kind, _ in monsters if kind == LOUSE)
+        deck = add_counts(self._count(player.get_deck()), self._count(player.get_discarded()))
+        self._hold(deck)
+        stats = (
+            player.get_hp(),
+            0,
+            player.get_strength(),
+            max(player.get_weak() - 1, 0),
+            max(player.get_vulnerable() - 1, 0),
+            3,
+        )
+        states = []
+        for rolls in product(LOUSE_ROLLS, repeat=lice):
+            rolls = iter(rolls)
+            encoded = tuple(
+                sorted(
+                    (kind, hp, hp, 0, 0, 0, 0, next(rolls) if kind == LOUSE else 0)
+                    for kind, hp in monsters
+                )
+            )
+            states.append((stats, deck, self._empty, encoded))
+
+        self._exact = True
+        self._node_limit = self._nodes + self._max_nodes
+        try:
+            values = [
+                self._search(
+                    lambda alpha, state=state: self._draw_value(state, alpha), stats[HP]
+                )
+                for state in states
+            ]
+        finally:
+            self._node_limit = None
+        self._elapsed += time.perf_counter() - start
+        return sum(values) / len(values)
+
+    def _count(self, cards: list) -> tuple[int, ...]:
+        """Returns the number of cards of each modelled type among cards."""
+        counts = [0] * len(self._cards)
+        for card in cards:
+            counts[self._index[card.get_name()]] += 1
+        return tuple(counts)
+
+    def _moves(self, state: tuple):
+        """
+        Yields ((card index, target index or None), resulting state) for every
+        card play that Encounter.player_apply_card would accept.
+        """
+        player, hand, deck, discard, monsters = state
+        energy = player[ENERGY]
+        if energy <= 0:
+            return
+        for index, card in enumerate(self._cards):
+            if hand[index] == 0 or card.cost > energy:
+                continue
+            # A card without a target can still be aimed at a monster, which
+            # deals the player's strength as damage.
+            if not card.target:
+                yield (index, None), self.play(state, index, None)
+                if player[STRENGTH] + card.strength + card.damage <= 0:
+                    continue
+            for target in range(len(monsters)):
+                yield (index, target), self.play(state, index, target)
+
+    def play(self, state: tuple, index: int, target: int | None) -> tuple:
+        """Returns the state after playing card index on target."""
+        player, hand, deck, discard, monsters = state
+        card = self._cards[index]
+        hp, block, strength, weak, vulnerable, energy = player
+        strength += card.strength
+        player = (hp, block + card.block, strength, weak, vulnerable, energy - card.cost)
+        hand = hand[:index] + (hand[index] - 1,) + hand[index + 1 :]
+        discard = discard[:index] + (discard[index] + 1,) + discard[index + 1 :]
+
+        if target is not None:
+            monster = list(monsters[target])
+            monster[M_VULNERABLE] += card.vulnerable
+            monster[M_WEAK] += card.weak
+            damage = scale_damage(
+                card.damage + strength, monster[M_VULNERABLE] > 0, weak > 0
+            )
+            monster[M_HP], monster[M_BLOCK] = reduce_hp(
+                monster[M_HP], monster[M_BLOCK], damage
+            )
+            if monster[M_HP] == 0:
+                monsters = monsters[:target] + monsters[target + 1 :]
+            else:
+                monsters = monsters[:target] + (tuple(monster),) + monsters[target + 1 :]
+        return player, hand, deck, discard, monsters
+
+    def _search(self, evaluate, hp: int, floor: float = -math.inf) -> float:
+        """
+        Returns the exact value of a node, calling evaluate(threshold) with the
+        thresholds of ASPIRATION_MARGINS below the best value still possible,
+        starting from hp, until it returns (value, True). Thresholds stop at
+        floor, and if the node is worth no more than floor, returns an upper
+        bound on its value no greater than floor. If the search runs out of
+        nodes, returns the best upper bound found and clears the exactness
+        reported by get_stats.
+        """
+        bound = float(hp)
+        self._estimated = False
+        try:
+            for margin in ASPIRATION_MARGINS:
+                value, exact = evaluate(max(bound - margin, floor))
+                if exact:
+                    if self._estimated:
+                        self._exact = False
+                    return value
+                bound = min(bound, value)
+                if bound <= floor + TOLERANCE:
+                    return min(bound, floor)
+        except _OutOfNodes:
+            pass
+        self._exact = False
+        return bound
+
+    def _position_value(self, state: tuple, floor: float) -> float:
+        """Returns _search for a position on the player's turn."""
+        player, hand, deck, discard, monsters = state
+        if not monsters:
+            return float(player[HP])
+        monsters = tuple(sorted(monsters))
+        return self._search(
+            lambda alpha: self._turn_value(
+                player, hand, deck, discard, monsters, alpha, passes=True
+            )[:2],
+            player[HP],
+            floor,
+        )
+
+    def _end_turn_value(self, state: tuple, floor: float) -> float:
+        """Returns _search for ending the turn in a position."""
+        player, hand, deck, discard, monsters = resolve_enemy_turn(state)
+        if player[HP] == 0:
+            return 0.0
+        node = (player, deck, discard, tuple(sorted(monsters)))
+        return self._search(
+            lambda alpha: self._draw_value(node, alpha), player[HP], floor
+        )
+
+    def _hold(self, cards: tuple[int, ...]) -> None:
+        """
+        Sets the cards the player holds in all, for the relaxed bounds, which
+        are forgotten if they change.
+        """
+        if cards != self._held:
+            self._held = cards
+            self._held_hands = tuple(
+                hand for hand, _ in draw_outcomes(cards, min(HAND_SIZE, sum(cards)))
+            )
+            self._bounds.clear()
+
+    def _remember(self, cache: dict, key, value) -> None:
+        """Stores a cache entry, evicting the oldest one if the cache is full."""
+        if key not in cache and len(cache) >= self._table_size:
+            del cache[next(iter(cache))]
+        cache[key] = value
+
+    def _most_block(self, hand: tuple[int, ...], energy: int) -> int:
+        """Returns the most block the block-only cards of hand give for energy."""
+        key = (hand, energy)
+        block = self._blocks.get(key)
+        if block is None:
+            # (cost, block) of each block-only card in hand.
+            cards = [
+                (card.cost, card.block)
+                for index, card in enumerate(self._cards)
+                if self._block_only[index]
+                for _ in range(hand[index])
+            ]
+            best = [0] * (energy + 1)
+            for cost, gain in cards:
+                for spent in range(energy, cost - 1, -1):
+                    best[spent] = max(best[spent], best[spent - cost] + gain)
+            block = best[energy]
+            self._blocks[key] = block
+        return block
+
+    def _outcomes(self, player: tuple, hand: tuple, monsters: tuple) -> tuple:
+        """
+        Enumerates the turns a player can play from a position, whatever their
+        HP. Returns (won, moved, passed): whether some turn defeats every
+        monster; the positions after the enemy turn that make progress (see
+        _progress), as (HP lost, player stats but HP, monsters), least HP lost
+        first; and those that do not, as (player stats but HP, monsters).
+        Positions that only differ in HP lost keep the least.
+        """
+        key = (player[1:], hand, monsters)
+        result = self._turns.get(key)
+        if result is not None:
+            return result
+        # The HP plays no part in a turn, so the turn is played from a fixed
+        # amount that no enemy turn can take.
+        full = 1 << 30
+        start = ((full,) + player[1:], hand, self._empty, self._empty, monsters)
+        seen = {start}
+        stack = [start]
+        # (strength, weak, vulnerable, monsters) at the end of a turn -> the
+        # most block the player can end it with.
+        ends = {}
+        won = False
+        while stack:
+            state = stack.pop()
+            self._nodes += 1
+            if not state[4]:
+                won = True
+                break
+            stats = state[0]
+            block = stats[BLOCK] + self._most_block(state[1], stats[ENERGY])
+            end = (stats[STRENGTH], stats[WEAK], stats[VULNERABLE], state[4])
+            if ends.get(end, -1) < block:
+                ends[end] = block
+            for (index, _), child in self._moves(state):
+                if self._block_only[index] and stats[STRENGTH] <= 0:
+                    continue
+                child = child[:4] + (tuple(sorted(child[4])),)
+                if child not in seen:
+                    seen.add(child)
+                    stack.append(child)
+        if won:
+            result = (True, (), ())
+        else:
+            progress = _progress(start[0], monsters)
+            losses = {}
+            passed = set()
+            for (strength, weak, vulnerable, left), block in ends.items():
+                stats = (full, block, strength, weak, vulnerable, 0)
+                state = (stats, self._empty, self._empty, self._empty, left)
+                stats, _, _, _, acted = resolve_enemy_turn(state)
+                acted = tuple(sorted(acted))
+                if _progress(stats, acted) == progress:
+                    passed.add((stats[1:], acted))
+                    continue
+                after = (stats[1:], acted)
+                loss = full - stats[HP]
+                if losses.get(after, loss + 1) > loss:
+                    losses[after] = loss
+            # The least HP lost first, then the most strength gained and the
+            # least monster HP left, which tend to be the best turns.
+            moved = sorted(
+                ((loss, stats, left) for (stats, left), loss in losses.items()),
+                key=lambda turn: (
+                    turn[0],
+                    -turn[1][STRENGTH - 1],
+                    sum(monster[M_HP] for monster in turn[2]),
+                ),
+            )
+            result = (False, tuple(moved), tuple(passed))
+        self._remember(self._turns, key, result)
+        return result
+
+    def _turn_value(
+        self,
+        player: tuple,
+        hand: tuple,
+        deck: tuple,
+        discard: tuple,
+        monsters: tuple,
+        alpha: float,
+        passes: bool = False,
+    ) -> tuple:
+        """
+        Returns (value, exact, passed) for the rest of a turn: the value of the
+        best turn that makes progress, or also of those that do not if passes
+        is set, and the chance nodes the turns that do not make progress lead
+        to. An inexact value is an upper bound no greater than alpha (give or
+        take TOLERANCE). The value is None if no turn makes progress and
+        passes is not set.
+        """
+        won, moved, passed = self._outcomes(player, hand, monsters)
+        if won:
+            return float(player[HP]), True, ()
+        discard = add_counts(discard, hand)
+        hp = player[HP]
+        passed = tuple(((hp,) + stats, deck, discard, left) for stats, left in passed)
+        turns = [(0, node[0][1:], node[3]) for node in passed] if passes else []
+        turns.extend(moved)
+        best = None
+        bound = None
+        for loss, stats, left in turns:
+            after = max(hp - loss, 0)
+            if best is not None and after <= best:
+                break
+            if after == 0:
+                value, exact = 0.0, True
+            else:
+                floor = alpha if best is None or best < alpha else best
+                if after <= floor:
+                    bound = after if bound is None or bound < after else bound
+                    break
+                stats = (after,) + stats
+                if not self._exceeds(stats, left, floor):
+                    bound = floor if bound is None or bound < floor else bound
+                    continue
+                value, exact = self._draw_value((stats, deck, discard, left), floor)
+                # An upper bound within TOLERANCE of floor counts as at most
+                # floor.
+                value = value if exact else min(value, floor)
+            if exact:
+                if best is None or value > best:
+                    best = value
+            elif bound is None or value > bound:
+                bound = value
+        if bound is None or (best is not None and best >= bound):
+            return best, True, passed
+        return (bound if best is None or bound > best else best), False, passed
+
+    def _deal(self, deck: tuple, discard: tuple) -> tuple:
+        """
+        Returns the hands draw_cards could deal from the piles, as (hand, deck,
+        discard, probability), most likely first.
+        """
+        key = (deck, discard)
+        hands = self._deals.get(key)
+        if hands is None:
+            hand = self._empty
+            if sum(deck) < HAND_SIZE:
+                hand, deck, discard = deck, discard, hand
+            hands = sorted(
+                (
+                    (add_counts(hand, drawn), sub_counts(deck, drawn), discard, chance)
+                    for drawn, chance in draw_outcomes(deck, HAND_SIZE - sum(hand))
+                ),
+                key=lambda dealt: -dealt[3],
+            )
+            hands = tuple(hands)
+            self._remember(self._deals, key, hands)
+        return hands
+
+    def _draw_value(self, node: tuple, alpha: float) -> tuple[float, bool]:
+        """
+        Returns (value, exact) for a chance node (player, deck, discard,
+        monsters) at the start of a turn, before the draw. An inexact value is
+        an upper bound no greater than alpha (give or take TOLERANCE).
+        """
+        self._lookups += 1
+        entry = self._table.get(node)
+        if entry is not None and (entry[1] or entry[0] <= alpha + TOLERANCE):
+            self._hits += 1
+            return entry
+        if node in self._active:
+            # Only possible if some card can undo progress; the line is
+            # scored as a defeat.
+            self._estimated = True
+            return 0.0, True
+        self._nodes += 1
+        if self._node_limit is not None and self._nodes > self._node_limit:
+            raise _OutOfNodes()
+        player, deck, discard, monsters = node
+        hands = self._deal(deck, discard)
+        self._active.add(node)
+        try:
+            if any(self._outcomes(player, dealt[0], monsters)[2] for dealt in hands):
+                return self._solve_plateau(node, alpha)
+            return self._expect(node, hands, alpha)
+        finally:
+            self._active.discard(node)
+
+    def _expect(self, node: tuple, hands: tuple, alpha: float) -> tuple[float, bool]:
+        """
+        Returns _draw_value for a chance node none of whose hands can pass
+        without progress. Each hand is searched against the threshold below
+        which it would take the node's value below alpha even if the hands
+        after it were worth their upper bounds.
+        """
+        player, deck, discard, monsters = node
+        highs = []
+        for hand, _, _, _ in hands:
+            won, moved, _ = self._outcomes(player, hand, monsters)
+            if won:
+                highs.append(float(player[HP]))
+            else:
+                highs.append(float(max(player[HP] - moved[0][0], 0)) if moved else 0.0)
+        rest = sum(dealt[3] * high for dealt, high in zip(hands, highs))
+        if rest <= alpha:
+            self._remember(self._table, node, (rest, False))
+            return rest, False
+        done = 0.0
+        for (hand, deck, discard, chance), high in zip(hands, highs):
+            rest -= chance * high
+            value, exact, _ = self._turn_value(
+                player, hand, deck, discard, monsters, (alpha - done - rest) / chance
+            )
+            done += chance * value
+            if not exact:
+                bound = done + rest
+                self._remember(self._table, node, (bound, False))
+                return bound, False
+        self._remember(self._table, node, (done, True))
+        return done, True
+
+    def _solve_plateau(self, node: tuple, alpha: float) -> tuple[float, bool]:
+        """
+        Returns _draw_value for a chance node on a plateau: the chance nodes a
+        turn can return to without progress. Each hand of each of them can
+        pass to the others, or take its best turn that makes progress, whose
+        value starts out bounded by the least HP it loses. The plateau is
+        solved by value iteration with the lower and with the upper bounds of
+        those values, refining the ones the upper bounds stop at, until every
+        chance node's value is either exact or at most alpha.
+        """
+        plateau = [node]
+        index = {node: 0}
+        # For each chance node, a row of [chance, lower, upper, the plateau
+        # nodes passing leads to, chance node index, hand index] per hand.
+        rows = []
+        position = 0
+        while position < len(plateau):
+            player, deck, discard, monsters = plateau[position]
+            if position:
+                self._nodes += 1
+            row = []
+            hands = self._deal(deck, discard)
+            for number, (hand, deck, discard, chance) in enumerate(hands):
+                won, moved, passed = self._outcomes(player, hand, monsters)
+                discarded = add_counts(discard, hand)
+                successors = []
+                for stats, left in passed:
+                    other = ((player[HP],) + stats, deck, discarded, left)
+                    successor = index.get(other)
+                    if successor is None:
+                        successor = index[other] = len(plateau)
+                        plateau.append(other)
+                        self._active.add(other)
+                    successors.append(successor)
+                if won:
+                    lower = upper = float(player[HP])
+                elif moved:
+                    lower, upper = 0.0, float(max(player[HP] - moved[0][0], 0))
+                else:
+                    lower = upper = 0.0
+                row.append([chance, lower, upper, successors, position, number])
+            rows.append(row)
+            position += 1
+        try:
+            # First settle the turns that keep all of the HP they could.
+            for row in rows:
+                for entry in row:
+                    if entry[1] < entry[2]:
+                        threshold = max(alpha, entry[2] - 10 * TOLERANCE)
+                        self._refine(plateau, entry, threshold)
+            while True:
+                lower = self._iterate(rows, 1)
+                # Value iteration approaches the values from below, so the
+                # upper values are padded to stay upper bounds.
+                upper = [value + TOLERANCE / 100 for value in self._iterate(rows, 2)]
+                undecided = [
+                    k
+                    for k in range(len(rows))
+                    if upper[k] > alpha + TOLERANCE and lower[k] < upper[k] - TOLERANCE
+                ]
+                if not undecided:
+                    break
+                slack = min(upper[k] for k in undecided) - alpha
+                refined = False
+                for reach, entry in self._stops(rows, upper, undecided):
+                    stay = max((lower[k] for k in entry[3]), default=0.0)
+                    high = entry[2]
+                    if entry[1] >= high or stay >= high - TOLERANCE:
+                        continue
+                    threshold = max(stay, high - slack / reach)
+                    value = self._refine(plateau, entry, threshold)
+                    refined = True
+                    slack -= reach * (high - value)
+                    if slack <= 0:
+                        break
+                if not refined:
+                    for row in rows:
+                        for entry in row:
+                            stay = max((lower[k] for k in entry[3]), default=0.0)
+                            if entry[1] < entry[2] and entry[2] > stay + TOLERANCE:
+                                self._refine(plateau, entry, stay)
+                                refined = True
+                if not refined:
+                    break
+            for other, low, high in zip(plateau, lower, upper):
+                if low >= high - TOLERANCE:
+                    self._remember(self._table, other, (low, True))
+                else:
+                    entry = self._table.get(other)
+                    if entry is None or not entry[1]:
+                        self._remember(self._table, other, (high, False))
+            if lower[0] >= upper[0] - TOLERANCE:
+                return lower[0], True
+            return upper[0], False
+        finally:
+            for other in plateau[1:]:
+                self._active.discard(other)
+
+    def _refine(self, plateau: list, entry: list, alpha: float) -> float:
+        """
+        Searches the turns that make progress from a hand of a plateau against
+        the threshold alpha, updating its bounds. Returns its upper bound.
+        """
+        player, deck, discard, monsters = plateau[entry[4]]
+        hand, deck, discard, _ = self._deal(deck, discard)[entry[5]]
+        value, exact, _ = self._turn_value(player, hand, deck, discard, monsters, alpha)
+        if value is None:
+            value = 0.0
+        if exact:
+            entry[1] = entry[2] = value
+        else:
+            value = entry[2] = min(value, alpha, entry[2])
+        return value
+
+    def _stops(self, rows: list, values: list, start: list) -> list:
+        """
+        Returns (probability, hand entry) for the hands of a plateau at which
+        the policy of passing wherever values says it is at least as good
+        stops, starting from each chance node of start with equal probability,
+        most likely first.
+        """
+        moves = []
+        for row in rows:
+            step = []
+            for entry in row:
+                successor = max(entry[3], key=values.__getitem__, default=None)
+                if successor is not None and entry[2] >= values[successor]:
+                    successor = None
+                step.append((entry[0], successor, entry))
+            moves.append(step)
+        mass = {k: 1.0 / len(start) for k in start}
+        reach = {}
+        # Enough rounds for the mass that keeps passing to fall below any
+        # threshold that would matter.
+        for _ in range(100):
+            flow = {}
+            for k, share in mass.items():
+                for chance, successor, entry in moves[k]:
+                    if successor is None:
+                        reached = reach.get(id(entry), (0.0, entry))[0]
+                        reach[id(entry)] = (reached + share * chance, entry)
+                    else:
+                        flow[successor] = flow.get(successor, 0.0) + share * chance
+            mass = flow
+            if sum(mass.values()) < 1e-6:
+                break
+        return sorted(reach.values(), key=lambda reached: -reached[0])
+
+    def _iterate(self, rows: list, which: int) -> list:
+        """
+        Returns the values of the chance nodes of a plateau by value
+        iteration, with the lower (which = 1) or upper (which = 2) bounds of
+        the values of their hands' turns that make progress. Passing forever
+        is worth 0.
+        """
+        values = [0.0] * len(rows)
+        while True:
+            change = 0.0
+            for k, row in enumerate(rows):
+                total = 0.0
+                for entry in row:
+                    value = entry[which]
+                    for successor in entry[3]:
+                        if values[successor] > value:
+                            value = values[successor]
+                    total += entry[0] * value
+                if total - values[k] > change:
+                    change = total - values[k]
+                values[k] = total
+            if change <= CONVERGENCE:
+                return values
+
+    def _exceeds(self, player: tuple, monsters: tuple, threshold: float) -> bool:
+        """
+        Returns whether the relaxed value of a chance node exceeds threshold:
+        its value if the player could pick each hand from all the cards they
+        hold. It is no less than the node's value, and no more than the
+        relaxed value with any one of the monsters.
+        """
+        if threshold < 0:
+            return True
+        key = (player, monsters)
+        bound = self._bounds.get(key)
+        if bound is None:
+            bound = [-math.inf, float(player[HP])]
+            self._remember(self._bounds, key, bound)
+        if bound[0] >= threshold:
+            return True
+        if bound[1] <= threshold:
+            return False
+        if len(monsters) > 1:
+            for monster in monsters:
+                if not self._exceeds(player, (monster,), threshold):
+                    bound[1] = threshold
+                    return False
+        # The chance nodes reached by passing, whose relaxed values are all
+        # at most threshold if no turn from them exceeds it.
+        reached = {key}
+        stack = [key]
+        while stack:
+            stats, left = stack.pop()
+            for hand in self._held_hands:
+                won, moved, passed = self._outcomes(stats, hand, left)
+                if won:
+                    bound[0] = threshold
+                    return True
+                for loss, after, remaining in moved:
+                    if loss >= stats[HP] or stats[HP] - loss <= threshold:
+                        break
+                    if self._exceeds((stats[HP] - loss,) + after, remaining, threshold):
+                        bound[0] = threshold
+                        return True
+                for after, remaining in passed:
+                    other = ((stats[HP],) + after, remaining)
+                    if other not in reached:
+                        reached.add(other)
+                        stack.append(other)
+        for other in reached:
+            other_bound = self._bounds.get(other)
+            if other_bound is None:
+                self._remember(self._bounds, other, [-math.inf, threshold])
+            elif other_bound[1] > threshold:
+                other_bound[1] = threshold
+        return False
+
+
+def _encode_monster(monster) -> tuple:
+    """Returns the solver's model of a monster."""
+    kind = monster_kind(type(monster).__name__)
+    extra = 0
+    if kind == LOUSE:
+        extra = monster.get_damage_amount()
+    elif kind == CULTIST:
+        extra = monster.get_num_calls()
+    return (
+        kind,
+        monster.get_hp(),
+        monster.get_max_hp(),
+        monster.get_block(),
+        monster.get_strength(),
+        monster.get_weak(),
+        monster.get_vulnerable(),
+        extra,
+    )
+
+
+def resolve_enemy_turn(state: tuple) -> tuple:
+    """
+    Applies Encounter.end_player_turn, enemy_turn and the status part of the
+    player's new turn (everything but the draw) to a state, returning the new
+    state with the hand moved to the discard pile.
+    """
+    player, hand, deck, discard, monsters = state
+    hp, block, strength, weak, vulnerable, _ = player
+    acted = []
+    for monster in monsters:
+        kind, m_hp, max_hp, m_block, m_strength, m_weak, m_vulnerable, extra = monster
+        # The monster's new turn, from end_player_turn.
+        m_block = 0
+        m_weak = max(m_weak - 1, 0)
+        m_vulnerable = max(m_vulnerable - 1, 0)
+        if kind == LOUSE:
+            damage = extra
+        elif kind == CULTIST:
+            action = Cultist.scheduled_action(extra)
+            damage = action.damage
+            weak += action.weak
+            extra += 1
+        else:
+            taken = max_hp - m_hp
+            m_block = (taken + 1) // 2
+            damage = taken // 2
+        damage = scale_damage(m_strength + damage, vulnerable > 0, m_weak > 0)
+        hp, block = reduce_hp(hp, block, damage)
+        acted.append(
+            (kind, m_hp, max_hp, m_block, m_strength, m_weak, m_vulnerable, extra)
+        )
+    player = (hp, 0, strength, max(weak - 1, 0), max(vulnerable - 1, 0), 3)
+    return player, (0,) * len(hand), deck, add_counts(discard, hand), tuple(acted)
+
+
+def card_models(player: Player) -> list[CardModel]:
+    """
+    Returns the models of every distinct card type the player owns, in order
+    of first appearance.
+
+    Args:
+        player (Player): The player whose cards are modelled.
+
+    Returns:
+        list[CardModel]: One model per card type.
+    """
+    models = {}
+    for card in player.get_deck() + player.get_hand() + player.get_discarded():
+        effect = card.get_effect()
+        if effect.name not in models:
+            models[effect.name] = CardModel(
+                effect.name,
+                effect.cost,
+                effect.damage,
+                effect.block,
+                effect.strength,
+                effect.weak,
+                effect.vulnerable,
+                effect.target,
+            )
+    return list(models.values())
+
+
+def solver_for(player: Player, **options) -> Solver:
+    """
+    Returns a Solver for the given player's cards.
+
+    Args:
+        player (Player): The player the solver will play for.
+        **options: Passed on to Solver.
+
+    Returns:
+        Solver: The solver.
+    """
+    return Solver(card_models(player), **options)
+
+
+def main() -> None:
+    """
+    Command line entry point: solves the first turn of each encounter in a
+    game file and reports the best move, whether its value is exact and the
+    search statistics, e.g.
+    python sts_solver.py silent games/game3.txt --max-nodes 200000
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("player_type", choices=sorted(PLAYER_TYPES))
+    parser.add_argument("game_file")
+    parser.add_argument("--max-nodes", type=int, default=DEFAULT_MAX_NODES)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for number, monsters in enumerate(load_game(args.game_file), 1):
+        player = PLAYER_TYPES[args.player_type](GameRNG(args.seed))
+        encounter = Encounter(player, monsters)
+        solver = solver_for(player, max_nodes=args.max_nodes)
+        solution = solver.solve(encounter)
+        stats = solution.stats
+        if stats.exact:
+            value = f"expected HP {solution.value:.2f} (exact)"
+        else:
+            value = f"expected HP at most {solution.value:.2f} (node budget reached)"
+        print(
+            f"Encounter {number}: best move {solution.move}, {value}\n"
+            f"  {stats.nodes} nodes in {stats.elapsed:.2f}s "
+            f"({stats.nodes_per_second():.0f}/s), "
+            f"table hit rate {stats.hit_rate():.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,500 @@
+import io
+import mmap
+import os
 import random
-random.seed(10012023)
+import sys
+import zlib
+from collections import Counter
+from typing import IO, Any, Callable, Iterable, Iterator, NamedTuple
+
+DEFAULT_SEED = 10012023
+
+_MASK_64 = (1 << 64) - 1
+
+def _splitmix64(value: int) -> int:
+    """ (int) Returns the SplitMix64 finaliser of value, a well mixed 64-bit
+        integer.
+    """
+    value = (value + 0x9E3779B97F4A7C15) & _MASK_64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK_64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK_64
+    return value ^ (value >> 31)
+
+# The fields of the game state that have their own family of Zobrist keys.
+(
+    HASH_KIND,
+    HASH_MAX_HP,
+    HASH_HP,
+    HASH_BLOCK,
+    HASH_STRENGTH,
+    HASH_WEAK,
+    HASH_VULNERABLE,
+    HASH_ENERGY,
+    HASH_EXTRA,
+    HASH_CARD,
+) = range(10)
+
+class ZobristTable(dict):
+    """ The 64-bit Zobrist keys for one field of the game state, indexed by
+        the field's value. Keys are derived from (field, value) rather than
+        drawn at random, so hashes agree between processes and runs. Each key
+        is computed the first time it is looked up.
+    """
+
+    def __init__(self, field: int) -> None:
+        """ Parameters:
+                field (int): The field of the state, e.g. HASH_HP.
+        """
+        super().__init__()
+        self._seed = _splitmix64(field)
+
+    def __missing__(self, value: int) -> int:
+        """ (int) Computes and stores the key for value. """
+        key = _splitmix64(self._seed ^ (value & _MASK_64))
+        self[value] = key
+        return key
+
+# zobrist_keys[field][value] is the key for field having value.
+zobrist_keys = tuple(ZobristTable(field) for field in range(HASH_CARD + 1))
+
+def name_key(field: int, name: str) -> int:
+    """ (int) Returns the Zobrist key for field having a value identified by
+        name, such as the type of an entity or the name of a card.
+    """
+    return zobrist_keys[field][zlib.crc32(name.encode())]
+
+def hash_mix(value: int) -> int:
+    """ (int) Returns a well mixed 64-bit hash of the integer value, used to
+        combine the parts of a state hash.
+    """
+    return _splitmix64(value & _MASK_64)
+
+class GameRNG(random.Random):
+    """ The source of randomness for one game: card draws and louse damage.
+
+        A GameRNG seeded with a number produces exactly the same values as the
+        random module seeded with that number. GameRNG.for_game derives the
+        generator for game number index of a run directly from (seed, index)
+        by counter-based hashing, so any game of a run can be reproduced on
+        its own, and a batch gives identical results no matter how its games
+        are spread across workers.
+    """
+
+    @classmethod
+    def for_game(cls, seed: int, index: int) -> 'GameRNG':
+        """ Returns the generator for game number index of a run.
+
+            Parameters:
+                seed (int): The seed for the whole run.
+                index (int): The index of the game within the run.
+
+            Returns:
+                GameRNG: A generator independent of every other game's.
+        """
+        key = _splitmix64(_splitmix64(seed & _MASK_64) ^ index)
+        return cls((key << 64) | (index & _MASK_64))
+
+# Used whenever no generator is supplied, e.g. by main(). It produces the same
+# values the module-global random did when it was seeded at import.
+default_rng = GameRNG(DEFAULT_SEED)
 
 ENCOUNTER_WIN_MESSAGE = '\nYou have won the encounter!\n'
 GAME_WIN_MESSAGE = '\nYou have won the game!\n'
 GAME_LOSE_MESSAGE = '\nYou have lost the game!\n'
 CARD_FAILURE_MESSAGE = '\nCard application failed.\n'
 
+PLAYER_TYPE_PROMPT = 'Enter a player type: '
+GAME_FILE_PROMPT = 'Enter a game file: '
+MOVE_PROMPT = 'Enter a move: '
+
+class Renderer:
+    """ Draws encounters on a text stream. Each frame is built into one
+        string and written with a single write call. The panel of a monster
+        is kept until its HP changes. A quiet renderer draws nothing, and a
+        renderer made with every=N only draws every Nth frame it is asked
+        for, unless a frame is forced. A renderer made with intents=True
+        adds each monster's intent for its next turn to its panel.
+    """
+
+    def __init__(
+        self,
+        stream: IO[str] | None = None,
+        every: int = 1,
+        quiet: bool = False,
+        intents: bool = False
+    ) -> None:
+        """ Parameters:
+                stream (IO[str] | None): Where to write frames. Defaults to
+                    whatever sys.stdout is when each frame is written.
+                every (int): Draw only every this many frames. Defaults to 1.
+                quiet (bool): Whether to draw nothing at all.
+                intents (bool): Whether to show the monsters' intents.
+
+            Raises:
+                ValueError: If every is less than 1.
+        """
+        if every < 1:
+            raise ValueError('every must be at least 1')
+        self._stream = stream
+        self._every = every
+        self._quiet = quiet
+        self._intents = intents
+        self._frames = 0
+        self._encounter = None
+        # Monster id -> (HP, or (HP, intent) if intents are shown, the panel
+        # was built for, panel).
+        self._monster_panels = {}
+
+    def is_quiet(self) -> bool:
+        """ (bool) Returns whether this renderer draws nothing. """
+        return self._quiet
+
+    def shows_intents(self) -> bool:
+        """ (bool) Returns whether this renderer shows the monsters' intents. """
+        return self._intents
+
+    def get_every(self) -> int:
+        """ (int) Returns how many frames pass between frames drawn. """
+        return self._every
+
+    def get_frames(self) -> int:
+        """ (int) Returns the number of frames asked for so far, not counting
+            forced frames or any asked of a quiet renderer.
+        """
+        return self._frames
+
+    def _intent(self, encounter: 'Encounter', monster: 'Monster') -> str:
+        """ (str) Returns the line describing what monster will do in its
+            next turn: the damage the player will take from it before block,
+            as a range if it depends on the player, and the statuses it
+            applies.
+        """
+        intent = monster.forecast()[0]
+        damage = encounter.incoming_damage(1, monster.get_id())[0]
+        if damage.is_exact():
+            line = f'Intent: {damage.low} damage'
+        else:
+            line = f'Intent: {damage.low}-{damage.high} damage'
+        for name, amount in (
+            ('weak', intent.weak),
+            ('vulnerable', intent.vulnerable),
+            ('strength', intent.strength)
+        ):
+            if amount:
+                line += f', {amount} {name}'
+        return line
+
+    def _monster_panel(
+        self,
+        encounter: 'Encounter',
+        monster: 'Monster'
+    ) -> str:
+        """ (str) Returns the panel for monster, rebuilding it only if the
+            monster's HP, or the intent shown, has changed since it was last
+            built.
+        """
+        monster_id = monster.get_id()
+        intent = None
+        key = monster.get_hp()
+        if self._intents:
+            intent = self._intent(encounter, monster)
+            key = (key, intent)
+        cached = self._monster_panels.get(monster_id)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        text = str(monster)
+        border = len(text) * '-'
+        if intent is None:
+            panel = f'{border}\nMonster {monster_id}\n{text}\n{border}\n'
+        else:
+            panel = (
+                f'{border}\nMonster {monster_id}\n{text}\n{intent}\n'
+                f'{border}\n'
+            )
+        self._monster_panels[monster_id] = (key, panel)
+        return panel
+
+    def frame(self, encounter: 'Encounter') -> str:
+        """ Returns the text of one frame showing encounter.
+
+            Parameters:
+                encounter (Encounter): The encounter to show.
+
+            Returns:
+                str: The frame, exactly as display_encounter prints it.
+        """
+        if encounter is not self._encounter:
+            self._encounter = encounter
+            self._monster_panels.clear()
+        parts = ['MONSTERS\n']
+        for monster in encounter.get_monsters():
+            parts.append(self._monster_panel(encounter, monster))
+        player = encounter.get_player()
+        hand = f'Hand: {player.get_hand()}'
+        border = len(hand) * '-'
+        parts.append(
+            f'\n\n\nPLAYER\n{border}\n{player.get_name()}\n'
+            f'HP: {player.get_hp()}/{player.get_max_hp()}\n'
+            f'Energy: {player.get_energy()}\n{hand}\n'
+            f'Block: {player.get_block()} '
+            f'Strength: {player.get_strength()} '
+            f'Vulnerable: {player.get_vulnerable()} '
+            f'Weak: {player.get_weak()}\n{border}\n'
+        )
+        return ''.join(parts)
+
+    def render(self, encounter: 'Encounter', force: bool = False) -> bool:
+        """ Asks for a frame showing encounter, and draws it unless the
+            renderer is quiet or it is not one of every Nth frames.
+
+            Parameters:
+                encounter (Encounter): The encounter to show.
+                force (bool): Whether to draw the frame whenever the renderer
+                    is not quiet, e.g. at the start of an encounter. Forced
+                    frames do not count towards every.
+
+            Returns:
+                bool: Whether the frame was drawn.
+        """
+        if self._quiet:
+            return False
+        if not force:
+            self._frames += 1
+            if self._frames % self._every:
+                return False
+        stream = self._stream if self._stream is not None else sys.stdout
+        stream.write(self.frame(encounter))
+        return True
+
+class CardPlayed(NamedTuple):
+    """ The player played a card, on target if it was aimed at a monster. """
+    player: 'Player'
+    card_name: str
+    target: 'Monster | None'
+
+class DamageApplied(NamedTuple):
+    """ source hit target for amount, after the vulnerable and weak
+        multipliers and before block.
+    """
+    source: 'Entity'
+    target: 'Entity'
+    amount: int
+
+class BlockAbsorbed(NamedTuple):
+    """ entity's block absorbed amount damage in reduce_hp. """
+    entity: 'Entity'
+    amount: int
+
+class MonsterDefeated(NamedTuple):
+    """ monster was defeated and removed from its encounter. """
+    monster: 'Monster'
+
+class TurnStarted(NamedTuple):
+    """ The player's turn started, with a new hand dealt. """
+    player: 'Player'
+
+class TurnEnded(NamedTuple):
+    """ The player's turn ended. """
+    player: 'Player'
+
+Event = CardPlayed | DamageApplied | BlockAbsorbed | MonsterDefeated | \
+    TurnStarted | TurnEnded
+
+class EventBus:
+    """ Delivers the events of the encounters it is attached to.
+
+        A subscriber is either called with each event as it is emitted, or,
+        if it subscribes in batches, with lists of events whenever the bus is
+        flushed or batch_size events are waiting. Either kind can ask for
+        some types of event only. The engine only builds events for an
+        encounter when a bus is attached to it, so a game without a bus pays
+        one attribute check per emission point.
+
+        Events hold the live entities, so a subscriber that keeps them sees
+        later changes; copy what is needed when the event arrives.
+    """
+
+    def __init__(self, batch_size: int = 1024) -> None:
+        """ Parameters:
+                batch_size (int): How many events batch subscribers are sent
+                    at most at once. Defaults to 1024.
+        """
+        self._batch_size = batch_size
+        # (callback, event types or None for all)
+        self._subscribers = []
+        self._batch_subscribers = []
+        self._pending = []
+
+    def subscribe(
+        self,
+        callback: Callable[[Event], Any],
+        event_types: Iterable[type] | None = None
+    ) -> None:
+        """ Calls callback with each event of the given types, or of every
+            type, as soon as it is emitted.
+
+            Parameters:
+                callback (Callable[[Event], Any]): Receives the events.
+                event_types (Iterable[type] | None): The event classes wanted.
+        """
+        types = None if event_types is None else frozenset(event_types)
+        self._subscribers.append((callback, types))
+
+    def subscribe_batch(
+        self,
+        callback: Callable[[list[Event]], Any],
+        event_types: Iterable[type] | None = None
+    ) -> None:
+        """ Calls callback with lists of the events of the given types, or of
+            every type, in the order they were emitted, whenever the bus is
+            flushed.
+
+            Parameters:
+                callback (Callable[[list[Event]], Any]): Receives the events.
+                event_types (Iterable[type] | None): The event classes wanted.
+        """
+        types = None if event_types is None else frozenset(event_types)
+        self._batch_subscribers.append((callback, types))
+
+    def unsubscribe(self, callback: Callable) -> None:
+        """ Stops sending events to callback, however it subscribed. Events
+            already waiting are still sent to the other batch subscribers.
+        """
+        self._subscribers = [
+            entry for entry in self._subscribers if entry[0] != callback
+        ]
+        self._batch_subscribers = [
+            entry for entry in self._batch_subscribers if entry[0] != callback
+        ]
+
+    def emit(self, event: Event) -> None:
+        """ Sends event to the immediate subscribers and queues it for the
+            batch subscribers.
+        """
+        for callback, types in self._subscribers:
+            if types is None or type(event) in types:
+                callback(event)
+        if self._batch_subscribers:
+            self._pending.append(event)
+            if len(self._pending) >= self._batch_size:
+                self.flush()
+
+    def flush(self) -> None:
+        """ Sends every waiting event to the batch subscribers. """
+        pending = self._pending
+        if not pending:
+            return
+        self._pending = []
+        for callback, types in self._batch_subscribers:
+            if types is None:
+                callback(pending)
+            else:
+                events = [event for event in pending if type(event) in types]
+                if events:
+                    callback(events)
+
+    def __deepcopy__(self, memo: dict) -> 'EventBus':
+        """ Copies of an encounter report to the same bus. """
+        return self
+
 def display_encounter(encounter: 'Encounter') -> None:
     """ Displays the current state of an encounter is a user friendly format.
     
         Parameters:
             encounter (Encounter): The encounter to display.
     """
-    print('MONSTERS')
-    for monster in encounter.get_monsters():
-        border = len(str(monster)) * '-'
-        print(f'{border}\nMonster {monster.get_id()}\n{monster}\n{border}')
-    print('\n\n')
-    print('PLAYER')
-    player = encounter.get_player()
-    border = len(f'Hand: {str(player.get_hand())}') * '-'
-    print(
-        f'{border}\n{player.get_name()}\nHP: {player.get_hp()}/' + \
-        f'{player.get_max_hp()}\nEnergy: {player.get_energy()}\n' + \
-        f'Hand: {player.get_hand()}\nBlock: {player.get_block()} ' + \
-        f'Strength: {player.get_strength()} ' + \
-        f'Vulnerable: {player.get_vulnerable()} ' + \
-        f'Weak: {player.get_weak()}\n{border}'
-    )
+    Renderer().render(encounter)
+
+class GameFileError(ValueError):
+    """ Raised when a game file is not valid. The message gives the name of
+        the file and the number of the offending line.
+    """
+
+    def __init__(self, filename: str, line_number: int, message: str) -> None:
+        """ Parameters:
+                filename (str): The name of the file, or '<stdin>'.
+                line_number (int): The number of the offending line, from 1.
+                message (str): What is wrong with the line.
+        """
+        super().__init__(f'{filename}:{line_number}: {message}')
+        self.filename = filename
+        self.line_number = line_number
+
+def _parse_game_lines(
+    lines: Iterable[str],
+    filename: str
+) -> Iterator[list[tuple[str, int]]]:
+    """ Yields the monsters in each encounter described by lines, one
+        encounter at a time. See iter_game_file.
+    """
+    encounter = None
+    for line_number, line in enumerate(lines, 1):
+        if line.startswith('Encounter'):
+            if encounter is not None:
+                yield encounter
+            encounter = []
+            continue
+        fields = line.split()
+        if not fields:
+            continue
+        if encounter is None:
+            raise GameFileError(
+                filename, line_number,
+                "monster listed before the first 'Encounter' line"
+            )
+        if len(fields) != 2:
+            raise GameFileError(
+                filename, line_number,
+                f'expected "{{monster_type}} {{start_hp}}", got {line.strip()!r}'
+            )
+        try:
+            start_hp = int(fields[1])
+        except ValueError:
+            raise GameFileError(
+                filename, line_number,
+                f'start HP must be an integer, got {fields[1]!r}'
+            ) from None
+        if start_hp <= 0:
+            raise GameFileError(
+                filename, line_number, f'start HP must be positive, got {start_hp}'
+            )
+        encounter.append((fields[0], start_hp))
+    if encounter is not None:
+        yield encounter
+
+def iter_game_file(
+    source: 'str | os.PathLike | IO | mmap.mmap'
+) -> Iterator[list[tuple[str, int]]]:
+    """ Reads a game file lazily, yielding information about the monsters in
+        each encounter as soon as the encounter has been read, in the format
+        of read_game_file. Only one encounter is held in memory at a time, so
+        files of any size can be read.
+
+        Parameters:
+            source (str | PathLike | IO | mmap): The name of the file to read,
+                '-' for standard input, an open text or binary file, or an
+                mmap of a file (read from its start).
+
+        Returns:
+            Iterator[list[tuple[str, int]]]: The monsters in each encounter.
+
+        Raises:
+            GameFileError: If a line of the file is not valid. The encounters
+                           before it have already been yielded.
+    """
+    if isinstance(source, mmap.mmap):
+        source.seek(0)
+    if source == '-':
+        yield from _parse_game_lines(sys.stdin, '<stdin>')
+    elif isinstance(source, (str, os.PathLike)):
+        with open(source, 'r') as file:
+            yield from _parse_game_lines(file, os.fspath(source))
+    elif isinstance(source, io.TextIOBase):
+        yield from _parse_game_lines(source, getattr(source, 'name', '<file>'))
+    else:
+        # a binary file or an mmap
+        lines = (line.decode() for line in iter(source.readline, b''))
+        yield from _parse_game_lines(lines, str(getattr(source, 'name', '<file>')))
 
 def read_game_file(filename: str) -> list[list[tuple[str, int]]]:
     """ Reads a game file and returns a list of information about the monsters
@@ -41,30 +508,97 @@ def read_game_file(filename: str) -> list[list[tuple[str, int]]]:
         Returns:
             list[list[tuple[str, int]]]: A list of information about the
                                          monsters in each encounter (in order).
+
+        Raises:
+            GameFileError: If a line of the file is not valid.
+    """
+    return list(iter_game_file(filename))
+
+_CARD_FIELDS = {
+    'description': str,
+    'cost': int,
+    'damage': int,
+    'block': int,
+    'strength': int,
+    'weak': int,
+    'vulnerable': int,
+    'target': bool,
+}
+
+def read_card_file(filename: str) -> list[dict[str, str | int | bool]]:
+    """ Reads a card file and returns the fields of each card in it, in the
+        keyword form accepted by CardEffect. Each card starts with a line
+        'Card {name}', followed by one '{field} {value}' line per field that
+        differs from the defaults of the Card class, e.g.
+
+            Card Cleave
+            description Deal 8 damage.
+            damage 8
+            target no
+
+        The fields are description, cost, damage, block, strength, weak,
+        vulnerable and target (yes or no). Blank lines and lines starting with
+        '#' are ignored.
+
+        Parameters:
+            filename (str): The name of the file to read.
+
+        Returns:
+            list[dict[str, str | int | bool]]: The fields of each card (in
+                                               order).
+
+        Raises:
+            ValueError: If a line of the file is not valid.
     """
-    encounters = []
+    cards = []
     with open(filename, 'r') as file:
-        for line in file:
-            if line.startswith('Encounter'):
-                encounters.append([])
-            elif line.strip() != '':
-                monster_type, start_hp = line.strip().split(' ')
-                encounters[-1].append((monster_type, int(start_hp)))
+        for line_number, line in enumerate(file, 1):
+            line = line.strip()
+            if line == '' or line.startswith('#'):
+                continue
+            field, _, value = line.partition(' ')
+            value = value.strip()
+            if field == 'Card' and value != '':
+                cards.append({'name': value})
+            elif field not in _CARD_FIELDS or not cards:
+                raise ValueError(f'{filename}:{line_number}: unexpected {line!r}')
+            elif _CARD_FIELDS[field] is bool:
+                if value not in ('yes', 'no'):
+                    raise ValueError(
+                        f'{filename}:{line_number}: {field} must be yes or no'
+                    )
+                cards[-1][field] = value == 'yes'
+            elif _CARD_FIELDS[field] is int:
+                try:
+                    cards[-1][field] = int(value)
+                except ValueError:
+                    raise ValueError(
+                        f'{filename}:{line_number}: {field} must be an integer'
+                    ) from None
+            else:
+                cards[-1][field] = value
 
-    return encounters
+    return cards
 
-def select_cards(cards: list, amount: int) -> list['Card']:
+def select_cards(
+    cards: list,
+    amount: int,
+    rng: random.Random | None = None
+) -> list['Card']:
     """ Selects an amount of cards from the cards list, removes those cards from
         the original cards list, and returns the selected cards.
     
         Parameters:
             cards (list): The list of cards to select from.
             amount (int): The amount of cards to select.
+            rng (Random | None): The generator to use. Defaults to default_rng.
         
         Returns:
             list[Card]: The selected cards.
     """
-    selected_indices = random.sample(range(len(cards)), k=amount)
+    if rng is None:
+        rng = default_rng
+    selected_indices = rng.sample(range(len(cards)), k=amount)
     selected_cards = [cards[i] for i in selected_indices]
     for i in sorted(selected_indices, reverse=True):
         cards.pop(i)
@@ -73,8 +607,9 @@ def select_cards(cards: list, amount: int) -> list['Card']:
 def draw_cards(
     deck: list['Card'],
     hand: list['Card'],
-    discarded: list['Card']
-) -> None:
+    discarded: list['Card'],
+    rng: random.Random | None = None
+) -> bool:
     """ Handles drawing cards from the deck to the hand at the beginning of a
         turn.
     
@@ -83,15 +618,79 @@ def draw_cards(
             hand (list[Card]): The hand to draw into.
             discard (list[Card]): The discard pile used to replenish the deck if
                                   there aren't enough cards available.
+            rng (Random | None): The generator to use. Defaults to default_rng.
+
+        Returns:
+            bool: True if the discard pile was moved into the deck.
     """
     hand.clear()
-    if len(deck) < 5:
+    refilled = len(deck) < 5
+    if refilled:
         hand.extend(deck)
         deck.clear()
         deck.extend(discarded)
         discarded.clear()
-    hand.extend(select_cards(deck, 5 - len(hand)))
+    hand.extend(select_cards(deck, 5 - len(hand), rng))
+    return refilled
+
+def draw_from_end(
+    deck: list['Card'],
+    hand: list['Card'],
+    amount: int,
+    rng: random.Random | None = None
+) -> None:
+    """ Moves amount cards, chosen uniformly at random, from the deck to the
+        hand in O(1) per card: each chosen card is swapped with the last card
+        of the deck and popped from the end, so the deck is only shuffled as
+        far as it is drawn. Unlike select_cards, this reorders the cards left
+        in the deck and uses the generator differently, so it does not
+        reproduce select_cards' choices for a given seed.
+
+        Parameters:
+            deck (list[Card]): The deck to draw from.
+            hand (list[Card]): The hand to draw into.
+            amount (int): The number of cards to draw.
+            rng (Random | None): The generator to use. Defaults to default_rng.
+
+        Raises:
+            ValueError: If the deck has fewer than amount cards.
+    """
+    if rng is None:
+        rng = default_rng
+    if amount > len(deck):
+        raise ValueError('cannot draw more cards than are in the deck')
+    for _ in range(amount):
+        index = rng.randrange(len(deck))
+        deck[index], deck[-1] = deck[-1], deck[index]
+        hand.append(deck.pop())
+
+def pile_counts(cards: list['Card']) -> dict[str, int]:
+    """ (dict[str, int]) Returns the number of cards of each name in a pile. """
+    return dict(Counter(card.get_name() for card in cards))
+
+def move_counts(source: dict[str, int], destination: dict[str, int]) -> None:
+    """ Adds the card counts of one pile to those of another, and empties the
+        first, for when all the cards in a pile move to another.
 
-def random_louse_amount() -> int:
-    """ (int) Returns a random amount of damage for a louse to give. """
-    return random.randint(5, 7)
+        Parameters:
+            source (dict[str, int]): The counts of the pile being emptied.
+            destination (dict[str, int]): The counts of the pile receiving
+                                          the cards.
+    """
+    for name, count in source.items():
+        destination[name] = destination.get(name, 0) + count
+    source.clear()
+
+def pile_hash(cards: list['Card']) -> int:
+    """ (int) Returns the hash of a pile of cards as a multiset: the sum of
+        the cards' hash keys, which does not depend on their order.
+    """
+    return sum(card.get_hash_key() for card in cards)
+
+def random_louse_amount(rng: random.Random | None = None) -> int:
+    """ (int) Returns a random amount of damage for a louse to give, drawn
+        from rng (default_rng if not given).
+    """
+    if rng is None:
+        rng = default_rng
+    return rng.randint(5, 7)
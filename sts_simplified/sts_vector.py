@@ -0,0 +1,1111 @@
+"""
+A struct-of-arrays combat engine that steps many encounters in lockstep.
+
+BatchEncounter stores the state of N encounters in NumPy arrays (one element
+per encounter for the player, one row per encounter for the monsters) and
+applies Encounter's rules to every encounter at once: card effects, the
+vulnerable and weak damage multipliers of sts_damage in exact integer
+arithmetic, block absorption as in Entity.reduce_hp, and the status decay of
+Entity.new_turn.
+
+Card piles are kept as per-card-type counts, with a column for each type of
+card in the batch's CardTable. The table is built from CARD_EFFECTS when the
+batch is created, so it includes any cards added with register_card or
+load_cards by then. A card registered later is rejected with a ValueError.
+draw_hands deals new hands with the same distribution as draw_cards, but from
+a NumPy generator, so it does not reproduce a particular GameRNG's draws;
+verify_against_oop instead copies the hands drawn by real Encounter objects
+into the batch to check the two engines step for step.
+
+run_games builds on BatchEncounter to play many whole games with the greedy
+policy of sts_simulate at once, for batch runs such as
+sts_montecarlo.run_monte_carlo(..., vectorized=True). Its results have the
+same distribution as run_game's, though not the same games for any seed.
+
+Requires NumPy.
+"""
+
+import copy
+from typing import NamedTuple, Sequence
+
+import numpy as np
+
+from sts import (
+    CARD_EFFECTS,
+    MONSTER_TYPES,
+    Card,
+    CardEffect,
+    Cultist,
+    Encounter,
+    JawWorm,
+    Louse,
+)
+from sts_damage import MULTIPLIERS, scale_damage
+from sts_simulate import MAX_TURNS, PLAYER_TYPES, card_score, load_game
+from sts_support import GameRNG
+
+# Monster kinds. NO_MONSTER marks an empty monster slot.
+NO_MONSTER, LOUSE, CULTIST, JAW_WORM = 0, 1, 2, 3
+MONSTER_KINDS = {Louse: LOUSE, Cultist: CULTIST, JawWorm: JAW_WORM}
+
+NO_CARD = -1
+NO_TARGET = -1
+
+HAND_SIZE = 5
+
+
+class CardTable:
+    """
+    The effects of the types of card a batch can hold, as arrays with one
+    element per column of the pile counts.
+    """
+
+    def __init__(self, effects: Sequence[CardEffect]) -> None:
+        """
+        Args:
+            effects (Sequence[CardEffect]): The effect of each type of card, in
+            the order of the columns.
+        """
+        self.names = tuple(effect.name for effect in effects)
+        self._columns = {name: column for column, name in enumerate(self.names)}
+        self.damage = np.array([effect.damage for effect in effects], dtype=np.int64)
+        self.block = np.array([effect.block for effect in effects], dtype=np.int64)
+        self.cost = np.array([effect.cost for effect in effects], dtype=np.int64)
+        self.strength = np.array(
+            [effect.strength for effect in effects], dtype=np.int64
+        )
+        self.weak = np.array([effect.weak for effect in effects], dtype=np.int64)
+        self.vulnerable = np.array(
+            [effect.vulnerable for effect in effects], dtype=np.int64
+        )
+        self.target = np.array([effect.target for effect in effects], dtype=bool)
+        # The rank of each type of card by greedy_policy's card_score, higher
+        # first.
+        scores = [card_score(Card.from_name(name)) for name in self.names]
+        ranks = sorted(set(scores))
+        self.rank = np.array([ranks.index(score) for score in scores], dtype=np.int64)
+
+    def __len__(self) -> int:
+        """
+        Returns the number of types of card, i.e. of columns.
+
+        Returns:
+            int: The number of types of card.
+        """
+        return len(self.names)
+
+    def column(self, name: str) -> int:
+        """
+        Returns the column of a type of card.
+
+        Args:
+            name (str): The name of the card, e.g. 'Strike'.
+
+        Returns:
+            int: The column of the card in the pile counts.
+
+        Raises:
+            ValueError: If the card is not in the table, e.g. because it was
+            registered after the table was built.
+        """
+        column = self._columns.get(name)
+        if column is None:
+            raise ValueError(
+                f"card {name!r} is not in the batch's card table; register it "
+                "before creating the batch"
+            )
+        return column
+
+    def count_cards(self, cards: list) -> list[int]:
+        """
+        Returns the number of cards of each type among cards.
+
+        Args:
+            cards (list[Card]): The cards to count.
+
+        Returns:
+            list[int]: The count for each type of card, in column order.
+
+        Raises:
+            ValueError: If any of the cards is not in the table.
+        """
+        counts = [0] * len(self.names)
+        for card in cards:
+            counts[self.column(card.get_name())] += 1
+        return counts
+
+
+# The CardTable of the types of card registered, by their effects.
+_card_tables: dict[tuple[CardEffect, ...], CardTable] = {}
+
+
+def card_table() -> CardTable:
+    """
+    Returns the CardTable of every type of card registered in CARD_EFFECTS so
+    far, built again only once another type has been registered.
+
+    Returns:
+        CardTable: The table, in the order the types were registered.
+    """
+    effects = tuple(CARD_EFFECTS.values())
+    table = _card_tables.get(effects)
+    if table is None:
+        table = CardTable(effects)
+        _card_tables.clear()
+        _card_tables[effects] = table
+    return table
+
+
+def _reduce_hp(hp: np.ndarray, block: np.ndarray, amount: np.ndarray) -> None:
+    """
+    Applies Entity.reduce_hp element-wise, in place: damage is taken from block
+    first and any remainder from HP, which cannot go below 0.
+    """
+    covered = block >= amount
+    np.copyto(hp, np.maximum(hp - (amount - block), 0), where=~covered)
+    np.copyto(block, np.where(covered, block - amount, 0))
+
+
+def _decay(block: np.ndarray, weak: np.ndarray, vulnerable: np.ndarray, where) -> None:
+    """
+    Applies the status changes of Entity.new_turn element-wise, in place, to
+    the elements selected by where.
+    """
+    np.copyto(block, 0, where=where)
+    np.copyto(weak, np.maximum(weak - 1, 0), where=where)
+    np.copyto(vulnerable, np.maximum(vulnerable - 1, 0), where=where)
+
+
+# The numerator and shift of each of MULTIPLIERS, indexed by
+# 2 * vulnerable + weak.
+_NUMERATORS = np.array([numerator for numerator, _ in MULTIPLIERS], dtype=np.int64)
+_SHIFTS = np.array([shift for _, shift in MULTIPLIERS], dtype=np.int64)
+
+
+def _scale_damage(
+    damage: np.ndarray, vulnerable: np.ndarray, weak: np.ndarray
+) -> np.ndarray:
+    """
+    Returns damage after the vulnerable and weak multipliers, truncated toward
+    zero with the same integer arithmetic as sts_damage.scale_damage.
+    """
+    index = 2 * vulnerable.astype(np.int64) + weak
+    product = damage.astype(np.int64) * _NUMERATORS[index]
+    magnitude = np.abs(product) >> _SHIFTS[index]
+    return np.where(product < 0, -magnitude, magnitude)
+
+
+class BatchEncounter:
+    """
+    The state of many encounters, stored as arrays and advanced together.
+
+    Player arrays have shape (size,), pile counts (size, len(card_table)) and
+    monster arrays (size, max_monsters). Monsters keep their column for the
+    whole encounter; a defeated monster is marked as not alive rather than
+    removed, so targets are given as columns (see get_monster_ids for the
+    matching Monster ids).
+    """
+
+    def __init__(
+        self, size: int, max_monsters: int = 3, cards: CardTable | None = None
+    ) -> None:
+        """
+        Creates a batch of empty encounters. Use from_encounters to fill it
+        from existing Encounter objects.
+
+        Args:
+            size (int): The number of encounters in the batch.
+            max_monsters (int): The largest number of monsters in any encounter.
+            cards (CardTable | None): The types of card the batch can hold.
+            Defaults to every type registered so far.
+
+        Returns:
+            None
+        """
+        self._size = size
+        self._rows = np.arange(size)
+        self.card_table = card_table() if cards is None else cards
+        columns = len(self.card_table)
+
+        self.player_hp = np.zeros(size, dtype=np.int64)
+        self.player_max_hp = np.zeros(size, dtype=np.int64)
+        self.player_block = np.zeros(size, dtype=np.int64)
+        self.player_strength = np.zeros(size, dtype=np.int64)
+        self.player_weak = np.zeros(size, dtype=np.int64)
+        self.player_vulnerable = np.zeros(size, dtype=np.int64)
+        self.player_energy = np.zeros(size, dtype=np.int64)
+        self.player_turn = np.zeros(size, dtype=bool)
+        self.deck = np.zeros((size, columns), dtype=np.int64)
+        self.hand = np.zeros((size, columns), dtype=np.int64)
+        self.discard = np.zeros((size, columns), dtype=np.int64)
+
+        shape = (size, max_monsters)
+        self.monster_kind = np.zeros(shape, dtype=np.int8)
+        self.monster_id = np.full(shape, -1, dtype=np.int64)
+        self.monster_alive = np.zeros(shape, dtype=bool)
+        self.monster_hp = np.zeros(shape, dtype=np.int64)
+        self.monster_max_hp = np.zeros(shape, dtype=np.int64)
+        self.monster_block = np.zeros(shape, dtype=np.int64)
+        self.monster_strength = np.zeros(shape, dtype=np.int64)
+        self.monster_weak = np.zeros(shape, dtype=np.int64)
+        self.monster_vulnerable = np.zeros(shape, dtype=np.int64)
+        self.monster_damage = np.zeros(shape, dtype=np.int64)
+        self.monster_calls = np.zeros(shape, dtype=np.int64)
+
+    @classmethod
+    def from_encounters(
+        cls, encounters: list[Encounter], max_monsters: int = 3
+    ) -> "BatchEncounter":
+        """
+        Creates a batch holding a copy of the state of each encounter.
+
+        Args:
+            encounters (list[Encounter]): The encounters to copy.
+            max_monsters (int): The largest number of monsters in any encounter.
+
+        Returns:
+            BatchEncounter: The batch, with row i copied from encounters[i].
+        """
+        batch = cls(len(encounters), max_monsters)
+        for row, encounter in enumerate(encounters):
+            batch.load_row(row, encounter)
+        return batch
+
+    def take(self, rows: np.ndarray) -> "BatchEncounter":
+        """
+        Returns a new batch holding a copy of the selected encounters, e.g. to
+        leave out the finished ones.
+
+        Args:
+            rows (np.ndarray): A boolean mask or the indices of the encounters.
+
+        Returns:
+            BatchEncounter: The selected encounters, in order.
+        """
+        kept = self._rows[rows]
+        batch = BatchEncounter(len(kept), self.monster_kind.shape[1], self.card_table)
+        for name, value in vars(self).items():
+            if isinstance(value, np.ndarray) and name != "_rows":
+                setattr(batch, name, value[kept])
+        return batch
+
+    def load_row(self, row: int, encounter: Encounter) -> None:
+        """
+        Copies the state of an encounter into one row of the batch.
+
+        Args:
+            row (int): The row to overwrite.
+            encounter (Encounter): The encounter to copy.
+
+        Returns:
+            None
+        """
+        player = encounter.get_player()
+        self.player_hp[row] = player.get_hp()
+        self.player_max_hp[row] = player.get_max_hp()
+        self.player_block[row] = player.get_block()
+        self.player_strength[row] = player.get_strength()
+        self.player_weak[row] = player.get_weak()
+        self.player_vulnerable[row] = player.get_vulnerable()
+        self.player_energy[row] = player.get_energy()
+        self.player_turn[row] = encounter.is_player_turn()
+        self.load_piles(row, encounter)
+
+        self.monster_kind[row] = NO_MONSTER
+        self.monster_id[row] = -1
+        self.monster_alive[row] = False
+        for column, monster in enumerate(encounter.get_monsters()):
+            self.monster_kind[row, column] = MONSTER_KINDS[type(monster)]
+            self.monster_id[row, column] = monster.get_id()
+            self.monster_alive[row, column] = True
+            self.monster_hp[row, column] = monster.get_hp()
+            self.monster_max_hp[row, column] = monster.get_max_hp()
+            self.monster_block[row, column] = monster.get_block()
+            self.monster_strength[row, column] = monster.get_strength()
+            self.monster_weak[row, column] = monster.get_weak()
+            self.monster_vulnerable[row, column] = monster.get_vulnerable()
+            if isinstance(monster, Louse):
+                self.monster_damage[row, column] = monster.get_damage_amount()
+            elif isinstance(monster, Cultist):
+                self.monster_calls[row, column] = monster.get_num_calls()
+
+    def load_piles(self, row: int, encounter: Encounter) -> None:
+        """
+        Copies the player's deck, hand and discard pile from an encounter into
+        one row of the batch.
+
+        Args:
+            row (int): The row to overwrite.
+            encounter (Encounter): The encounter to copy.
+
+        Returns:
+            None
+        """
+        player = encounter.get_player()
+        self.deck[row] = self.card_table.count_cards(player.get_deck())
+        self.hand[row] = self.card_table.count_cards(player.get_hand())
+        self.discard[row] = self.card_table.count_cards(player.get_discarded())
+
+    def get_size(self) -> int:
+        """
+        Returns the number of encounters in the batch.
+
+        Returns:
+            int: The number of encounters in the batch.
+        """
+        return self._size
+
+    def get_monster_ids(self) -> np.ndarray:
+        """
+        Returns the Monster id in each monster slot, or -1 for empty slots.
+
+        Returns:
+            np.ndarray: The (size, max_monsters) array of monster ids.
+        """
+        return self.monster_id
+
+    def is_active(self) -> np.ndarray:
+        """
+        Returns, for each encounter, True if any monster remains.
+
+        Returns:
+            np.ndarray: A boolean array of shape (size,).
+        """
+        return self.monster_alive.any(axis=1)
+
+    def apply_card(self, cards: np.ndarray, targets: np.ndarray) -> np.ndarray:
+        """
+        Attempts to play one card in every encounter, following
+        Encounter.player_apply_card exactly.
+
+        Args:
+            cards (np.ndarray): The card type (column of card_table) to play in
+            each encounter, or NO_CARD to play nothing.
+            targets (np.ndarray): The monster column targeted in each
+            encounter, or NO_TARGET for no target.
+
+        Returns:
+            np.ndarray: For each encounter, True if the card was played.
+        """
+        rows = self._rows
+        table = self.card_table
+        known = cards != NO_CARD
+        card = np.where(known, cards, 0)
+        has_target = targets != NO_TARGET
+        target = np.where(has_target, targets, 0)
+
+        played = (
+            known
+            & self.player_turn
+            & (self.player_energy > 0)
+            & ~(table.target[card] & ~has_target)
+            & (~has_target | self.monster_alive[rows, target])
+            & (self.hand[rows, card] > 0)
+            & (self.player_energy >= table.cost[card])
+        )
+
+        # The card moves to the discard pile and its cost is paid.
+        played_rows = rows[played]
+        played_card = card[played]
+        self.hand[played_rows, played_card] -= 1
+        self.discard[played_rows, played_card] += 1
+        self.player_energy[played] -= table.cost[played_card]
+        self.player_block[played] += table.block[played_card]
+        self.player_strength[played] += table.strength[played_card]
+
+        # Status and damage are applied to the target, if one was given.
+        hit = played & has_target
+        hit_rows = rows[hit]
+        hit_card = card[hit]
+        hit_target = target[hit]
+        self.monster_vulnerable[hit_rows, hit_target] += table.vulnerable[hit_card]
+        self.monster_weak[hit_rows, hit_target] += table.weak[hit_card]
+        damage = _scale_damage(
+            table.damage[hit_card] + self.player_strength[hit],
+            self.monster_vulnerable[hit_rows, hit_target] > 0,
+            self.player_weak[hit] > 0,
+        )
+        hp = self.monster_hp[hit_rows, hit_target]
+        block = self.monster_block[hit_rows, hit_target]
+        _reduce_hp(hp, block, damage)
+        self.monster_hp[hit_rows, hit_target] = hp
+        self.monster_block[hit_rows, hit_target] = block
+        self.monster_alive[hit_rows, hit_target] = hp > 0
+        return played
+
+    def end_player_turn(self, rows: np.ndarray | None = None) -> None:
+        """
+        Ends the player's turn in the selected encounters, as
+        Encounter.end_player_turn does: the hand is discarded and every
+        remaining monster starts a new turn.
+
+        Args:
+            rows (np.ndarray | None): A boolean mask of the encounters whose
+            turn ends. Defaults to every encounter.
+
+        Returns:
+            None
+        """
+        if rows is None:
+            rows = np.ones(self._size, dtype=bool)
+        self.player_turn[rows] = False
+        self.discard[rows] += self.hand[rows]
+        self.hand[rows] = 0
+        _decay(
+            self.monster_block,
+            self.monster_weak,
+            self.monster_vulnerable,
+            self.monster_alive & rows[:, None],
+        )
+
+    def enemy_turn(self) -> np.ndarray:
+        """
+        Lets every remaining monster act, in order, in each encounter where it
+        is not the player's turn, then starts the player's next turn there,
+        following Encounter.enemy_turn. New hands are not drawn; call
+        draw_hands (or fill the piles from elsewhere) before the next card is
+        played.
+
+        Returns:
+            np.ndarray: A boolean mask of the encounters that had an enemy turn.
+        """
+        acting = ~self.player_turn
+        for column in range(self.monster_kind.shape[1]):
+            active = acting & self.monster_alive[:, column]
+            kind = self.monster_kind[:, column]
+            calls = self.monster_calls[:, column]
+
+            louse = active & (kind == LOUSE)
+            cultist = active & (kind == CULTIST)
+            jaw_worm = active & (kind == JAW_WORM)
+
+            damage_taken = self.monster_max_hp[:, column] - self.monster_hp[:, column]
+            np.copyto(
+                self.monster_block[:, column], (damage_taken + 1) // 2, where=jaw_worm
+            )
+            damage = np.select(
+                [louse, cultist, jaw_worm],
+                [
+                    self.monster_damage[:, column],
+                    np.where(calls == 0, 0, calls + 6),
+                    damage_taken // 2,
+                ],
+                0,
+            )
+            self.player_weak += np.where(cultist, calls % 2, 0)
+            calls += cultist
+
+            damage = _scale_damage(
+                self.monster_strength[:, column] + damage,
+                self.player_vulnerable > 0,
+                self.monster_weak[:, column] > 0,
+            )
+            hp = self.player_hp[active]
+            block = self.player_block[active]
+            _reduce_hp(hp, block, damage[active])
+            self.player_hp[active] = hp
+            self.player_block[active] = block
+
+        # Start the player's next turn (Player.new_turn without the draw).
+        self.player_turn[acting] = True
+        self.player_energy[acting] = 3
+        _decay(self.player_block, self.player_weak, self.player_vulnerable, acting)
+        return acting
+
+    def draw_hands(
+        self, generator: np.random.Generator, rows: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Draws a new hand in the selected encounters, following draw_cards: the
+        hand is emptied, the whole deck is taken and the discard pile becomes
+        the deck if fewer than five cards remain, and the rest of the hand is
+        drawn uniformly at random without replacement.
+
+        Args:
+            generator (np.random.Generator): The source of randomness.
+            rows (np.ndarray): A boolean mask of the encounters to draw in.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: A boolean mask of the encounters
+            whose discard pile became the deck, and the (size, HAND_SIZE) card
+            types drawn at random in each, in the order drawn, padded with
+            NO_CARD.
+        """
+        self.hand[rows] = 0
+        refill = rows & (self.deck.sum(axis=1) < HAND_SIZE)
+        self.hand[refill] = self.deck[refill]
+        self.deck[refill] = self.discard[refill]
+        self.discard[refill] = 0
+
+        drawn = np.full((self._size, HAND_SIZE), NO_CARD, dtype=np.int64)
+        needed = np.where(rows, HAND_SIZE - self.hand.sum(axis=1), 0)
+        for draw in range(HAND_SIZE):
+            drawing = needed > 0
+            if not drawing.any():
+                break
+            deck = self.deck[drawing]
+            cumulative = deck.cumsum(axis=1)
+            picks = generator.integers(0, cumulative[:, -1])
+            card = (picks[:, None] >= cumulative).sum(axis=1)
+            drawing_rows = self._rows[drawing]
+            self.deck[drawing_rows, card] -= 1
+            self.hand[drawing_rows, card] += 1
+            drawn[drawing_rows, draw] = card
+            needed -= drawing
+        return refill, drawn
+
+
+class BatchGameResult(NamedTuple):
+    """
+    The outcomes of a batch of simulated games, one element per game, with
+    the fields of sts_simulate.GameResult.
+
+    Attributes:
+    - won (np.ndarray): True if every encounter in the game was won.
+    - turns (np.ndarray): The number of player turns taken over the game.
+    - hp (np.ndarray): The player's HP when the game finished.
+    - cards_played (np.ndarray): The number of cards successfully played.
+    - encounters_won (np.ndarray): The number of encounters won.
+    """
+
+    won: np.ndarray
+    turns: np.ndarray
+    hp: np.ndarray
+    cards_played: np.ndarray
+    encounters_won: np.ndarray
+
+
+def _compact(cards: np.ndarray) -> np.ndarray:
+    """
+    Returns a padded array of card types with the cards in each row moved to
+    the front, in order, and the NO_CARD padding to the end.
+    """
+    order = np.argsort(cards == NO_CARD, axis=1, kind="stable")
+    return np.take_along_axis(cards, order, axis=1)
+
+
+class _TiedOrder:
+    """
+    The order of the tied cards, those of the types greedy_policy ranks equal
+    to another type in the deck, in each pile of a batch of games. The counts
+    of BatchEncounter do not say which of two tied cards comes first in the
+    hand, which is the one greedy_policy plays, so the order is kept here.
+    Cards drawn at random come in a random order, but the cards carried over
+    from the old deck on a turn that shuffles in the discard pile keep their
+    order in the deck, which depends on the order of past plays and discards.
+
+    Each pile is a (size, length) array of card types, in order, padded at
+    the end with NO_CARD.
+    """
+
+    def __init__(self, size: int, deck: list[int], card_types: int) -> None:
+        """
+        Args:
+            size (int): The number of games in the batch.
+            deck (list[int]): The types of the tied cards in the starting deck,
+            in order.
+            card_types (int): The number of types of card in the batch.
+        """
+        self._tied = np.zeros(card_types, dtype=bool)
+        self._tied[deck] = True
+        self.deck = np.empty((size, len(deck)), dtype=np.int64)
+        self.deck[:] = deck
+        self.hand = np.full_like(self.deck, NO_CARD)
+        self.discard = np.full_like(self.deck, NO_CARD)
+
+    def take(self, rows: np.ndarray) -> "_TiedOrder":
+        """
+        Returns a copy of the order in the selected games, as
+        BatchEncounter.take does.
+        """
+        order = copy.copy(self)
+        order.deck = self.deck[rows]
+        order.hand = self.hand[rows]
+        order.discard = self.discard[rows]
+        return order
+
+    def is_tied(self, cards: np.ndarray) -> np.ndarray:
+        """
+        Returns whether each card type is one of the tied types.
+
+        Args:
+            cards (np.ndarray): Card types, or NO_CARD.
+
+        Returns:
+            np.ndarray: A boolean array of the same shape.
+        """
+        return (cards != NO_CARD) & self._tied[np.maximum(cards, 0)]
+
+    def _append(self, pile: np.ndarray, rows: np.ndarray, cards: np.ndarray) -> None:
+        """
+        Appends cards, a padded array with one row per selected row, to the
+        end of pile in the selected rows.
+        """
+        joined = np.concatenate((pile[rows], cards), axis=1)
+        pile[rows] = _compact(joined)[:, : pile.shape[1]]
+
+    def move_all(self, source: str, destination: str, rows: np.ndarray) -> None:
+        """
+        Appends one pile to the end of another and empties it, in the selected
+        rows, e.g. move_all("hand", "discard", rows) when a turn ends.
+
+        Args:
+            source (str): The pile emptied: "deck", "hand" or "discard".
+            destination (str): The pile appended to.
+            rows (np.ndarray): A boolean mask of the games.
+        """
+        source_pile = getattr(self, source)
+        self._append(getattr(self, destination), rows, source_pile[rows])
+        source_pile[rows] = NO_CARD
+
+    def draw(
+        self,
+        generator: np.random.Generator,
+        refilled: np.ndarray,
+        drawn: np.ndarray,
+    ) -> None:
+        """
+        Follows BatchEncounter.draw_hands: where the discard pile became the
+        deck, the old deck becomes the start of the hand. The tied cards drawn
+        are added to the hand in the order drawn, and taken from the deck
+        with each copy of a type equally likely to be taken.
+
+        Args:
+            generator (np.random.Generator): The source of randomness.
+            refilled (np.ndarray): The first mask returned by draw_hands.
+            drawn (np.ndarray): The cards drawn, as returned by draw_hands.
+        """
+        self.hand[refilled] = self.deck[refilled]
+        self.deck[refilled] = self.discard[refilled]
+        self.discard[refilled] = NO_CARD
+        tied = self.is_tied(drawn)
+        rows = tied.any(axis=1)
+        if not rows.any():
+            return
+        drawn = np.where(tied[rows], drawn[rows], NO_CARD)
+        deck = self.deck[rows]
+        # The copies of each type taken are those with the lowest random keys.
+        keys = generator.random(deck.shape)
+        same = deck[:, :, None] == deck[:, None, :]
+        rank = (same & (keys[:, None, :] < keys[:, :, None])).sum(axis=2)
+        counts = (drawn[:, :, None] == np.arange(len(self._tied))).sum(axis=1)
+        wanted = np.take_along_axis(counts, np.maximum(deck, 0), axis=1)
+        taken = (deck != NO_CARD) & (rank < wanted)
+        self.deck[rows] = _compact(np.where(taken, NO_CARD, deck))
+        self._append(self.hand, rows, drawn)
+
+    def first(self, candidates: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """
+        Returns, for each selected row, the type of the first card in the hand
+        that is one of the candidate types.
+
+        Args:
+            candidates (np.ndarray): A (size, card types) boolean array.
+            rows (np.ndarray): The indices of the rows, each holding a
+            candidate card.
+
+        Returns:
+            np.ndarray: The type of the first candidate card in each row.
+        """
+        hand = self.hand[rows]
+        valid = (hand != NO_CARD) & np.take_along_axis(
+            candidates[rows], np.maximum(hand, 0), axis=1
+        )
+        return hand[np.arange(len(rows)), valid.argmax(axis=1)]
+
+    def play(self, cards: np.ndarray, rows: np.ndarray) -> None:
+        """
+        Moves the first copy in the hand of each card played to the end of the
+        discard pile, as Player.play_card does.
+
+        Args:
+            cards (np.ndarray): The card type played in each game.
+            rows (np.ndarray): A boolean mask of the games where a tied card
+            was played.
+        """
+        hand = self.hand[rows]
+        played = cards[rows][:, None]
+        hand[np.arange(len(hand)), (hand == played).argmax(axis=1)] = NO_CARD
+        self.hand[rows] = _compact(hand)
+        self._append(self.discard, rows, played)
+
+
+def _greedy_moves(
+    batch: BatchEncounter, tied_order: _TiedOrder | None
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the card and target column greedy_policy would choose in each
+    encounter of the batch, or NO_CARD where it would end the turn. Between
+    card types of equal rank, the first in the hand is chosen.
+    """
+    table = batch.card_table
+    energy = batch.player_energy[:, None]
+    playable = (batch.hand > 0) & (table.cost <= energy) & (energy > 0)
+    rank = np.where(playable, table.rank, -1)
+    best = rank.max(axis=1)
+    cards = np.where(best >= 0, rank.argmax(axis=1), NO_CARD)
+
+    if tied_order is not None:
+        tied = (rank == best[:, None]) & playable
+        rows = np.flatnonzero(tied.sum(axis=1) > 1)
+        if rows.size:
+            cards[rows] = tied_order.first(tied, rows)
+
+    hp = np.where(batch.monster_alive, batch.monster_hp, np.iinfo(np.int64).max)
+    targeted = (cards != NO_CARD) & table.target[np.maximum(cards, 0)]
+    targets = np.where(targeted, hp.argmin(axis=1), NO_TARGET)
+    return cards, targets
+
+
+class _GreedyGames:
+    """
+    A batch of games played by run_games. The batch only holds the games
+    still in progress: when fewer than half of its rows are, the finished
+    games' results are saved and their rows dropped.
+    """
+
+    def __init__(
+        self,
+        player_type: str,
+        game_file: str,
+        games: int,
+        generator: np.random.Generator,
+        max_turns: int,
+    ) -> None:
+        """
+        Sets up the games, before their first encounter.
+        """
+        self._generator = generator
+        self._max_turns = max_turns
+        encounters = [
+            [
+                (MONSTER_KINDS[MONSTER_TYPES[name]], hp)
+                for name, hp in monsters
+                if name in MONSTER_TYPES
+            ]
+            for monsters in load_game(game_file)
+        ]
+        self._encounters = len(encounters)
+        max_monsters = max([len(monsters) for monsters in encounters] + [1])
+        # The monsters of each encounter, padded with empty slots, and an empty
+        # last row for the games that have won every encounter.
+        self._kinds = np.zeros((len(encounters) + 1, max_monsters), dtype=np.int8)
+        self._start_hp = np.zeros((len(encounters) + 1, max_monsters), dtype=np.int64)
+        for index, monsters in enumerate(encounters):
+            for column, (kind, hp) in enumerate(monsters):
+                self._kinds[index, column] = kind
+                self._start_hp[index, column] = hp
+
+        player = PLAYER_TYPES[player_type.lower()](GameRNG(0))
+        self._batch = BatchEncounter(games, max_monsters)
+        self._batch.player_hp[:] = player.get_max_hp()
+        self._batch.player_max_hp[:] = player.get_max_hp()
+        table = self._batch.card_table
+        self._batch.deck[:] = table.count_cards(player.get_deck())
+        deck = [table.column(card.get_name()) for card in player.get_deck()]
+        ranks = table.rank[np.unique(deck)]
+        tied = [card for card in deck if (ranks == table.rank[card]).sum() > 1]
+        self._tied_order = _TiedOrder(games, tied, len(table)) if tied else None
+
+        # The state of each game in the batch, and the results of every game.
+        self._game = np.arange(games)
+        self._playing = np.ones(games, dtype=bool)
+        self._turns = np.zeros(games, dtype=np.int64)
+        self._cards_played = np.zeros(games, dtype=np.int64)
+        self._encounter = np.zeros(games, dtype=np.int64)
+        self._results = BatchGameResult(
+            np.zeros(games, dtype=bool),
+            np.zeros(games, dtype=np.int64),
+            np.zeros(games, dtype=np.int64),
+            np.zeros(games, dtype=np.int64),
+            np.zeros(games, dtype=np.int64),
+        )
+
+    def _draw(self, rows: np.ndarray) -> None:
+        """
+        Draws a new hand in the selected games.
+        """
+        refilled, drawn = self._batch.draw_hands(self._generator, rows)
+        if self._tied_order is not None:
+            self._tied_order.draw(self._generator, refilled, drawn)
+
+    def _discard_hands(self, rows: np.ndarray) -> None:
+        """
+        Discards the hand in the selected games, as Player.end_turn does.
+        """
+        batch = self._batch
+        batch.discard[rows] += batch.hand[rows]
+        batch.hand[rows] = 0
+        if self._tied_order is not None:
+            self._tied_order.move_all("hand", "discard", rows)
+
+    def _start_encounters(self, rows: np.ndarray) -> None:
+        """
+        Starts the next encounter in the selected games, as Encounter.reset
+        does, and ends the games that have none left.
+        """
+        batch = self._batch
+        while rows.any():
+            rows &= self._encounter < self._encounters
+            index = self._encounter[rows]
+            kind = self._kinds[index]
+            batch.monster_kind[rows] = kind
+            batch.monster_alive[rows] = kind != NO_MONSTER
+            batch.monster_hp[rows] = self._start_hp[index]
+            batch.monster_max_hp[rows] = self._start_hp[index]
+            for name in ("block", "strength", "weak", "vulnerable", "calls"):
+                getattr(batch, f"monster_{name}")[rows] = 0
+            batch.monster_damage[rows] = self._generator.integers(5, 8, kind.shape)
+            # Player.start_new_encounter, then Player.new_turn.
+            batch.deck[rows] += batch.discard[rows]
+            batch.discard[rows] = 0
+            if self._tied_order is not None:
+                self._tied_order.move_all("discard", "deck", rows)
+            batch.player_turn[rows] = True
+            batch.player_energy[rows] = 3
+            _decay(batch.player_block, batch.player_weak, batch.player_vulnerable, rows)
+            self._draw(rows)
+            self._turns[rows] += 1
+            # An encounter without monsters is won at once.
+            rows = rows & ~batch.is_active()
+            self._discard_hands(rows)
+            self._encounter[rows] += 1
+        self._playing &= self._encounter < self._encounters
+
+    def _save_finished(self) -> None:
+        """
+        Saves the results of the finished games and drops them from the batch,
+        if fewer than half of the games in it are still in progress.
+        """
+        playing = self._playing
+        if 2 * playing.sum() >= len(playing):
+            return
+        finished = ~playing
+        game = self._game[finished]
+        results = self._results
+        encounters_won = self._encounter[finished]
+        results.won[game] = encounters_won == self._encounters
+        results.turns[game] = self._turns[finished]
+        results.hp[game] = self._batch.player_hp[finished]
+        results.cards_played[game] = self._cards_played[finished]
+        results.encounters_won[game] = encounters_won
+
+        self._batch = self._batch.take(playing)
+        if self._tied_order is not None:
+            self._tied_order = self._tied_order.take(playing)
+        self._game = self._game[playing]
+        self._turns = self._turns[playing]
+        self._cards_played = self._cards_played[playing]
+        self._encounter = self._encounter[playing]
+        self._playing = playing[playing]
+
+    def play(self) -> BatchGameResult:
+        """
+        Plays every game to completion.
+
+        Returns:
+            BatchGameResult: The outcome of each game.
+        """
+        self._start_encounters(self._playing.copy())
+        while self._playing.any():
+            batch = self._batch
+            playing = self._playing
+            cards, targets = _greedy_moves(batch, self._tied_order)
+            cards[~playing] = NO_CARD
+            played = batch.apply_card(cards, targets)
+            self._cards_played += played
+            if self._tied_order is not None:
+                tied = played & self._tied_order.is_tied(cards)
+                self._tied_order.play(cards, tied)
+
+            cleared = playing & ~batch.is_active()
+            self._discard_hands(cleared)
+            self._encounter[cleared] += 1
+            self._start_encounters(cleared)
+
+            ending = self._playing & ~played & ~cleared
+            batch.end_player_turn(ending)
+            if self._tied_order is not None:
+                self._tied_order.move_all("hand", "discard", ending)
+            batch.enemy_turn()
+            lost = batch.player_hp == 0
+            lost |= self._turns >= self._max_turns
+            lost &= ending
+            self._playing &= ~lost
+            ending &= ~lost
+            self._turns[ending] += 1
+            self._draw(ending)
+            self._save_finished()
+        self._playing[:] = False
+        self._save_finished()
+        return self._results
+
+
+def run_games(
+    player_type: str,
+    game_file: str,
+    games: int,
+    generator: np.random.Generator | None = None,
+    max_turns: int = MAX_TURNS,
+) -> BatchGameResult:
+    """
+    Plays a batch of complete games with greedy_policy in lockstep, following
+    sts_simulate.Game.play: each encounter is played until every monster is
+    defeated, and a game is lost as soon as the player is defeated after an
+    enemy turn or runs out of turns. The games are independent and their
+    results have the same distribution as run_game's, but they do not
+    reproduce the games of any GameRNG.
+
+    Args:
+        player_type (str): 'ironclad' or 'silent'.
+        game_file (str): The name of the game file describing the encounters.
+        games (int): The number of games to play.
+        generator (np.random.Generator | None): The source of randomness.
+        Defaults to a new, unseeded generator.
+        max_turns (int): The number of player turns after which a game is
+        abandoned and counted as a loss.
+
+    Returns:
+        BatchGameResult: The outcome of each game.
+    """
+    if generator is None:
+        generator = np.random.default_rng()
+    return _GreedyGames(player_type, game_file, games, generator, max_turns).play()
+
+
+def _mismatches(batch: BatchEncounter, encounters: list[Encounter]) -> list[int]:
+    """
+    Returns the rows of batch whose state differs from the matching encounter.
+    Monsters are matched by id, since Encounter drops defeated monsters from
+    its list while the batch keeps every column.
+    """
+    expected = BatchEncounter.from_encounters(encounters, batch.monster_kind.shape[1])
+    player_fields = [name for name in vars(batch) if name.startswith("player_")]
+    different = np.zeros(batch.get_size(), dtype=bool)
+    for name in player_fields:
+        different |= getattr(batch, name) != getattr(expected, name)
+    for name in ("deck", "hand", "discard"):
+        different |= (getattr(batch, name) != getattr(expected, name)).any(axis=1)
+
+    monster_fields = [
+        name
+        for name in vars(batch)
+        if name.startswith("monster_") and name not in ("monster_id", "monster_alive")
+    ]
+    for row in range(batch.get_size()):
+        alive_ids = batch.monster_id[row][batch.monster_alive[row]]
+        expected_ids = expected.monster_id[row][expected.monster_alive[row]]
+        if alive_ids.tolist() != expected_ids.tolist():
+            different[row] = True
+            continue
+        columns = np.flatnonzero(batch.monster_alive[row])
+        expected_columns = np.flatnonzero(expected.monster_alive[row])
+        for name in monster_fields:
+            actual = getattr(batch, name)[row, columns]
+            wanted = getattr(expected, name)[row, expected_columns]
+            if (actual != wanted).any():
+                different[row] = True
+    return np.flatnonzero(different).tolist()
+
+
+def verify_against_oop(
+    size: int = 1000,
+    game_file: str = "games/game3.txt",
+    steps: int = 200,
+    seed: int = 0,
+) -> list[int]:
+    """
+    Plays the same random moves in a batch and in the equivalent Encounter
+    objects and checks that their states agree after every step.
+
+    Each step either attempts a random card on a random monster column (which
+    may be invalid, to exercise the failure paths) or ends the turn. The piles
+    drawn by the Encounter objects are copied into the batch after each enemy
+    turn.
+
+    Args:
+        size (int): The number of encounters to play.
+        game_file (str): The game file whose encounters are used, cycling
+        through them.
+        steps (int): The number of moves to play in each encounter.
+        seed (int): Seed for the game generators and the move choices.
+
+    Returns:
+        list[int]: The rows that disagreed at any point; empty if the engines
+        matched exactly.
+    """
+    game = load_game(game_file)
+    player_types = list(PLAYER_TYPES.values())
+    encounters = []
+    for row in range(size):
+        player = player_types[row % 2](GameRNG.for_game(seed, row))
+        encounters.append(Encounter(player, game[row % len(game)]))
+    batch = BatchEncounter.from_encounters(encounters)
+    moves = np.random.default_rng(seed)
+    failed = set()
+
+    for _ in range(steps):
+        active = batch.is_active() & (batch.player_hp > 0)
+        end_turn = active & (moves.random(size) < 0.25)
+        play = active & ~end_turn
+        card_types = len(batch.card_table)
+        cards = np.where(play, moves.integers(0, card_types, size), NO_CARD)
+        targets = moves.integers(NO_TARGET, batch.monster_kind.shape[1], size)
+        target_ids = np.where(
+            targets == NO_TARGET, -1, batch.monster_id[batch._rows, targets]
+        )
+
+        batch.apply_card(cards, targets)
+        for row in np.flatnonzero(play):
+            target_id = None if targets[row] == NO_TARGET else int(target_ids[row])
+            card_name = batch.card_table.names[cards[row]]
+            encounters[row].player_apply_card(card_name, target_id)
+
+        batch.end_player_turn(end_turn)
+        batch.enemy_turn()
+        for row in np.flatnonzero(end_turn):
+            encounters[row].end_player_turn()
+            encounters[row].enemy_turn()
+            batch.load_piles(row, encounters[row])
+
+        failed.update(_mismatches(batch, encounters))
+    return sorted(failed)
+
+
+def verify_damage(limit: int = 10_000) -> list[tuple[int, bool, bool]]:
+    """
+    Compares the batched damage multipliers with sts_damage.scale_damage for
+    every damage from -limit to limit and every combination of vulnerable and
+    weak.
+
+    Args:
+        limit (int): The largest damage checked, in each direction.
+
+    Returns:
+        list[tuple[int, bool, bool]]: The (damage, vulnerable, weak) that
+        disagreed; empty if none did.
+    """
+    damage = np.arange(-limit, limit + 1, dtype=np.int64)
+    mismatches = []
+    for vulnerable in (False, True):
+        for weak in (False, True):
+            scaled = _scale_damage(
+                damage,
+                np.full(damage.shape, vulnerable),
+                np.full(damage.shape, weak),
+            )
+            for value, result in zip(damage.tolist(), scaled.tolist()):
+                if result != scale_damage(value, vulnerable, weak):
+                    mismatches.append((value, vulnerable, weak))
+    return mismatches
+
+
+if __name__ == "__main__":
+    mismatched = verify_against_oop()
+    damage_mismatches = verify_damage()
+    if mismatched:
+        print(f"Mismatched rows: {mismatched}")
+    if damage_mismatches:
+        print(f"Mismatched damage: {damage_mismatches[:20]}")
+    if not mismatched and not damage_mismatches:
+        print("OK")
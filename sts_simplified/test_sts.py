@@ -0,0 +1,73 @@
+"""
+Tests of the game engine in sts.
+"""
+
+import io
+import os
+
+import pytest
+
+from sts import Encounter, GameSession, Monster, PLAYER_TYPES
+from sts_simulate import greedy_policy
+from sts_support import GameRNG, Renderer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture(autouse=True)
+def in_package_dir(monkeypatch):
+    """Game file paths are relative to the package."""
+    monkeypatch.chdir(HERE)
+
+
+def test_session_numbers_monsters_without_the_global_counter(monkeypatch):
+    monkeypatch.setattr(Monster, "monster_count", 100)
+    output = io.StringIO()
+    session = GameSession(Renderer(output), GameRNG(1), output)
+    session.send("ironclad")
+    session.send("games/game3.txt")
+    monsters = session.get_encounter().get_monsters()
+    assert [monster.get_id() for monster in monsters] == [0]
+    assert Monster.monster_count == 100
+
+
+def test_encounter_first_id_numbers_monsters_in_order(monkeypatch):
+    monkeypatch.setattr(Monster, "monster_count", 0)
+    monsters = [("Cultist", 40), ("Louse", 12), ("JawWorm", 30)]
+    encounter = Encounter(PLAYER_TYPES["silent"](GameRNG(0)), monsters, first_id=7)
+    assert [monster.get_id() for monster in encounter.get_monsters()] == [7, 8, 9]
+
+    encounter.reset(PLAYER_TYPES["silent"](GameRNG(1)), monsters, first_id=3)
+    assert [monster.get_id() for monster in encounter.get_monsters()] == [3, 4, 5]
+    assert Monster.monster_count == 0
+
+    encounter.reset(PLAYER_TYPES["silent"](GameRNG(2)), monsters)
+    assert [monster.get_id() for monster in encounter.get_monsters()] == [0, 1, 2]
+    assert Monster.monster_count == 3
+
+
+def play_greedily(encounter: Encounter, turns: int) -> None:
+    for _ in range(turns):
+        if not encounter.is_active():
+            return
+        while (move := greedy_policy(encounter)) is not None:
+            if not encounter.player_apply_card(*move):
+                break
+        encounter.end_player_turn()
+        encounter.enemy_turn()
+
+
+def test_hashing_starts_on_first_state_hash():
+    monsters = [("Cultist", 48), ("Louse", 15), ("JawWorm", 40)]
+    encounter = Encounter(PLAYER_TYPES["ironclad"](GameRNG(4)), monsters)
+    play_greedily(encounter, 1)
+    assert encounter.get_player()._hash is None
+
+    encounter.state_hash()
+    play_greedily(encounter, 3)
+    hashed = encounter.state_hash()
+    # The same position, hashed from scratch.
+    copy = Encounter(PLAYER_TYPES["ironclad"](GameRNG(4)), monsters)
+    play_greedily(copy, 4)
+    assert copy.get_player()._hash is None
+    assert copy.state_hash() == hashed
@@ -0,0 +1,70 @@
+"""
+Exhaustive tests of the integer damage multipliers in sts_damage, and of the
+batched copy of them in sts_vector.
+"""
+
+import numpy as np
+import pytest
+
+from sts_damage import MULTIPLIERS, scale_damage
+from sts_vector import _scale_damage
+
+# The damage range checked, in each direction from 0.
+LIMIT = 100_000
+
+FLAGS = [(vulnerable, weak) for vulnerable in (False, True) for weak in (False, True)]
+
+
+def float_damage(damage: int, vulnerable: bool, weak: bool) -> int:
+    """The float formula the engine used before sts_damage."""
+    if vulnerable:
+        damage *= 1.5
+    if weak:
+        damage *= 0.75
+    return int(damage)
+
+
+@pytest.mark.parametrize("vulnerable, weak", FLAGS)
+def test_scale_damage_matches_float_formula(vulnerable, weak):
+    mismatches = [
+        damage
+        for damage in range(-LIMIT, LIMIT + 1)
+        if scale_damage(damage, vulnerable, weak)
+        != float_damage(damage, vulnerable, weak)
+    ]
+    assert mismatches == []
+
+
+@pytest.mark.parametrize("vulnerable, weak", FLAGS)
+def test_batched_scale_damage_matches_scale_damage(vulnerable, weak):
+    damage = np.arange(-LIMIT, LIMIT + 1, dtype=np.int64)
+    scaled = _scale_damage(
+        damage,
+        np.full(damage.shape, vulnerable),
+        np.full(damage.shape, weak),
+    )
+    expected = np.array(
+        [scale_damage(int(value), vulnerable, weak) for value in damage],
+        dtype=np.int64,
+    )
+    assert np.array_equal(scaled, expected)
+
+
+def test_batched_scale_damage_mixes_flags_per_row():
+    damage = np.array([7, 7, 7, 7, -7, 13], dtype=np.int64)
+    vulnerable = np.array([False, False, True, True, True, True])
+    weak = np.array([False, True, False, True, True, False])
+    expected = [
+        scale_damage(int(value), bool(is_vulnerable), bool(is_weak))
+        for value, is_vulnerable, is_weak in zip(damage, vulnerable, weak)
+    ]
+    assert _scale_damage(damage, vulnerable, weak).tolist() == expected
+
+
+def test_multipliers_are_the_documented_fractions():
+    assert [numerator / 2**shift for numerator, shift in MULTIPLIERS] == [
+        1.0,
+        0.75,
+        1.5,
+        1.125,
+    ]
@@ -0,0 +1,150 @@
+"""
+Tests of FastForward's bounds and checks, and of fast-forwarding the games of
+sts_montecarlo.
+"""
+
+import os
+from statistics import fmean, pvariance
+
+import pytest
+
+from sts import PLAYER_TYPES, Encounter
+from sts_fastforward import (
+    PROBE_INTERVAL,
+    WARM_UP_CHECKS,
+    FastForwardGame,
+    fast_forward_for,
+    run_fast_forward_game,
+)
+from sts_montecarlo import run_monte_carlo
+from sts_pool import GamePool
+from sts_simulate import load_game, run_game
+from sts_support import GameRNG
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture(autouse=True)
+def in_package_dir(monkeypatch):
+    """Game file paths are relative to the package."""
+    monkeypatch.chdir(HERE)
+
+
+def test_bounds_rule_out_positions_before_searching():
+    player = PLAYER_TYPES["ironclad"](GameRNG(0))
+    fast_forward = fast_forward_for(player)
+    # The monsters could be defeated within the horizon, but not this turn,
+    # and the player might be defeated within it, but not in the next enemy
+    # turn, so only searching to that enemy turn cannot resolve anything.
+    encounter = Encounter(player, [("Cultist", 30), ("JawWorm", 30)])
+    player.reduce_hp(50)
+    bounds = fast_forward.bounds(encounter)
+    assert 1 < bounds.min_turns <= fast_forward.get_horizon() + 1
+    assert 0 < bounds.safe_turns < fast_forward.get_horizon()
+
+    assert fast_forward.resolve(encounter) is None
+    assert fast_forward.resolve(encounter) is None
+    stats = fast_forward.get_stats()
+    assert stats["attempts"] == 0 and stats["nodes"] == 0
+    assert stats["cache_hits"] == 1
+
+
+def test_checks_thinned_out_where_they_save_too_little():
+    fast_forward = fast_forward_for(PLAYER_TYPES["ironclad"](), min_saving=100.0)
+    encounters = load_game("games/game3.txt")
+    index = 0
+    while fast_forward.get_stats()["skipped"] == 0:
+        player = PLAYER_TYPES["ironclad"](GameRNG.for_game(0, index))
+        FastForwardGame(player, encounters, fast_forward).play()
+        index += 1
+    assert fast_forward._checked == WARM_UP_CHECKS
+    positions = fast_forward._positions
+
+    for _ in range(100):
+        player = PLAYER_TYPES["ironclad"](GameRNG.for_game(0, index))
+        FastForwardGame(player, encounters, fast_forward).play()
+        index += 1
+    probes = fast_forward._checked - WARM_UP_CHECKS
+    assert 0 < probes <= (fast_forward._positions - positions) // PROBE_INTERVAL + 1
+
+
+@pytest.mark.parametrize("game_file", ["games/game2.txt", "games/game3.txt"])
+def test_distribution_matches_run_game(game_file):
+    fast_forward = fast_forward_for(PLAYER_TYPES["silent"]())
+    expected = [
+        run_game("silent", game_file, rng=GameRNG.for_game(11, index))
+        for index in range(2_000)
+    ]
+    results = [
+        run_fast_forward_game(
+            "silent", game_file, fast_forward, GameRNG.for_game(12, index)
+        )
+        for index in range(2_000)
+    ]
+    assert fast_forward.get_stats()["resolved"] > 0
+    for field in ("won", "turns", "hp", "cards_played", "encounters_won"):
+        samples = [float(getattr(result, field)) for result in expected]
+        fast = [float(getattr(result, field)) for result in results]
+        error = (pvariance(samples) / len(samples) + pvariance(fast) / len(fast)) ** 0.5
+        # Five standard errors, or an exact match when neither varies.
+        assert abs(fmean(samples) - fmean(fast)) <= 5 * error, field
+
+
+def test_only_the_final_encounter_fast_forwarded(monkeypatch):
+    fast_forward = fast_forward_for(PLAYER_TYPES["silent"]())
+    finish = fast_forward.finish
+    finished = []
+
+    def recording_finish(encounter):
+        outcome = finish(encounter)
+        if outcome is not None:
+            finished.append(type(encounter.get_monsters()[0]).__name__)
+        return outcome
+
+    monkeypatch.setattr(fast_forward, "finish", recording_finish)
+    for index in range(200):
+        run_fast_forward_game(
+            "silent", "games/game2.txt", fast_forward, GameRNG.for_game(3, index)
+        )
+    # The Lice of the first encounter are only ever played.
+    assert finished and set(finished) == {"Cultist"}
+
+
+def test_pooled_fast_forward_games_repeat():
+    fast_forward = fast_forward_for(PLAYER_TYPES["silent"]())
+    pool = GamePool(max_free=1)
+    pooled = [
+        run_fast_forward_game(
+            "silent",
+            "games/game2.txt",
+            fast_forward,
+            GameRNG.for_game(4, index),
+            pool=pool,
+        )
+        for index in range(30)
+    ]
+    fast_forward = fast_forward_for(PLAYER_TYPES["silent"]())
+    built = [
+        run_fast_forward_game(
+            "silent", "games/game2.txt", fast_forward, GameRNG.for_game(4, index)
+        )
+        for index in range(30)
+    ]
+    assert pooled == built
+    assert pool.get_reused() > 0
+
+
+def test_fast_forward_monte_carlo():
+    summary = run_monte_carlo(
+        "ironclad", "games/game1.txt", 300, workers=1, fast_forward=True
+    )
+    assert summary.get_games() == 300
+    assert summary.get_win_rate() == 1.0
+    again = run_monte_carlo(
+        "ironclad", "games/game1.txt", 300, workers=1, fast_forward=True
+    )
+    assert str(again) == str(summary)
+    with pytest.raises(ValueError):
+        run_monte_carlo(
+            "ironclad", "games/game1.txt", 10, policy=max, workers=1, fast_forward=True
+        )
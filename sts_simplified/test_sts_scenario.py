@@ -0,0 +1,74 @@
+"""
+Tests of the compiled scenario cache in sts_scenario.
+"""
+
+import os
+import shutil
+import stat
+
+from sts_scenario import (
+    CACHE_DIR_NAME,
+    cache_path,
+    default_cache_dir,
+    load_game_file,
+    read_header,
+)
+from sts_support import read_game_file
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+GAME_FILE = os.path.join(HERE, "games", "game3.txt")
+
+
+def copy_game(tmp_path) -> str:
+    source = str(tmp_path / "game.txt")
+    shutil.copyfile(GAME_FILE, source)
+    return source
+
+
+def test_default_cache_dir_is_per_user(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert default_cache_dir() == os.path.join(tmp_path, CACHE_DIR_NAME)
+    monkeypatch.delenv("XDG_CACHE_HOME")
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    assert default_cache_dir() == os.path.join(
+        tmp_path, "home", ".cache", CACHE_DIR_NAME
+    )
+
+
+def test_cache_dir_created_private(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    source = copy_game(tmp_path)
+    with load_game_file(source) as scenario:
+        assert list(scenario) == read_game_file(source)
+    mode = os.stat(default_cache_dir()).st_mode
+    assert stat.S_IMODE(mode) == 0o700
+    assert os.path.isfile(cache_path(source))
+
+
+def test_corrupt_cache_file_recompiled(tmp_path):
+    source = copy_game(tmp_path)
+    cache_dir = str(tmp_path / "cache")
+    load_game_file(source, cache_dir).close()
+    path = cache_path(source, cache_dir)
+    # A valid header followed by a truncated body.
+    with open(path, "r+b") as file:
+        file.truncate(os.path.getsize(path) - 3)
+
+    with load_game_file(source, cache_dir) as scenario:
+        assert list(scenario) == read_game_file(source)
+
+
+def test_touched_source_recorded_in_a_new_file(tmp_path):
+    source = copy_game(tmp_path)
+    cache_dir = str(tmp_path / "cache")
+    load_game_file(source, cache_dir).close()
+    path = cache_path(source, cache_dir)
+    inode = os.stat(path).st_ino
+    mtime_ns = os.stat(source).st_mtime_ns + 10**9
+    os.utime(source, ns=(mtime_ns, mtime_ns))
+
+    with load_game_file(source, cache_dir) as scenario:
+        assert list(scenario) == read_game_file(source)
+    assert read_header(path)[6] == mtime_ns
+    assert os.stat(path).st_ino != inode
+    assert os.listdir(cache_dir) == [os.path.basename(path)]
@@ -0,0 +1,154 @@
+"""
+Tests of sts_server, each driving a GameServer through real connections.
+"""
+
+import asyncio
+import os
+import re
+
+import pytest
+
+from sts_server import (
+    BUSY_MESSAGE,
+    IDLE_MESSAGE,
+    LINE_TOO_LONG_MESSAGE,
+    MAX_LINE_LENGTH,
+    GameServer,
+)
+from sts_support import GAME_FILE_PROMPT, MOVE_PROMPT, PLAYER_TYPE_PROMPT
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+GAMES_DIR = os.path.join(HERE, "games")
+# How long any one test may take before it is failed rather than left hanging.
+TEST_TIMEOUT = 20.0
+
+
+@pytest.fixture(autouse=True)
+def in_package_dir(monkeypatch):
+    """Game file paths sent by the clients are relative to the package."""
+    monkeypatch.chdir(HERE)
+
+
+def run(coroutine):
+    return asyncio.run(asyncio.wait_for(coroutine, TEST_TIMEOUT))
+
+
+async def ask(reader, writer, line: str, prompt: str) -> str:
+    """Sends one line and returns the response, up to and including prompt."""
+    writer.write(f"{line}\n".encode())
+    await writer.drain()
+    return (await reader.readuntil(prompt.encode())).decode()
+
+
+async def connect(server: GameServer, **kwargs):
+    host, port = await server.start()
+    return await asyncio.open_connection(host, port, **kwargs)
+
+
+def test_session_plays_a_game():
+    async def scenario():
+        server = GameServer("127.0.0.1", 0, seed=3, games_dir=GAMES_DIR)
+        reader, writer = await connect(server)
+        try:
+            greeting = await reader.readuntil(PLAYER_TYPE_PROMPT.encode())
+            assert greeting.decode() == PLAYER_TYPE_PROMPT
+
+            response = await ask(reader, writer, "wizard", PLAYER_TYPE_PROMPT)
+            assert "unknown player type 'wizard'" in response
+
+            response = await ask(reader, writer, "ironclad", GAME_FILE_PROMPT)
+            assert response == GAME_FILE_PROMPT
+
+            response = await ask(reader, writer, "games/../sts.py", GAME_FILE_PROMPT)
+            assert "no game file 'games/../sts.py'" in response
+
+            response = await ask(reader, writer, "games/game1.txt", MOVE_PROMPT)
+            assert response.startswith("New encounter!")
+            assert "Energy: 3" in response
+            card = re.search(r"Hand: \[(\w+)\(", response).group(1)
+
+            response = await ask(reader, writer, "describe Strike", MOVE_PROMPT)
+            assert "Deal 6 damage." in response
+
+            response = await ask(reader, writer, f"play {card} 0", MOVE_PROMPT)
+            assert "Energy: 3" not in response
+
+            response = await ask(reader, writer, "end turn", MOVE_PROMPT)
+            assert "Energy: 3" in response
+            assert server.get_active() == 1
+        finally:
+            writer.close()
+            await server.close()
+        assert server.get_active() == 0
+        assert server.get_served() == 1
+
+    run(scenario())
+
+
+def test_overlong_line_disconnects():
+    async def scenario():
+        server = GameServer("127.0.0.1", 0, games_dir=GAMES_DIR)
+        reader, writer = await connect(server)
+        try:
+            await reader.readuntil(PLAYER_TYPE_PROMPT.encode())
+            writer.write(b"x" * (2 * MAX_LINE_LENGTH) + b"\n")
+            assert (await reader.read()).decode().endswith(LINE_TOO_LONG_MESSAGE)
+        finally:
+            writer.close()
+            await server.close()
+
+    run(scenario())
+
+
+def test_idle_client_disconnected():
+    async def scenario():
+        server = GameServer("127.0.0.1", 0, idle_timeout=0.2, games_dir=GAMES_DIR)
+        reader, writer = await connect(server)
+        try:
+            await reader.readuntil(PLAYER_TYPE_PROMPT.encode())
+            assert (await reader.read()).decode() == IDLE_MESSAGE
+            assert server.get_served() == 1
+        finally:
+            writer.close()
+            await server.close()
+
+    run(scenario())
+
+
+def test_full_server_turns_clients_away():
+    async def scenario():
+        server = GameServer("127.0.0.1", 0, max_sessions=1, games_dir=GAMES_DIR)
+        reader, writer = await connect(server)
+        try:
+            await reader.readuntil(PLAYER_TYPE_PROMPT.encode())
+            second_reader, second_writer = await connect(server)
+            assert (await second_reader.read()).decode() == BUSY_MESSAGE
+            second_writer.close()
+            assert server.get_active() == 1
+
+            response = await ask(reader, writer, "silent", GAME_FILE_PROMPT)
+            assert response == GAME_FILE_PROMPT
+        finally:
+            writer.close()
+            await server.close()
+
+    run(scenario())
+
+
+def test_unix_socket_removed_on_close(tmp_path):
+    path = str(tmp_path / "sts.sock")
+
+    async def scenario():
+        for _ in range(2):
+            server = GameServer(unix_path=path, games_dir=GAMES_DIR)
+            assert await server.start() == path
+            reader, writer = await asyncio.open_unix_connection(path)
+            try:
+                greeting = await reader.readuntil(PLAYER_TYPE_PROMPT.encode())
+                assert greeting.decode() == PLAYER_TYPE_PROMPT
+            finally:
+                writer.close()
+                await server.close()
+            assert not os.path.exists(path)
+
+    run(scenario())
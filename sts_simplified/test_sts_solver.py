@@ -0,0 +1,65 @@
+"""
+Tests of the exact search of sts_solver.
+"""
+
+import os
+import time
+
+import pytest
+
+from sts import MONSTER_TYPES, PLAYER_TYPES, Encounter, JawWorm
+from sts_simulate import load_game
+from sts_support import GameRNG
+from sts_solver import solver_for
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture(autouse=True)
+def in_package_dir(monkeypatch):
+    """Game file paths are relative to the package."""
+    monkeypatch.chdir(HERE)
+
+
+@pytest.fixture
+def monster_registry():
+    """Unregisters the types of monster a test defines."""
+    monsters = dict(MONSTER_TYPES)
+    yield
+    MONSTER_TYPES.clear()
+    MONSTER_TYPES.update(monsters)
+
+
+def test_solves_a_game_file_encounter_exactly():
+    player = PLAYER_TYPES["ironclad"](GameRNG(0))
+    encounter = Encounter(player, load_game("games/game3.txt")[1])
+    start = time.perf_counter()
+    solution = solver_for(player).solve(encounter)
+    assert time.perf_counter() - start < 30
+    assert solution.stats.exact
+    assert solution.value == pytest.approx(55.99106, abs=1e-5)
+    assert solution.move_values[solution.move] == solution.value
+    assert max(solution.move_values.values()) == solution.value
+
+
+def test_solves_an_encounter_start_exactly():
+    player = PLAYER_TYPES["ironclad"](GameRNG(0))
+    solver = solver_for(player)
+    # IronClad cannot outlast a Jaw Worm this strong.
+    assert solver.solve_encounter_start(player, [("JawWorm", 50)]) == 0.0
+    assert solver.get_stats().exact
+    assert solver.solve_encounter_start(player, [("JawWorm", 5)]) == pytest.approx(
+        80
+    )
+
+
+def test_monsters_without_a_model_rejected(monster_registry):
+    class Gremlin(JawWorm):
+        """A type of monster the solver has no model of."""
+
+    player = PLAYER_TYPES["silent"](GameRNG(0))
+    solver = solver_for(player)
+    with pytest.raises(ValueError, match="no model of the monster 'Gremlin'"):
+        solver.solve(Encounter(player, [("Gremlin", 20)]))
+    with pytest.raises(ValueError, match="no model of the monster 'Gremlin'"):
+        solver.solve_encounter_start(player, [("Gremlin", 20)])
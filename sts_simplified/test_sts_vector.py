@@ -0,0 +1,127 @@
+"""
+Tests of the whole games played in lockstep by sts_vector.run_games, and of
+running them through sts_montecarlo.
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from sts import CARD_EFFECTS, PLAYER_TYPES, Card, CardEffect, Encounter, register_card
+from sts_montecarlo import RunningStats, run_monte_carlo
+from sts_simulate import MAX_TURNS, load_game, run_game
+from sts_support import GameRNG
+from sts_vector import BatchEncounter, run_games
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIELDS = ("won", "turns", "hp", "cards_played", "encounters_won")
+
+
+@pytest.fixture(autouse=True)
+def in_package_dir(monkeypatch):
+    """Game file paths are relative to the package."""
+    monkeypatch.chdir(HERE)
+
+
+@pytest.fixture
+def card_registry():
+    """Unregisters the cards a test registers."""
+    effects = dict(CARD_EFFECTS)
+    cards = dict(Card._by_name)
+    yield
+    CARD_EFFECTS.clear()
+    CARD_EFFECTS.update(effects)
+    Card._by_name.clear()
+    Card._by_name.update(cards)
+
+
+def test_results_are_consistent():
+    results = run_games("silent", "games/game3.txt", 2_000, np.random.default_rng(1))
+    assert len(results.won) == 2_000
+    encounters = len(load_game("games/game3.txt"))
+    assert np.array_equal(results.won, results.encounters_won == encounters)
+    assert np.array_equal(results.won, results.hp > 0)
+    assert (results.turns >= 1).all() and (results.turns <= MAX_TURNS).all()
+
+
+def test_seeded_generator_repeats_the_games():
+    first = run_games("ironclad", "games/game2.txt", 500, np.random.default_rng(7))
+    second = run_games("ironclad", "games/game2.txt", 500, np.random.default_rng(7))
+    for field in FIELDS:
+        assert np.array_equal(getattr(first, field), getattr(second, field))
+
+
+@pytest.mark.parametrize("player_type", ["ironclad", "silent"])
+@pytest.mark.parametrize("game_file", ["games/game2.txt", "games/game3.txt"])
+def test_distribution_matches_run_game(player_type, game_file):
+    expected = [
+        run_game(player_type, game_file, rng=GameRNG.for_game(11, index))
+        for index in range(1_000)
+    ]
+    results = run_games(player_type, game_file, 20_000, np.random.default_rng(5))
+    for field in FIELDS:
+        samples = np.array([getattr(result, field) for result in expected], float)
+        batch = getattr(results, field).astype(float)
+        error = (samples.var() / len(samples) + batch.var() / len(batch)) ** 0.5
+        # Five standard errors, or an exact match when neither varies.
+        assert abs(samples.mean() - batch.mean()) <= 5 * error, field
+
+
+def test_running_stats_add_all_matches_add():
+    values = [3, -1, 4, 1, -5, 9, 2, 6]
+    one_by_one = RunningStats()
+    for value in values:
+        one_by_one.add(value)
+    at_once = RunningStats()
+    at_once.add_all(np.array(values))
+    at_once.add_all(np.array([], dtype=np.int64))
+    assert str(at_once) == str(one_by_one)
+    assert at_once.get_count() == len(values)
+
+
+def test_vectorized_monte_carlo():
+    summary = run_monte_carlo(
+        "ironclad", "games/game1.txt", 3_000, workers=1, vectorized=True
+    )
+    assert summary.get_games() == 3_000
+    assert summary.get_win_rate() == 1.0
+    again = run_monte_carlo(
+        "ironclad", "games/game1.txt", 3_000, workers=1, vectorized=True
+    )
+    assert str(again) == str(summary)
+
+
+def test_vectorized_monte_carlo_rejects_other_settings():
+    with pytest.raises(ValueError):
+        run_monte_carlo(
+            "silent", "games/game1.txt", 10, policy=max, workers=1, vectorized=True
+        )
+    with pytest.raises(ValueError):
+        run_monte_carlo(
+            "silent",
+            "games/game1.txt",
+            10,
+            workers=1,
+            fast_draws=True,
+            vectorized=True,
+        )
+
+
+def test_batch_holds_cards_registered_before_it(card_registry):
+    register_card(CardEffect("Cleave", "Deal 9 damage.", damage=9))
+    player = PLAYER_TYPES["ironclad"](GameRNG(0))
+    batch = BatchEncounter.from_encounters([Encounter(player, [("JawWorm", 40)])])
+    column = batch.card_table.column("Cleave")
+    batch.hand[0, column] = 1
+    played = batch.apply_card(np.array([column]), np.array([0]))
+    assert played.tolist() == [True]
+    assert batch.monster_hp[0, 0] == 31
+
+
+def test_cards_registered_after_the_batch_rejected(card_registry):
+    batch = BatchEncounter(1)
+    cleave = register_card(CardEffect("Cleave", "Deal 9 damage.", damage=9))
+    with pytest.raises(ValueError, match="'Cleave' is not in the batch's card table"):
+        batch.card_table.count_cards([cleave()])
+    assert "Cleave" in BatchEncounter(1).card_table.names